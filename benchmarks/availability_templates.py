@@ -0,0 +1,82 @@
+""" Compares onboarding gp's one slot at a time with materializing a recurring template.
+
+Each gp is given Mon-Fri 09:00-12:00 availability for the given number of weeks, either by adding
+every slot with GP.update_availability_add (a commit per slot, as the manage availability page used
+to) or by saving a single AvailabilityTemplate. Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.availability_templates --gps 10 --weeks 26
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from store.conn import connect_to_database, create_database
+from store.gp import GP
+from store.pool import configure_pool
+from store.schedule import AvailabilityTemplate
+from store.user import User
+
+
+def onboard(database_path, gps, weeks, use_template):
+    """ Makes every gp available for the given number of weeks.
+
+    Returns:
+        elapsed (float): seconds taken.
+        slots (int): the number of availability rows written.
+    """
+
+    create_database(database_path)
+
+    conn, cursor = connect_to_database(database_path)
+    cursor.executemany("""
+        INSERT INTO user (user_id, email, first_name, last_name, user_status_id, user_role_id)
+        VALUES (?, ?, 'Seed', 'GP', 1, 1)""",
+        [(gp_id, 'seed.gp{}@mail.com'.format(gp_id)) for gp_id in range(1000, 1000 + gps)])
+    conn.commit()
+    conn.close()
+
+    configure_pool(database_path=database_path)
+    gp = GP(User)
+
+    start = datetime.date.today() + datetime.timedelta(days=1)
+    template = AvailabilityTemplate(range(5), "09:00", "12:00", start.isoformat(),
+                                    (start + datetime.timedelta(weeks=weeks)).isoformat())
+
+    begin = time.perf_counter()
+
+    for gp_id in range(1000, 1000 + gps):
+        if use_template:
+            gp.add_availability_template(gp_id, template)
+
+        else:
+            for slot in template.expand():
+                gp.update_availability_add(gp_id, slot)
+
+    elapsed = time.perf_counter() - begin
+
+    conn, cursor = connect_to_database(database_path)
+    slots = cursor.execute("SELECT COUNT(*) FROM availability").fetchone()[0]
+    conn.close()
+
+    return elapsed, slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gps', type=int, default=10)
+    parser.add_argument('--weeks', type=int, default=26)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, use_template in (('slot by slot', False), ('template', True)):
+            database_path = os.path.join(directory, name.replace(' ', '_') + '.db')
+            elapsed, slots = onboard(database_path, args.gps, args.weeks, use_template)
+            print('{:<14} {:>8} slots {:>8.2f} s {:>10.0f} slots/s'.format(name, slots, elapsed, slots / elapsed))
+
+        configure_pool()
+
+
+if __name__ == '__main__':
+    main()
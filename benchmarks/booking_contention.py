@@ -0,0 +1,147 @@
+""" Measures booking throughput and double bookings with several processes booking the same slots.
+
+Every process is given the same list of free slots in a different order, as if patients on
+several machines were looking at the same availability table, and tries to book each of them. The
+'check then book' mode is the booking logic before atomic slot claiming: it checks the slot is
+free, inserts the appointment and marks the slot unavailable as separate statements. The 'atomic'
+mode uses Patient.submit_appointment_booking. Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.booking_contention --processes 8 --slots 2000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from store import queries
+from store.conn import connect_to_database, create_database
+from store.patient import Patient
+from store.pool import configure_pool
+from store.user import User
+
+
+# the user ids given to the seeded gp and the first seeded patient.
+GP_ID = 1000
+FIRST_PATIENT_ID = 2000
+
+
+def seed(database_path, processes, slots):
+    """ Creates a gp with the given number of free slots and a patient for every process. """
+
+    create_database(database_path)
+    conn, cursor = connect_to_database(database_path)
+
+    users = [(GP_ID, 'seed.gp@mail.com', 1)]
+    users += [(FIRST_PATIENT_ID + i, 'seed.patient{}@mail.com'.format(i), 2) for i in range(processes)]
+    cursor.executemany("""
+        INSERT INTO user (user_id, email, first_name, last_name, user_status_id, user_role_id)
+        VALUES (?, ?, 'Seed', 'User', 1, ?)""", users)
+
+    cursor.executemany("""
+        INSERT INTO availability (availability_id, doctor_id, datetime, availability_status_id)
+        VALUES (?, ?, ?, 0)""",
+        [(i + 1, GP_ID, '2030-01-01 {:06d}'.format(i)) for i in range(slots)])
+
+    conn.commit()
+    conn.close()
+
+
+def check_then_book(patient, availability_id, patient_id):
+    """ Books a slot the way Patient.submit_appointment_booking did before atomic claiming. """
+
+    status = patient.cursor.execute("""
+        SELECT availability_status_id
+        FROM availability
+        WHERE availability_id = ?""", (availability_id,)).fetchone()[0]
+
+    if status != 0:
+        return False
+
+    patient.cursor.execute(queries.PATIENT_INSERT_APPOINTMENT, (availability_id, patient_id, 'benchmark'))
+    patient.cursor.execute("""
+        UPDATE availability
+        SET availability_status_id = 1
+        WHERE availability_id = ?""", (availability_id,))
+    patient.conn.commit()
+
+    return True
+
+
+def book(database_path, mode, slots, process, start, results):
+    """ Tries to book every slot in a random order and reports the number of successful bookings. """
+
+    configure_pool(database_path=database_path)
+    patient = Patient(User)
+    patient_id = FIRST_PATIENT_ID + process
+
+    slot_ids = list(range(1, slots + 1))
+    random.Random(process).shuffle(slot_ids)
+
+    # wait for the other processes so that they all contend for the database together.
+    start.wait()
+
+    booked = 0
+
+    for availability_id in slot_ids:
+        if mode == 'atomic':
+            booked += patient.submit_appointment_booking(availability_id, patient_id, 'benchmark')
+
+        else:
+            booked += check_then_book(patient, availability_id, patient_id)
+
+    results.put(booked)
+
+
+def run(database_path, mode, processes, slots):
+    """ Runs one contention round.
+
+    Returns:
+        bookings_per_second (float): successful bookings per second over all processes.
+        double_booked (float): the fraction of booked slots with more than one appointment.
+    """
+
+    seed(database_path, processes, slots)
+
+    start = multiprocessing.Barrier(processes + 1)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=book, args=(database_path, mode, slots, i, start, results))
+               for i in range(processes)]
+
+    for worker in workers:
+        worker.start()
+
+    start.wait()
+    began = time.perf_counter()
+
+    booked = sum(results.get() for _ in workers)
+    elapsed = time.perf_counter() - began
+
+    for worker in workers:
+        worker.join()
+
+    conn, cursor = connect_to_database(database_path)
+    claimed, double_booked = cursor.execute("""
+        SELECT COUNT(*), SUM(bookings > 1)
+        FROM (SELECT COUNT(*) AS bookings FROM appointment GROUP BY availability_id)""").fetchone()
+    conn.close()
+
+    return booked / elapsed, (double_booked or 0) / max(claimed, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--slots', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ('check then book', 'atomic'):
+            database_path = os.path.join(directory, mode.replace(' ', '_') + '.db')
+            throughput, double_booked = run(database_path, mode, args.processes, args.slots)
+            print('{:<16} {:>8.0f} bookings/s {:>8.2%} of slots double booked'.format(mode, throughput, double_booked))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+""" Replays a mix of clinic traffic against a seeded database and reports latency per store method.
+
+A database is seeded with the given number of gp's and patients, every slot of the last --years
+years booked and --open-days days of free slots ahead. Each worker process then calls the store
+methods the pages of the application use, chosen at random with the weights in OPERATIONS, for
+--duration seconds: mostly patients searching availability and checking their appointments, gp's
+looking at their day, fewer bookings, logins and admin views. The rows of every query are fetched,
+so the time of each call is the time a page waits for its table. The report gives the count,
+failures, throughput and p50/p95/p99 latency of every method as JSON, to compare runs against each
+other. User.login clears the auth cache (store/passwords.py) first, so it pays for deriving the
+password hash like the first login of a user does, and 'User.login (cached)' is a repeated login
+answered by the cache. Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.clinic_load --workers 4 --duration 30 --output load.json
+
+Pass --database to keep the seeded database, a later run with the same path reuses it.
+"""
+import argparse
+import collections
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.seed import LOCATIONS, SLOT_TIMES, seed_database
+from store.admin import Admin
+from store.conn import connect_to_database
+from store.gp import GP
+from store.passwords import auth_cache
+from store.patient import Patient
+from store.pool import configure_pool
+from store.user import User
+
+
+# the password of every seeded user.
+PASSWORD = 'password'
+
+# store method -> relative share of the calls made to it.
+OPERATIONS = {
+    'User.login': 4,
+    'User.login (cached)': 1,
+    'Patient.search_gp_availability': 30,
+    'Patient.check_appointments': 20,
+    'Patient.submit_appointment_booking': 8,
+    'Patient.search_prescriptions': 5,
+    'GP.display_confirmed_appointments': 15,
+    'GP.display_pending_appointments': 7,
+    'GP.availability_data': 7,
+    'Admin.manage_records': 3,
+}
+
+
+class Workload:
+    """ Makes the calls of one worker process.
+
+    Attributes:
+        rand (random.Random): the random number generator of the worker.
+        gps (list): the (user_id, email) of every seeded gp.
+        patients (list): the (user_id, email) of every seeded patient.
+        open_slots (list): the ids of the free availabilities, shared out between the workers.
+        days (list): the days with slots, as YYYY-MM-DD.
+        upcoming (list): the next two weeks of days, where most lookups happen.
+    """
+
+    def __init__(self, rand, gps, patients, open_slots, days):
+        """ Instatiates the class and initializes internal variables. """
+
+        self.rand = rand
+        self.gps = gps
+        self.patients = patients
+        self.open_slots = open_slots
+        self.days = days
+
+        # the coming two weeks, where most patients look for a slot.
+        today = datetime.date.today().isoformat()
+        self.upcoming = [day for day in days if day >= today][:14] or days
+
+        self.patient = Patient(User)
+        self.gp = GP(User)
+        self.admin = Admin(User)
+
+
+    def day(self):
+        """ Returns a day to look at, one of the next two weeks three times out of four. """
+
+        return self.rand.choice(self.upcoming if self.rand.random() < 0.75 else self.days)
+
+
+    def call(self, operation):
+        """ Calls the store method named operation with random arguments.
+
+        Returns:
+            ok (bool): False if the call did not do what it was asked, e.g. the slot was taken.
+        """
+
+        rand = self.rand
+
+        if operation in ('User.login', 'User.login (cached)'):
+            user_id, email = rand.choice(self.patients + self.gps)
+
+            # the seeded users share one password hash, which every earlier login has cached.
+            if operation == 'User.login':
+                auth_cache.clear()
+
+            user = User.create_user()
+
+            return user.login(user, email, PASSWORD) is not user
+
+        if operation == 'Patient.search_gp_availability':
+            self.patient.search_gp_availability(self.day(), rand.choice(LOCATIONS)).fetchall()
+
+        elif operation == 'Patient.check_appointments':
+            self.patient.check_appointments(rand.choice(self.patients)[0], _now(), rand.choice(['new', 'past']))
+
+        elif operation == 'Patient.submit_appointment_booking':
+            if not self.open_slots:
+                return False
+
+            return self.patient.submit_appointment_booking(self.open_slots.pop(), rand.choice(self.patients)[0],
+                                                           'load test')
+
+        elif operation == 'Patient.search_prescriptions':
+            self.patient.search_prescriptions(rand.choice(self.patients)[0]).fetchall()
+
+        elif operation == 'GP.display_confirmed_appointments':
+            self.gp.display_confirmed_appointments(rand.choice(self.gps)[0], self.day()).fetchall()
+
+        elif operation == 'GP.display_pending_appointments':
+            self.gp.display_pending_appointments(rand.choice(self.gps)[0], self.day()).fetchall()
+
+        elif operation == 'GP.availability_data':
+            self.gp.availability_data(rand.choice(self.gps)[0], self.day()).fetchall()
+
+        elif operation == 'Admin.manage_records':
+            self.admin.manage_records(rand.choice(['All', 'Active GPs', 'Active Patients', 'Pending Patients']))
+
+        return True
+
+
+def _now():
+    """ Returns the current time formatted as the datetimes stored in the availability table. """
+
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+
+
+def seed(database_path, gps, patients, years, open_days, seed):
+    """ Seeds the database, unless it already exists. """
+
+    if os.path.exists(database_path):
+        return
+
+    history_days = int(years * 365)
+    today = datetime.date.today()
+
+    # every slot from the first day of the history up to the end of today is booked.
+    seed_database(database_path, gps=gps, patients=patients,
+                  appointments=gps * len(SLOT_TIMES) * (history_days + 1),
+                  start_date=today - datetime.timedelta(days=history_days),
+                  open_slots=gps * len(SLOT_TIMES) * open_days, seed=seed)
+
+
+def load_fixtures(database_path):
+    """ Reads the seeded users, the free slots and the days with slots from the database. """
+
+    conn, cursor = connect_to_database(database_path)
+
+    gps = cursor.execute("""
+        SELECT user_id, email
+        FROM user
+        WHERE email LIKE 'seed.gp%' AND user_role_id = 1""").fetchall()
+    patients = cursor.execute("""
+        SELECT user_id, email
+        FROM user
+        WHERE email LIKE 'seed.patient%' AND user_role_id = 2""").fetchall()
+    open_slots = [row[0] for row in cursor.execute("""
+        SELECT availability_id
+        FROM availability
+        WHERE availability_status_id = 0""")]
+    days = [row[0] for row in cursor.execute("""
+        SELECT DISTINCT date(datetime)
+        FROM availability
+        ORDER BY 1""")]
+
+    conn.close()
+
+    return gps, patients, open_slots, days
+
+
+def work(database_path, worker, workers, seed, duration, fixtures, start, results):
+    """ Replays the mix of operations for duration seconds and reports the latency of every call. """
+
+    configure_pool(database_path=database_path)
+
+    gps, patients, open_slots, days = fixtures
+    rand = random.Random('{}-{}'.format(seed, worker))
+
+    # every worker books its own share of the free slots.
+    workload = Workload(rand, gps, patients, open_slots[worker::workers], days)
+
+    names = list(OPERATIONS)
+    weights = list(OPERATIONS.values())
+
+    # operation -> latencies in ms, and the number of calls that failed.
+    latencies = collections.defaultdict(list)
+    failures = collections.Counter()
+
+    # wait for the other workers so that they all load the database together.
+    start.wait()
+    deadline = time.perf_counter() + duration
+
+    while time.perf_counter() < deadline:
+        operation = rand.choices(names, weights)[0]
+
+        began = time.perf_counter()
+        ok = workload.call(operation)
+        latencies[operation].append((time.perf_counter() - began) * 1000)
+
+        if not ok:
+            failures[operation] += 1
+
+    results.put((dict(latencies), dict(failures)))
+
+
+def percentile(values, fraction):
+    """ Returns the nearest rank percentile of a sorted list. """
+
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))]
+
+
+def report(latencies, failures, elapsed):
+    """ Summarises the latencies of every operation.
+
+    Args:
+        latencies (dict): operation -> the latencies of its calls in ms, over every worker.
+        failures (dict): operation -> the number of calls that failed.
+        elapsed (float): the seconds the workers ran for.
+
+    Returns:
+        operations (dict): operation -> count, failures, throughput per second and latency
+            percentiles in ms.
+    """
+
+    operations = {}
+
+    for name in OPERATIONS:
+        values = sorted(latencies.get(name, ()))
+
+        if not values:
+            continue
+
+        operations[name] = {
+            'count': len(values),
+            'failures': failures.get(name, 0),
+            'throughput': round(len(values) / elapsed, 1),
+            'p50_ms': round(percentile(values, 0.50), 3),
+            'p95_ms': round(percentile(values, 0.95), 3),
+            'p99_ms': round(percentile(values, 0.99), 3),
+            'max_ms': round(values[-1], 3),
+        }
+
+    return operations
+
+
+def run(database_path, workers, duration, seed):
+    """ Runs the workers against a seeded database.
+
+    Returns:
+        operations (dict): the report of every operation, see report.
+        elapsed (float): the seconds the workers ran for.
+    """
+
+    fixtures = load_fixtures(database_path)
+
+    start = multiprocessing.Barrier(workers + 1)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=work, args=(database_path, worker, workers, seed, duration, fixtures,
+                                                            start, results))
+                 for worker in range(workers)]
+
+    for process in processes:
+        process.start()
+
+    start.wait()
+    began = time.perf_counter()
+
+    latencies = collections.defaultdict(list)
+    failures = collections.Counter()
+
+    for _ in processes:
+        worker_latencies, worker_failures = results.get()
+
+        for name, values in worker_latencies.items():
+            latencies[name].extend(values)
+
+        failures.update(worker_failures)
+
+    elapsed = time.perf_counter() - began
+
+    for process in processes:
+        process.join()
+
+    return report(latencies, failures, elapsed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gps', type=int, default=20)
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--years', type=float, default=1.0, help='years of booked slots before today')
+    parser.add_argument('--open-days', type=int, default=28, help='days of free slots after today')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds every worker runs for')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database', help='path of the seeded database, reused if it exists')
+    parser.add_argument('--output', help='file the JSON report is written to, standard output if not given')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = args.database or os.path.join(directory, 'clinic_load.db')
+
+        began = time.perf_counter()
+        seed(database_path, args.gps, args.patients, args.years, args.open_days, args.seed)
+        seed_seconds = time.perf_counter() - began
+
+        operations, elapsed = run(database_path, args.workers, args.duration, args.seed)
+
+    result = {
+        'config': {name: value for name, value in vars(args).items() if name not in ('database', 'output')},
+        'seed_seconds': round(seed_seconds, 1),
+        'elapsed_seconds': round(elapsed, 1),
+        'throughput': round(sum(operation['count'] for operation in operations.values()) / elapsed, 1),
+        'operations': operations,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(result, output, indent=2)
+
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
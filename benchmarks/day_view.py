@@ -0,0 +1,125 @@
+""" Measures day-view latency as the availability table grows.
+
+The gp day view and the patient availability search are timed with the old date(datetime) = ?
+predicate and the half-open range predicate used by the store. The range predicate should stay
+flat as the table grows while the date() predicate grows linearly. Run from the top level
+directory, e.g.:
+
+    python3 -m benchmarks.day_view --sizes 100000 1000000 10000000 20000000
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from benchmarks.seed import LOCATIONS, SLOT_TIMES, _batched
+from store.conn import connect_to_database, create_database
+from store.storage import Storage
+
+
+GP_DAY_VIEW = {
+    'date()': """
+        SELECT date(datetime), time(datetime)
+        FROM availability
+        WHERE doctor_id = ?
+        AND date(datetime) = ?""",
+    'range': """
+        SELECT date(datetime), time(datetime)
+        FROM availability
+        WHERE doctor_id = ?
+        AND datetime >= ?
+        AND datetime < ?""",
+}
+
+PATIENT_SEARCH = {
+    'date()': """
+        SELECT availability_id, doctor_id, datetime, address, first_name, last_name
+        FROM availability, user
+        WHERE date(datetime) = ?
+        AND location = ?
+        AND availability_status_id = 0
+        AND user_role_id = 1
+        AND availability.doctor_id = user.user_id""",
+    'range': """
+        SELECT availability_id, doctor_id, datetime, address, first_name, last_name
+        FROM availability, user
+        WHERE datetime >= ?
+        AND datetime < ?
+        AND location = ?
+        AND availability_status_id = 0
+        AND user_role_id = 1
+        AND availability.doctor_id = user.user_id""",
+}
+
+
+def timed(cursor, statement, parameters, repeat):
+    """ Returns the average time in milliseconds to execute and fetch a query. """
+
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        cursor.execute(statement, parameters).fetchall()
+
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000, 10000000])
+    parser.add_argument('--gps', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'benchmark.db')
+        create_database(database_path)
+        conn, cursor = connect_to_database(database_path)
+
+        first_gp_id = cursor.execute("SELECT MAX(user_id) + 1 FROM user").fetchone()[0]
+        cursor.executemany("""
+            INSERT INTO user (email, first_name, last_name, address, location, user_status_id, user_role_id)
+            VALUES (?, ?, ?, ?, ?, 1, 1)""",
+            (('bench.gp{}@mail.com'.format(i), 'Gp', str(i), 'practice road', LOCATIONS[i % len(LOCATIONS)])
+             for i in range(args.gps)))
+
+        # the day that is looked up, every later size only appends slots on later days.
+        day = datetime.date(2021, 1, 11)
+        day_start, day_end = Storage.day_range(day.isoformat())
+
+        def slots():
+            current = day
+            while True:
+                for slot_time in SLOT_TIMES:
+                    for gp in range(args.gps):
+                        yield first_gp_id + gp, '{} {}'.format(current.isoformat(), slot_time)
+                current += datetime.timedelta(days=1)
+
+        slot_iterator = slots()
+        rows = 0
+
+        print('{:>12} {:>14} {:>14} {:>14} {:>14}'.format(
+            'rows', 'gp date()', 'gp range', 'search date()', 'search range'))
+
+        for size in sorted(args.sizes):
+            for batch in _batched(range(size - rows)):
+                cursor.executemany("""
+                    INSERT INTO availability (doctor_id, datetime, availability_status_id)
+                    VALUES (?, ?, 0)""", (next(slot_iterator) for _ in batch))
+            conn.commit()
+            rows = size
+
+            results = [
+                timed(cursor, GP_DAY_VIEW['date()'], (first_gp_id, day.isoformat()), args.repeat),
+                timed(cursor, GP_DAY_VIEW['range'], (first_gp_id, day_start, day_end), args.repeat),
+                timed(cursor, PATIENT_SEARCH['date()'], (day.isoformat(), 'London'), args.repeat),
+                timed(cursor, PATIENT_SEARCH['range'], (day_start, day_end, 'London'), args.repeat),
+            ]
+
+            print('{:>12} {:>11.2f} ms {:>11.2f} ms {:>11.2f} ms {:>11.2f} ms'.format(size, *results))
+
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+""" Audits the modules run_app.py imports before its window is shown, against an import time budget.
+
+run_app.py is started in a fresh interpreter with python -X importtime and stopped where it would
+enter the event loop, so only the imports on the way to the first window are measured. The modules
+that are meant to be imported later (the pages of each role, the email and smtplib stack, uic) are
+then imported as well, to report what they cost when a user logs in or an email is sent. Import
+times are the median of the runs, with the bytecode of every module cached. The report lists the
+modules with the highest import time of their own and every budgeted module with its cumulative
+import time, and exits with status 1 if a budget is exceeded or a deferred module was imported
+before the window was shown. Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.import_time --runs 10 --top 20
+"""
+import argparse
+import collections
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the cumulative import time budgets of the modules imported before the window is shown, in ms.
+IMPORT_BUDGETS = {
+    'store.conn': 20.0,
+    'store.maintenance': 3.0,
+    'store.outbox': 5.0,
+    'store.scheduler': 2.0,
+    'pages.login_page': 5.0,
+    'widgets.table_widgets': 3.0,
+    'widgets.lazy_ui': 5.0,
+    'widgets.startup': 1.0,
+}
+
+# modules that must not be imported before the window is shown.
+DEFERRED_MODULES = (
+    'pages.register_page',
+    'pages.admin_page',
+    'pages.gp_page',
+    'pages.patient_page',
+    'store.mailer',
+    'smtplib',
+    'email.mime.text',
+    'PyQt5.uic',
+    'ehealthApp',
+)
+
+# runs run_app.py up to the event loop, then imports the modules given as arguments and exits.
+CHILD = """
+import os, runpy, sys
+from PyQt5.QtWidgets import QApplication
+
+def exec_(app=None):
+    # marks the end of the start up imports in the -X importtime output.
+    sys.stderr.write('import time: window shown\\n')
+    sys.stderr.flush()
+
+    # importlib.import_module is not timed by -X importtime.
+    for name in sys.argv[2:]:
+        __import__(name)
+
+    os._exit(0)
+
+QApplication.exec_ = exec_
+runpy.run_path(os.path.join(sys.argv[1], 'run_app.py'), run_name='__main__')
+"""
+
+# one module imported during a run, times are in microseconds.
+Import = collections.namedtuple('Import', ['name', 'depth', 'own', 'cumulative', 'startup'])
+
+
+def parse_importtime(output):
+    """ Parses the output of python -X importtime.
+
+    Args:
+        output (str): the standard error of the interpreter.
+
+    Returns:
+        imports (list): an Import for every module, in the order their imports finished. The
+            startup field is False for the modules imported after 'import time: window shown'.
+    """
+
+    imports = []
+    startup = True
+
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        fields = line[len('import time:'):].split('|')
+
+        if len(fields) != 3:
+            # the marker written by the child.
+            startup = startup and 'window shown' not in line
+            continue
+
+        if not fields[0].strip().isdigit():
+            # the header line.
+            continue
+
+        indented_name = fields[2].rstrip()
+        name = indented_name.lstrip()
+        depth = (len(indented_name) - len(name) - 1) // 2
+
+        imports.append(Import(name, depth, int(fields[0]), int(fields[1]), startup))
+
+    return imports
+
+
+def top_level_importers(imports):
+    """ Returns the module imported at the top level that pulled in each module.
+
+    Args:
+        imports (list): the Imports of one run, as returned by parse_importtime.
+
+    Returns:
+        importers (dict): module name -> the name of the top level import it happened under.
+    """
+
+    importers = {}
+    pending = []
+
+    # nested imports finish, and are printed, before the import that triggered them.
+    for record in imports:
+        pending.append(record.name)
+
+        if record.depth == 0:
+            for name in pending:
+                importers[name] = record.name
+
+            pending = []
+
+    return importers
+
+
+def measure(runs):
+    """ Runs run_app.py with -X importtime runs times.
+
+    Returns:
+        imports (list): the Imports of every run, each a list.
+    """
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    # measure imports the way an installed application does them, with cached bytecode.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    results = []
+
+    # run_app.py creates its database in the working directory.
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, 'store'))
+        os.symlink(os.path.join(ROOT, 'images'), os.path.join(directory, 'images'))
+
+        # the first run creates the database and compiles the bytecode and the ui cache, it is not
+        # measured.
+        for run in range(runs + 1):
+            output = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, ROOT] + list(DEFERRED_MODULES),
+                                    cwd=directory, env=env, check=True, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE, universal_newlines=True).stderr
+
+            if run:
+                results.append(parse_importtime(output))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15, help='the number of modules listed by their own import time')
+    args = parser.parse_args()
+
+    runs = measure(args.runs)
+
+    own = collections.defaultdict(list)
+    cumulative = collections.defaultdict(list)
+
+    for imports in runs:
+        for record in imports:
+            own[record.name].append(record.own / 1000)
+            cumulative[record.name].append(record.cumulative / 1000)
+
+    startup_modules = {record.name for record in runs[0] if record.startup}
+    importers = top_level_importers([record for record in runs[0] if record.startup])
+    total = statistics.median(sum(record.own for record in imports if record.startup) / 1000 for imports in runs)
+
+    print('imports before the window is shown: {} modules, {:.1f} ms'.format(len(startup_modules), total))
+    print()
+    print('{:<36} {:>8} {:>10}  {}'.format('module', 'own ms', 'total ms', 'imported under'))
+
+    slowest = sorted(startup_modules, key=lambda name: statistics.median(own[name]), reverse=True)
+
+    for name in slowest[:args.top]:
+        print('{:<36} {:>8.2f} {:>10.2f}  {}'.format(name, statistics.median(own[name]),
+                                                     statistics.median(cumulative[name]), importers[name]))
+
+    print()
+    print('{:<36} {:>8} {:>10}  {}'.format('budgeted module', 'budget', 'total ms', 'status'))
+
+    failed = False
+
+    for name, budget in IMPORT_BUDGETS.items():
+        if name not in startup_modules:
+            print('{:<36} {:>8.1f} {:>10}  {}'.format(name, budget, '-', 'not imported'))
+            continue
+
+        median = statistics.median(cumulative[name])
+        failed = failed or median > budget
+        print('{:<36} {:>8.1f} {:>10.2f}  {}'.format(name, budget, median, 'ok' if median <= budget else 'OVER BUDGET'))
+
+    print()
+    print('{:<36} {:>8} {:>10}  {}'.format('deferred module', '', 'total ms', 'status'))
+
+    for name in DEFERRED_MODULES:
+        # a module imported by an earlier deferred module has no import time of its own.
+        median = statistics.median(cumulative[name]) if name in cumulative else 0.0
+
+        if name in startup_modules:
+            failed = True
+            print('{:<36} {:>8} {:>10.2f}  {}'.format(name, '', median, 'IMPORTED AT START UP'))
+
+        else:
+            print('{:<36} {:>8} {:>10.2f}  {}'.format(name, '', median, 'deferred'))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
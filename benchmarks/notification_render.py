@@ -0,0 +1,88 @@
+""" Measures notification rendering throughput in messages per second.
+
+The legacy renderer builds every body by string concatenation inside the loop, branching on the
+appointment status, and creates a single part html MIMEText per recipient. The template engine in
+store/templates.py renders compiled html and plain text templates in one pass over the batch, and
+is measured both for the bodies alone and for complete multipart/alternative messages. Run from the
+top level directory, e.g.:
+
+    python3 -m benchmarks.notification_render --recipients 20000
+"""
+import argparse
+import time
+from email.mime.text import MIMEText
+
+from store.templates import build_message, render_batch
+
+
+SENDER = 'uclpatientsystem@gmail.com'
+SUBJECT = 'e-Health patient management system'
+
+
+def render_legacy(status, recipients):
+    """ Renders html only messages the way send_email_gmail.emails used to. """
+
+    messages = []
+
+    for fields in recipients:
+        if status == 1:
+            body = "Hi\n" + fields['first_name'] + ":<p>Please don't forget you have an appointment tomorrow at " + \
+                   fields['time'] + ".</p>Best,"
+        elif status == 0:
+            body = "Hi\n" + fields['first_name'] + ":<p>Your appointment request for tomorrow at " + fields['time'] + \
+                   " has been cancelled by the system because it has not been confirmed by the GP.</p>Best,"
+        else:
+            body = "Hi\n" + fields['first_name'] + ":<p>Sorry, your appointment for tomorrow at " + fields['time'] + \
+                   " has been cancelled by the GP.</p>Best,"
+
+        msg = MIMEText(body, 'html', 'utf-8')
+        msg['from'] = SENDER
+        msg['to'] = fields['receiver']
+        msg['subject'] = SUBJECT
+        messages.append(msg)
+
+    return messages
+
+
+def render_bodies(status, recipients):
+    """ Renders the html and plain text bodies with the template engine. """
+
+    return list(render_batch(NOTIFICATIONS[status], recipients))
+
+
+def render_messages(status, recipients):
+    """ Renders complete multipart/alternative messages with the template engine. """
+
+    return [build_message(SENDER, fields['receiver'], subject, body, text_body)
+            for fields, subject, body, text_body in render_batch(NOTIFICATIONS[status], recipients)]
+
+
+# the template names used by send_email_gmail.emails, repeated so the benchmark does not import the
+# database layer.
+NOTIFICATIONS = {1: 'appointment_reminder', 0: 'request_cancelled_by_system', -1: 'cancelled_by_gp'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipients', type=int, default=20000)
+    args = parser.parse_args()
+
+    recipients = [{'receiver': 'seed.patient{}@mail.com'.format(i), 'first_name': 'Patient{}'.format(i),
+                   'time': '{:02d}:{:02d}'.format(8 + i % 10, 15 * (i % 4))}
+                  for i in range(args.recipients)]
+
+    for name, function in (
+            ('legacy (html only)', render_legacy),
+            ('templates (bodies)', render_bodies),
+            ('templates (multipart)', render_messages)):
+        start = time.perf_counter()
+
+        for status in (1, 0, -1):
+            function(status, recipients)
+
+        elapsed = time.perf_counter() - start
+        print('{:<24} {:>10.0f} messages/s'.format(name, 3 * len(recipients) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
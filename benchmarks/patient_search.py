@@ -0,0 +1,121 @@
+""" Measures GP patient search latency with LIKE against the FTS5 full text index.
+
+The database is seeded with patients whose names are drawn from a synthetic vocabulary, so a search
+term matches a realistic share of the patients. Every query is run with the LIKE search used before
+migration 7, which scans the whole user table, and with GP.search_patients on the user_search index.
+Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.patient_search --patients 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.seed import LOCATIONS, _batched, seed_database
+from store import queries
+from store.conn import connect_to_database
+from store.search import SEARCH_LIMIT, match_expression
+
+
+SYLLABLES = ['al', 'an', 'bel', 'bri', 'car', 'da', 'el', 'fer', 'gar', 'ha', 'is', 'jo', 'ka', 'li',
+             'mar', 'mo', 'na', 'ol', 'pe', 'ra', 'ro', 'sa', 'ste', 'ta', 'tho', 'va', 'wil', 'zo']
+
+
+def vocabulary(rand, size, syllables):
+    """ Returns size distinct capitalised names made of the given number of syllables. """
+
+    names = set()
+
+    while len(names) < size:
+        names.add(''.join(rand.choice(SYLLABLES) for _ in range(syllables)).capitalize())
+
+    return sorted(names)
+
+
+def insert_patients(cursor, rand, patients, first_names, last_names, password):
+    """ Inserts active patients with random names, the user_search triggers index them. """
+
+    for batch in _batched(range(patients)):
+        cursor.executemany("""
+            INSERT INTO user (email, password, first_name, last_name, phone_num, address, location,
+                              user_status_id, user_role_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, 2)""",
+            (('search.patient{}@mail.com'.format(i), password, rand.choice(first_names),
+              rand.choice(last_names), '07{:09d}'.format(rand.randrange(10 ** 9)),
+              '{} {} street'.format(i % 500, rand.choice(last_names)), LOCATIONS[i % len(LOCATIONS)])
+             for i in batch))
+
+
+def search_like(cursor, text):
+    sql_prepared_name = "%" + text + "%"
+    return cursor.execute(queries.GP_SEARCH_PATIENTS_BY_NAME,
+                          (sql_prepared_name, sql_prepared_name, SEARCH_LIMIT)).fetchall()
+
+
+def search_full_text(cursor, text):
+    return cursor.execute(queries.GP_SEARCH_PATIENTS_FULL_TEXT, (match_expression(text), SEARCH_LIMIT)).fetchall()
+
+
+def timed(function, cursor, terms, repeat):
+    """ Returns the average time in milliseconds and the average number of rows of a search. """
+
+    rows = 0
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        for term in terms:
+            rows += len(function(cursor, term))
+
+    calls = repeat * len(terms)
+
+    return (time.perf_counter() - start) / calls * 1000, rows / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rand = random.Random(0)
+    first_names = vocabulary(rand, 2000, 3)
+    last_names = vocabulary(rand, 10000, 4)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'benchmark.db')
+        seed_database(database_path, gps=10, patients=0, appointments=0)
+        conn, cursor = connect_to_database(database_path)
+        password = cursor.execute("SELECT password FROM user WHERE user_role_id = 1").fetchone()[0]
+
+        first_patient_id = cursor.execute("SELECT MAX(user_id) + 1 FROM user").fetchone()[0]
+        start = time.perf_counter()
+        insert_patients(cursor, rand, args.patients, first_names, last_names, password)
+        conn.commit()
+        print('seeded {} patients in {:.1f}s (including the full text index)'.format(
+            args.patients, time.perf_counter() - start))
+
+        # a full first name, a first name prefix, a full name and a phone number prefix. The LIKE
+        # search only looks at names, so it finds no phone numbers.
+        searches = {
+            'first name': [rand.choice(first_names) for _ in range(10)],
+            'name prefix': [rand.choice(first_names)[:3] for _ in range(10)],
+            'full name': [cursor.execute("SELECT first_name || ' ' || last_name FROM user WHERE user_id = ?",
+                                         (first_patient_id + rand.randrange(args.patients),)).fetchone()[0]
+                          for _ in range(10)],
+            'phone prefix': ['07{:04d}'.format(rand.randrange(10000)) for _ in range(10)],
+        }
+
+        print('{:<14} {:>14} {:>8} {:>14} {:>8}'.format('search', 'LIKE ms', 'rows', 'FTS5 ms', 'rows'))
+
+        for name, terms in searches.items():
+            like_ms, like_rows = timed(search_like, cursor, terms, args.repeat)
+            fts_ms, fts_rows = timed(search_full_text, cursor, terms, args.repeat)
+            print('{:<14} {:>14.2f} {:>8.1f} {:>14.2f} {:>8.1f}'.format(name, like_ms, like_rows, fts_ms, fts_rows))
+
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
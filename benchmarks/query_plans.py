@@ -0,0 +1,113 @@
+""" Shows the query plans of the hot store lookups before and after the schema migrations.
+
+Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.query_plans --appointments 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.seed import seed_database
+from store.conn import connect_to_database, migrate_database
+
+
+# representative lookups made by the store classes, paired with sample parameters.
+QUERIES = {
+    'GP.availability_data': ("""
+        SELECT date(datetime), time(datetime)
+        FROM availability
+        WHERE doctor_id = ?
+        AND datetime >= ? AND datetime < ?""", (10, '2021-01-11', '2021-01-12')),
+
+    'GP.display_confirmed_appointments': ("""
+        SELECT appointment_id, user_id, first_name, last_name, time(datetime), appointment_status_name
+        FROM user, appointment, availability, appointment_status
+        WHERE user.user_id = patient_id
+        AND appointment.availability_id = availability.availability_id
+        AND appointment.appointment_status_id = appointment_status.appointment_status_id
+        AND datetime >= ? AND datetime < ?
+        AND doctor_id = ?""", ('2021-01-11', '2021-01-12', 10)),
+
+    'Patient.check_appointments': ("""
+        SELECT appointment_id, appointment_status_name, datetime, email, doctor_id
+        FROM appointment, availability, user, appointment_status
+        WHERE appointment.patient_id = ?
+        AND datetime > ?
+        AND appointment.appointment_status_id = appointment_status.appointment_status_id
+        AND appointment.availability_id = availability.availability_id
+        AND availability.doctor_id = user.user_id""", (500, '2021-01-11 00:00')),
+
+    'Patient.search_prescriptions': ("""
+        SELECT medical_record.appointment_id, datetime, diagnosis, prescription_info
+        FROM appointment, availability, medical_record
+        WHERE appointment.patient_id = ?
+        AND appointment.appointment_status_id IN (2, 3)
+        AND medical_record.appointment_id = appointment.appointment_id
+        AND appointment.availability_id = availability.availability_id""", (500,)),
+
+    'emails': ("""
+        SELECT datetime, email, first_name, appointment_id
+        FROM appointment, availability, user
+        WHERE +appointment.appointment_status_id = ?
+        AND availability.datetime >= ? AND availability.datetime < ?
+        AND appointment.availability_id = availability.availability_id
+        AND appointment.patient_id = user.user_id""", (-1, '2021-01-11', '2021-01-12')),
+
+    'Admin.manage_records': ("""
+        SELECT user_id, email, first_name, last_name
+        FROM user
+        WHERE user_status_id = ? AND user_role_id = ?""", (0, 1)),
+}
+
+
+def explain(cursor):
+    """ Prints the query plan and the average execution time of every representative query. """
+
+    for name, (statement, parameters) in QUERIES.items():
+        plan = cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+
+        start = time.perf_counter()
+        for _ in range(5):
+            cursor.execute(statement, parameters).fetchall()
+        elapsed = (time.perf_counter() - start) / 5
+
+        print('{} ({:.2f} ms)'.format(name, elapsed * 1000))
+
+        for row in plan:
+            print('    ' + row[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--appointments', type=int, default=1000000)
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--gps', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'benchmark.db')
+
+        start = time.perf_counter()
+        seed_database(database_path, gps=args.gps, patients=args.patients,
+                      appointments=args.appointments, migrate=False)
+        print('seeded {} appointments in {:.1f} s\n'.format(args.appointments, time.perf_counter() - start))
+
+        conn, cursor = connect_to_database(database_path)
+
+        print('--- before migrations ---')
+        explain(cursor)
+
+        start = time.perf_counter()
+        version = migrate_database(conn, cursor)
+        print('\nmigrated to schema version {} in {:.1f} s\n'.format(version, time.perf_counter() - start))
+
+        print('--- after migrations ---')
+        explain(cursor)
+
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import datetime
+import random
+
+from store.conn import connect_to_database, create_database
+from store.passwords import hash_password
+
+
+# locations offered by the registration and booking pages.
+LOCATIONS = ['London', 'Birmingham', 'Sheffield', 'Manchester']
+
+# the 15 minute appointment slots a gp can select on the manage availability page.
+SLOT_TIMES = ['{:02d}:{:02d}'.format(8 + (30 + 15 * i) // 60, (30 + 15 * i) % 60) for i in range(36)]
+
+# number of rows inserted per executemany call while seeding.
+BATCH_SIZE = 50000
+
+
+def _batched(rows, size=BATCH_SIZE):
+    """ Splits an iterable of rows into lists of at most size rows. """
+
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def seed_database(database_path, gps=100, patients=10000, appointments=100000, start_date=None,
+                  migrate=True, seed=0, open_slots=0):
+    """ Creates a database filled with synthetic users, availabilities and appointments.
+
+    Every gp gets consecutive slots starting from start_date, one appointment is booked for each of
+    the first 'appointments' slots by a random patient. Appointments in the past are given a
+    completed status, future ones are either pending or confirmed. The open_slots slots that follow
+    the booked ones are left free to book.
+
+    Args:
+        database_path (string): path of the database file to create.
+        gps (int): number of gp accounts to create.
+        patients (int): number of patient accounts to create.
+        appointments (int): number of booked appointments (and availabilities) to create.
+        start_date (datetime.date): the day of the first slot, defaults to a year ago.
+        migrate (bool): whether to upgrade the schema to the latest version.
+        seed (int): seed of the random number generator so runs can be compared.
+        open_slots (int): number of free availabilities created after the booked ones.
+    """
+
+    rand = random.Random(seed)
+    create_database(database_path, migrate=migrate)
+    conn, cursor = connect_to_database(database_path)
+
+    if start_date is None:
+        start_date = datetime.date.today() - datetime.timedelta(days=365)
+
+    # one hash is shared by every seeded user, hashing each password would dominate seeding.
+    password = hash_password('password')
+
+    # gp's are inserted first so that their user ids are contiguous.
+    first_gp_id = cursor.execute("SELECT IFNULL(MAX(user_id), 0) + 1 FROM user").fetchone()[0]
+    cursor.executemany("""
+        INSERT INTO user (email, password, first_name, last_name, phone_num, address, location,
+                          user_status_id, user_role_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)""",
+        (('seed.gp{}@mail.com'.format(i), password, 'Gp{}'.format(i), 'Doctor{}'.format(i),
+          '07000000000', '{} practice road'.format(i), LOCATIONS[i % len(LOCATIONS)], 1)
+         for i in range(gps)))
+
+    first_patient_id = first_gp_id + gps
+
+    for batch in _batched(range(patients)):
+        cursor.executemany("""
+            INSERT INTO user (email, password, first_name, last_name, phone_num, address, location,
+                              user_status_id, user_role_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)""",
+            (('seed.patient{}@mail.com'.format(i), password, 'Patient{}'.format(i),
+              'Surname{}'.format(rand.randrange(patients)), '07{:09d}'.format(i),
+              '{} patient street'.format(i), LOCATIONS[i % len(LOCATIONS)], 2)
+             for i in batch))
+
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    def slots():
+        # walk the calendar one day at a time handing out every slot of every gp.
+        day = start_date
+        while True:
+            for slot_time in SLOT_TIMES:
+                for gp in range(gps):
+                    yield first_gp_id + gp, '{} {}'.format(day.isoformat(), slot_time)
+            day += datetime.timedelta(days=1)
+
+    first_availability_id = cursor.execute(
+        "SELECT IFNULL(MAX(availability_id), 0) + 1 FROM availability").fetchone()[0]
+
+    slot_iterator = slots()
+    availability_id = first_availability_id
+
+    for batch in _batched(range(appointments)):
+        availability_rows = []
+        appointment_rows = []
+
+        for _ in batch:
+            doctor_id, slot = next(slot_iterator)
+
+            if slot < now:
+                status = rand.choice([2, 3, 3, -2, -3])
+            else:
+                status = rand.choice([0, 1, 1])
+
+            availability_rows.append((availability_id, doctor_id, slot, 1))
+            appointment_rows.append((availability_id, status, first_patient_id + rand.randrange(patients),
+                                     'seeded appointment'))
+            availability_id += 1
+
+        cursor.executemany("""
+            INSERT INTO availability (availability_id, doctor_id, datetime, availability_status_id)
+            VALUES (?, ?, ?, ?)""", availability_rows)
+        cursor.executemany("""
+            INSERT INTO appointment (availability_id, appointment_status_id, patient_id, patient_summary)
+            VALUES (?, ?, ?, ?)""", appointment_rows)
+
+    # the slots that follow the booked ones are left free.
+    for batch in _batched(range(open_slots)):
+        cursor.executemany("""
+            INSERT INTO availability (availability_id, doctor_id, datetime, availability_status_id)
+            VALUES (?, ?, ?, 0)""",
+            [(availability_id + i,) + next(slot_iterator) for i in range(len(batch))])
+        availability_id += len(batch)
+
+    conn.commit()
+    conn.close()
@@ -0,0 +1,86 @@
+""" Measures the time from launching run_app.py to the first paint of its window.
+
+run_app.py is started in a fresh interpreter for every run, in a scratch directory holding a seeded
+database, once with every page built up front (UCLH_EAGER_UI=1) and once with the pages built on
+first use (widgets/lazy_ui.py). The time to first window includes starting the interpreter and
+every import. Windows are painted on the offscreen platform unless QT_QPA_PLATFORM says otherwise.
+Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.startup --runs 10 --appointments 200000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.seed import seed_database
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs run_app.py and prints the time of the first paint of its window instead of entering the
+# event loop.
+CHILD = """
+import os, runpy, sys, time
+from PyQt5.QtWidgets import QApplication, QMainWindow
+from widgets.startup import after_first_paint
+
+def first_paint():
+    print(time.time(), flush=True)
+    os._exit(0)
+
+def exec_(app):
+    # the pages are main windows as well, but only the application window is shown.
+    window = [widget for widget in app.topLevelWidgets() if isinstance(widget, QMainWindow) and widget.isVisible()][0]
+    after_first_paint(window, first_paint)
+    return QApplication.exec()
+
+QApplication.exec_ = exec_
+runpy.run_path(os.path.join(sys.argv[1], 'run_app.py'), run_name='__main__')
+"""
+
+
+def time_to_first_window(directory, eager):
+    """ Launches run_app.py and returns the seconds until its window was first painted. """
+
+    env = dict(os.environ, PYTHONPATH=ROOT, UCLH_EAGER_UI='1' if eager else '0')
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    # every launch after the first imports the cached bytecode, like an installed application.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    start = time.time()
+    output = subprocess.run([sys.executable, '-c', CHILD, ROOT], cwd=directory, env=env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+
+    return float(output.split()[-1]) - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--appointments', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, 'store'))
+        os.symlink(os.path.join(ROOT, 'images'), os.path.join(directory, 'images'))
+        seed_database(os.path.join(directory, 'store', 'UCLH.db'), appointments=args.appointments)
+
+        # the first launches also compile the window and the bytecode of every module, they are not
+        # measured.
+        time_to_first_window(directory, eager=True)
+        time_to_first_window(directory, eager=False)
+
+        print('{:<28} {:>10} {:>10}'.format('window', 'median ms', 'min ms'))
+
+        for name, eager in (('every page', True), ('login pages (LazyUi)', False)):
+            times = [time_to_first_window(directory, eager) * 1000 for _ in range(args.runs)]
+            print('{:<28} {:>10.1f} {:>10.1f}'.format(name, statistics.median(times), min(times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+""" Measures the start up sweep of past appointments as the appointment history grows.
+
+The row by row loop run_app.py used to run (select every pending and confirmed appointment into
+Python, then update past ones one at a time) is timed against store.maintenance's set based sweep,
+both on its first run and on a later run that only looks past the watermark. Half of the seeded
+appointments lie in the future. Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.startup_sweep --sizes 100000 1000000
+"""
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.seed import SLOT_TIMES, seed_database
+from store.conn import connect_to_database
+from store.maintenance import sweep_appointment_statuses
+
+
+# the number of gp's seeded, each with a slot at every SLOT_TIMES time of the day.
+GPS = 100
+
+LEGACY_SWEEP = [
+    ("""SELECT appointment_id, datetime FROM availability, appointment
+        WHERE appointment_status_id = 1 AND availability.availability_id = appointment.availability_id""",
+     """UPDATE appointment SET appointment_status_id = 4 WHERE appointment_id = ?"""),
+    ("""SELECT appointment_id, datetime FROM availability, appointment
+        WHERE appointment_status_id = 0 AND availability.availability_id = appointment.availability_id""",
+     """UPDATE appointment SET appointment_status_id = -4 WHERE appointment_id = ?"""),
+]
+
+
+def legacy_sweep(conn):
+    """ The start up sweep of run_app.py before the set based sweep. """
+
+    now_formatted = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    cursor = conn.cursor()
+
+    for query_select, query_update in LEGACY_SWEEP:
+        for appointment_id, slot in cursor.execute(query_select).fetchall():
+            if slot < now_formatted:
+                cursor.execute(query_update, (appointment_id,))
+
+    conn.commit()
+
+
+def timed(function, *args):
+    """ Returns the time in milliseconds taken to call function. """
+
+    start = time.perf_counter()
+    function(*args)
+
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    args = parser.parse_args()
+
+    print('{:>10} {:>14} {:>14} {:>14}'.format('appointments', 'row by row', 'first sweep', 'next sweep'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            seeded_path = os.path.join(directory, 'seeded.db')
+            days = size // (GPS * len(SLOT_TIMES)) // 2
+            seed_database(seeded_path, gps=GPS, patients=10000, appointments=size,
+                          start_date=datetime.date.today() - datetime.timedelta(days=days))
+
+            legacy_path = os.path.join(directory, 'legacy.db')
+            shutil.copy(seeded_path, legacy_path)
+            conn, cursor = connect_to_database(legacy_path)
+            legacy = timed(legacy_sweep, conn)
+            conn.close()
+
+            conn, cursor = connect_to_database(seeded_path)
+            first = timed(sweep_appointment_statuses, conn)
+            following = timed(sweep_appointment_statuses, conn)
+            conn.close()
+
+            print('{:>12} {:>11.1f} ms {:>11.1f} ms {:>11.1f} ms'.format(size, legacy, first, following))
+
+            for path in (seeded_path, legacy_path):
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
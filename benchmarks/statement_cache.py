@@ -0,0 +1,93 @@
+""" Measures the per-call overhead of str.format SQL against the parameterized query registry.
+
+Every call uses different values, so a formatted statement is new SQL text that has to be parsed
+and planned again, while a registry statement is found in the connection's statement cache. The
+database is kept small so that parsing rather than data access dominates. Run from the top level
+directory, e.g.:
+
+    python3 -m benchmarks.statement_cache --calls 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.seed import seed_database
+from store import queries
+from store.conn import connect_to_database
+from store.storage import Storage
+
+
+def login_formatted(cursor, email):
+    cursor.execute("""
+        SELECT user_id, password, user_role_id, user_status_id, first_name, last_name
+        FROM user
+        WHERE email = '{}'""".format(email)).fetchone()
+
+
+def login_registry(cursor, email):
+    cursor.execute(queries.USER_LOGIN, (email,)).fetchone()
+
+
+def day_view_formatted(cursor, gp_id, day):
+    day_start, day_end = Storage.day_range(day)
+    cursor.execute("""
+        SELECT date(datetime), time(datetime)
+        FROM availability
+        WHERE doctor_id = '{}'
+        AND datetime >= '{}'
+        AND datetime < '{}'""".format(gp_id, day_start, day_end)).fetchall()
+    cursor.execute("""
+        SELECT availability_id, doctor_id, datetime, address, first_name, last_name
+        FROM availability, user
+        WHERE datetime >= '{}'
+        AND datetime < '{}'
+        AND location = '{}'
+        AND availability_status_id = 0
+        AND user_role_id = 1
+        AND availability.doctor_id = user.user_id """.format(day_start, day_end, 'London')).fetchall()
+
+
+def day_view_registry(cursor, gp_id, day):
+    day_start, day_end = Storage.day_range(day)
+    cursor.execute(queries.GP_AVAILABILITY_DATA, (gp_id, day_start, day_end)).fetchall()
+    cursor.execute(queries.PATIENT_SEARCH_GP_AVAILABILITY, (day_start, day_end, 'London')).fetchall()
+
+
+def timed(function, arguments):
+    """ Returns the average time in microseconds of calling function with each set of arguments. """
+
+    start = time.perf_counter()
+
+    for argument in arguments:
+        function(*argument)
+
+    return (time.perf_counter() - start) / len(arguments) * 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'benchmark.db')
+        seed_database(database_path, gps=20, patients=2000, appointments=5000)
+        conn, cursor = connect_to_database(database_path)
+
+        logins = [(cursor, 'seed.patient{}@mail.com'.format(i % 2000)) for i in range(args.calls)]
+        day_views = [(cursor, 4 + i % 20, '2021-{:02d}-{:02d}'.format(1 + i % 12, 1 + i % 28))
+                     for i in range(args.calls)]
+
+        for name, function, arguments in (
+                ('login (str.format)', login_formatted, logins),
+                ('login (registry)', login_registry, logins),
+                ('day view (str.format)', day_view_formatted, day_views),
+                ('day view (registry)', day_view_registry, day_views)):
+            print('{:<24} {:>8.1f} us/call'.format(name, timed(function, arguments)))
+
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
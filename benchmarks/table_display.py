@@ -0,0 +1,89 @@
+""" Measures the time to display a resultset in a table, QTableWidget items against QueryTableModel.
+
+The legacy display clears a QTableWidget and creates a QTableWidgetItem for every cell, the way
+widgets.table_widgets.table_display_data used to. The model backed view only fetches the rows the
+table has room for and formats the cells it paints. Both tables are shown on the offscreen platform
+unless QT_QPA_PLATFORM says otherwise. Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.table_display --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import QtWidgets
+
+from widgets.table_model import QueryTableModel
+
+
+HEADERS = ['UserID', 'Email', 'FirstName', 'LastName', 'PhoneNum', 'Location', 'Address', 'Status', 'Role']
+
+
+def legacy_table():
+    """ Returns the QTableWidget the pages used to display resultsets in. """
+
+    table_widget = QtWidgets.QTableWidget(0, len(HEADERS))
+    table_widget.setHorizontalHeaderLabels(HEADERS)
+    return table_widget
+
+
+def model_table():
+    """ Returns a QTableView like the ones widgets.table_widgets.install_table_views creates. """
+
+    view = QtWidgets.QTableView()
+    view.setModel(QueryTableModel(HEADERS, view))
+    return view
+
+
+def display_legacy(app, table_widget, rows):
+    """ Displays the rows in a QTableWidget with one item per cell. """
+
+    table_widget.setRowCount(0)
+
+    for row_number, row_data in enumerate(rows):
+        table_widget.insertRow(row_number)
+
+        for column_number, data in enumerate(row_data):
+            table_widget.setItem(row_number, column_number, QtWidgets.QTableWidgetItem(str(data)))
+
+    app.processEvents()
+
+
+def display_model(app, view, rows):
+    """ Displays the rows in a QTableView backed by a QueryTableModel. """
+
+    view.model().set_rows(rows)
+    app.processEvents()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+
+    rows = [(i, 'seed.patient{}@mail.com'.format(i), 'Patient{}'.format(i), 'Seed', '07{:09d}'.format(i),
+             'London', '{} Gower street'.format(i % 500), 'ACTIVE', 'PATIENT')
+            for i in range(args.rows)]
+
+    for name, create, display in (('QTableWidget items', legacy_table, display_legacy),
+                                  ('QueryTableModel', model_table, display_model)):
+        # the table is shown before timing so only displaying the rows is measured.
+        table = create()
+        table.resize(811, 571)
+        table.show()
+        app.processEvents()
+
+        start = time.perf_counter()
+        display(app, table, rows)
+        elapsed = time.perf_counter() - start
+        print('{:<20} {:>10.1f} ms ({} rows fetched)'.format(name, elapsed * 1000, table.model().rowCount()))
+        table.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+""" Measures the time to import and set up the window, uic.loadUi against the compiled ui cache.
+
+Every run happens in a fresh interpreter, so the import of the ui modules is measured along with
+setupUi. The window is built either from ehealthApp.ui with uic.loadUi (development mode,
+UCLH_UI_DEV=1) or from the modules widgets.lazy_ui compiles from it into a scratch cache directory,
+once with every page and once with the login pages only. The checked in ehealthApp.py is measured
+for reference. The cache is filled by a first run that is not measured. Run from the top level
+directory, e.g.:
+
+    python3 -m benchmarks.ui_loading --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# prints the seconds it took to import the ui module named by the first argument and set up a window.
+CHILD = """
+import sys, time
+from PyQt5.QtWidgets import QApplication, QMainWindow
+
+app = QApplication(sys.argv)
+window = QMainWindow()
+start = time.perf_counter()
+
+if sys.argv[1] == 'ehealthApp':
+    from ehealthApp import Ui_App_GUI
+    ui = Ui_App_GUI()
+
+else:
+    from widgets.lazy_ui import EAGER_PAGES, LazyUi
+    ui = LazyUi(eager_pages=None if sys.argv[2] == 'all' else EAGER_PAGES)
+
+ui.setupUi(window)
+print(time.perf_counter() - start)
+"""
+
+# name, module, pages, development mode.
+MODES = (
+    ('ehealthApp.py', 'ehealthApp', 'all', '0'),
+    ('uic.loadUi, every page', 'lazy_ui', 'all', '1'),
+    ('compiled, every page', 'lazy_ui', 'all', '0'),
+    ('uic.loadUi, login pages', 'lazy_ui', 'login', '1'),
+    ('compiled, login pages', 'lazy_ui', 'login', '0'),
+)
+
+
+def setup_time(cache_dir, module, pages, development):
+    """ Sets up the window in a fresh interpreter and returns the seconds it took. """
+
+    env = dict(os.environ, PYTHONPATH=ROOT, UCLH_UI_CACHE=cache_dir, UCLH_UI_DEV=development)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    # the compiled modules are only faster to import once their bytecode is cached.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    output = subprocess.run([sys.executable, '-c', CHILD, module, pages], cwd=ROOT, env=env, check=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+
+    return float(output.split()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print('{:<26} {:>10} {:>10}'.format('window', 'median ms', 'min ms'))
+
+        for name, module, pages, development in MODES:
+            # compiles the fragments and the bytecode of every module, it is not measured.
+            setup_time(cache_dir, module, pages, development)
+
+            times = [setup_time(cache_dir, module, pages, development) * 1000 for _ in range(args.runs)]
+            print('{:<26} {:>10.1f} {:>10.1f}'.format(name, statistics.median(times), min(times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+""" Compares write throughput of the sqlite default settings with the deployment pragmas.
+
+Each write inserts and commits a single availability row, the same pattern as a gp ticking one
+slot on the manage availability page. Run from the top level directory, e.g.:
+
+    python3 -m benchmarks.write_throughput --writes 2000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from store.conn import connect_to_database, create_database
+
+
+# the settings used before the connection configuration layer, sqlite's own defaults.
+LEGACY_PRAGMAS = {
+    'auto_vacuum': 'NONE',
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'cache_size': -2000,
+    'mmap_size': 0,
+    'temp_store': 'DEFAULT',
+    'busy_timeout': 5000,
+    'foreign_keys': 'OFF',
+}
+
+
+def run(database_path, pragmas, writes, readers):
+    """ Times committed single row inserts while reader threads query the same table.
+
+    Returns:
+        writes_per_second (float): committed inserts per second.
+        reads (int): the number of reader queries completed while writing.
+    """
+
+    create_database(database_path, pragmas=pragmas)
+    conn, cursor = connect_to_database(database_path, pragmas=pragmas)
+
+    finished = threading.Event()
+    reads = []
+
+    def reader():
+        reader_conn, reader_cursor = connect_to_database(database_path, pragmas=pragmas)
+        count = 0
+        while not finished.is_set():
+            reader_cursor.execute("SELECT COUNT(*) FROM availability WHERE doctor_id = 2").fetchone()
+            count += 1
+        reads.append(count)
+        reader_conn.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+
+    for i in range(writes):
+        cursor.execute("""
+            INSERT INTO availability (doctor_id, datetime, availability_status_id)
+            VALUES (2, ?, 0)""", ('2030-01-01 {:06d}'.format(i),))
+        conn.commit()
+
+    elapsed = time.perf_counter() - start
+    finished.set()
+
+    for thread in threads:
+        thread.join()
+
+    conn.close()
+
+    return writes / elapsed, sum(reads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--readers', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, pragmas in (('sqlite defaults', LEGACY_PRAGMAS), ('deployment pragmas', None)):
+            database_path = os.path.join(directory, name.replace(' ', '_') + '.db')
+            throughput, reads = run(database_path, pragmas, args.writes, args.readers)
+            print('{:<20} {:>10.0f} writes/s {:>10} concurrent reads'.format(name, throughput, reads))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,7 @@ from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 
 # import helper widgets for UI tables.
-from widgets.table_widgets import table_data_settings, table_row_select, table_display_data
-
-# import app.
-from ehealthApp import *
+from widgets.table_widgets import table_data_settings, table_row_select, table_display_query_pages
 
 # import the Admin.
 from store.admin import Admin
@@ -76,9 +73,11 @@ class AdminPages(QMainWindow):
         # set the initial current index of the management dropdown box to 0 (All)
         self.ui.manage_records_comboBox.setCurrentIndex(0)
 
-        # query database and populate admin management table.
-        query_result = self.admin.manage_records(self.ui.manage_records_comboBox.currentText())
-        table_display_data(self.ui.admin_tableWidget, query_result)
+        # query database off the UI thread and populate admin management table, further pages are
+        # loaded on scrolling.
+        view_filter = self.ui.manage_records_comboBox.currentText()
+        table_display_query_pages(self.ui.admin_tableWidget,
+                                  lambda page_token: self.admin.manage_records(view_filter, page_token=page_token))
 
 
     def Manage_Records(self):
@@ -92,9 +91,11 @@ class AdminPages(QMainWindow):
         self.ui.manage_email_label.setText('Email: ')
         self.ui.manage_status_label.setText('Status: ')
 
-        # query database and populate admin management table.
-        query_result = self.admin.manage_records(self.ui.manage_records_comboBox.currentText())
-        table_display_data(self.ui.admin_tableWidget, query_result)
+        # query database off the UI thread and populate admin management table, further pages are
+        # loaded on scrolling.
+        view_filter = self.ui.manage_records_comboBox.currentText()
+        table_display_query_pages(self.ui.admin_tableWidget,
+                                  lambda page_token: self.admin.manage_records(view_filter, page_token=page_token))
 
 
     def AdminAcc(self):
@@ -4,7 +4,8 @@ from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 
 # import helper widgets for UI tables.
-from widgets.table_widgets import table_data_settings, table_row_select, table_display_data
+from widgets.table_widgets import table_data_settings, table_row_select, table_display_data, table_display_query, \
+    table_display_query_pages
 
 # ad-hoc requirements.
 import datetime
@@ -14,9 +15,6 @@ import time
 # import the GP.
 from store.gp import GP
 
-# import app.
-from ehealthApp import *
-
 
 class GPPages(QMainWindow):
     """ GPPages houses the view and functionality of a GP after they log in. 
@@ -89,6 +87,12 @@ class GPPages(QMainWindow):
         self.ui.calendarWidget.setMaximumDate(QDate(next_month.year, next_month.month, next_month.day))
         self.ui.calendarWidget.clicked.connect(self.display_availability)
 
+        # connect the checkboxes once here, connecting them every time the page is shown would save
+        # the availability once per visit on every click.
+        self.ui.buttonGroup.buttonClicked.connect(self.update_gp_availability_single)
+        self.ui.selectAllButton.clicked.connect(self.update_gp_availability_all)
+        self.ui.deselectAllButton.clicked.connect(self.update_gp_availability_all)
+
         # set up the manage appointment page
         self.ui.missed_button.hide()
         self.ui.record_button.hide()
@@ -101,8 +105,8 @@ class GPPages(QMainWindow):
         # connect the button clicks in the manage appointment page to different class methods
         self.ui.AppointmentPushButton.clicked.connect(self.display_appointment)
         self.ui.appointment_calendar.clicked.connect(self.display_appointment)
-        self.ui.pending_table.itemPressed.connect(self.retrieve_appointment_data_pending)
-        self.ui.scheduled_table.itemPressed.connect(self.retrieve_appointment_data_scheduled)
+        self.ui.pending_table.pressed.connect(self.retrieve_appointment_data_pending)
+        self.ui.scheduled_table.pressed.connect(self.retrieve_appointment_data_scheduled)
         self.ui.update_record_button.clicked.connect(self.prescription_patient_record)
         self.ui.logout_pushButton.clicked.connect(self.Logout)
         self.ui.medical_history_table.clicked.connect(self.medical_history_selections)
@@ -182,11 +186,6 @@ class GPPages(QMainWindow):
                 if i[1] == (checkbox.text()[:5] + ":00"):
                     checkbox.setChecked(True)
 
-        # connect to function with parameters when buttons on the page are clicked
-        self.ui.buttonGroup.buttonClicked.connect(self.update_gp_availability_single)
-        self.ui.selectAllButton.clicked.connect(self.update_gp_availability_all)
-        self.ui.deselectAllButton.clicked.connect(self.update_gp_availability_all)
-
 
     def update_gp_availability_all(self):
         """ Updates the GP availability based on checkbox option selected for the entire day. """
@@ -199,21 +198,14 @@ class GPPages(QMainWindow):
         if action.text() == "Select All":
             for checkbox in self.checkboxes:
                 checkbox.setChecked(True)
-                time = checkbox.text()
-                availabile_time = availability_date + " " + time[0:5]
-
-                # update gp availability for the whole day
-                self.gp.update_availability_add(self.gp.user_id, availabile_time)
 
         # remove the GP's availability for the entire day.
         if action.text() == "Deselect All":
             for checkbox in self.checkboxes:
                 checkbox.setChecked(False)
-                time = checkbox.text()
-                availabile_time = availability_date + " " + time[0:5]
 
-                # remove gp availability for the entire day.
-                self.gp.update_availability_remove(self.gp.user_id, availabile_time)
+        # save the whole day in one transaction.
+        self.save_day_availability(availability_date)
 
 
     def update_gp_availability_single(self):
@@ -222,21 +214,27 @@ class GPPages(QMainWindow):
         # retrieve date from the calendar widget
         selected_date = self.ui.calendarWidget.selectedDate()
         availability_date = "{:4d}-{:02d}-{:02d}".format(selected_date.year(), selected_date.month(),selected_date.day())  # format the selected data to match the database date format
+
         # update GP selected dates and times for their availability.
-        for checkbox in self.checkboxes:
-            if checkbox.isChecked():
-                time = checkbox.text()
-                availabile_time = availability_date + " " + time[0:5]
+        self.save_day_availability(availability_date)
 
-                # update gp availability for the specified datetime.
-                self.gp.update_availability_add(self.gp.user_id, availabile_time)
 
-            else:
-                time = checkbox.text()
-                availabile_time = availability_date + " " + time[0:5]
+    def save_day_availability(self, availability_date):
+        """ Saves the checked time slots as the GP's availability for the given day.
+
+        Args:
+            availability_date (string): the selected day, formatted as YYYY-MM-DD.
+        """
 
-                # remove gp for unspecified datetime.
-                self.gp.update_availability_remove(self.gp.user_id, availabile_time)
+        slots = [checkbox.text()[0:5] for checkbox in self.checkboxes if checkbox.isChecked()]
+
+        self.gp.set_day_availability(self.gp.user_id, availability_date, slots)
+
+        # slots booked by a patient are kept, so show them as checked again.
+        for row in self.gp.availability_data(self.gp.user_id, availability_date).fetchall():
+            for checkbox in self.checkboxes:
+                if row[1] == (checkbox.text()[:5] + ":00"):
+                    checkbox.setChecked(True)
 
 
     def display_appointment(self):
@@ -251,15 +249,14 @@ class GPPages(QMainWindow):
         today = datetime.datetime.today().strftime('%Y-%m-%d')  #formated current date
 
         # display appointment data for the appointment requested by patient table that are 1 day in advance of the current date.
-        pending_appointments_query_result = self.gp.display_pending_appointments(self.gp.user_id, today)
-        table_display_data(self.ui.pending_table, pending_appointments_query_result)
-        self.ui.pending_table.resizeColumnsToContents()
+        # both tables are queried off the UI thread, a query for a date selected before is superseded.
+        table_display_query(self.ui.pending_table, self.gp.display_pending_appointments, self.gp.user_id, today,
+                            on_displayed=self.ui.pending_table.resizeColumnsToContents)
 
         # display appointment data for the scheduled appointment table
         # only appointment with appointment status = confirmed or completed with prescription or or completed without prescription are displayed
-        confirmed_appointments_query_result = self.gp.display_confirmed_appointments(self.gp.user_id, appointment_date)
-        table_display_data(self.ui.scheduled_table, confirmed_appointments_query_result)
-        self.ui.scheduled_table.resizeColumnsToContents()
+        table_display_query(self.ui.scheduled_table, self.gp.display_confirmed_appointments, self.gp.user_id, appointment_date,
+                            on_displayed=self.ui.scheduled_table.resizeColumnsToContents)
 
         # hide the buttons:
         self.ui.record_button.hide()
@@ -549,24 +546,26 @@ class GPPages(QMainWindow):
 
         #element: either the name_button or id_button label that the GP clicked on.
         element=self.sender()
-        # display all patients in the database
+        # display all patients in the database, further pages are loaded on scrolling.
         if element.text() == "Manage Patient":
-            query_result = self.gp.search_patients_via_name("")
-            table_display_data(self.ui.result_table, query_result)
+            table_display_query_pages(self.ui.result_table, lambda page_token: self.gp.all_patients(page_token=page_token))
 
         # gp selected the name filter, search patients based on their first name and last name and get result.
         if element.text() == "Search by Name":
             self.ui.input_patient_id.clear()
             name = self.ui.input_name.text().strip()
-            query_result = self.gp.search_patients_via_name(name)
-            table_display_data(self.ui.result_table, query_result)
+            table_display_query_pages(self.ui.result_table, lambda page_token: self.gp.search_patients(name, page_token=page_token))
 
         # gp selected the id filter, search patients based on their unique user id and get result.
         if element.text() == "Search by ID":
             self.ui.input_name.clear()
             patient_id = self.ui.input_patient_id.text().strip()
-            query_result = self.gp.search_patients_via_id(patient_id)
-            table_display_data(self.ui.result_table, query_result)
+
+            if patient_id == "":
+                table_display_query_pages(self.ui.result_table, lambda page_token: self.gp.all_patients(page_token=page_token))
+
+            else:
+                table_display_query(self.ui.result_table, self.gp.search_patients_via_id, patient_id)
 
 
     def transfer_result_data(self):
@@ -1,16 +1,16 @@
+import logging
+
 # UI library imports
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
+from PyQt5 import QtCore, QtWidgets
 
 # import the User class.
 from store.user import User
 
-from pages.admin_page import *
-from pages.gp_page import *
-from pages.patient_page import *
-
-from ehealthApp import *
+# runs store calls off the UI thread.
+from widgets.query_executor import get_executor
 
 
 class LoginPages(QMainWindow):
@@ -39,6 +39,7 @@ class LoginPages(QMainWindow):
         self.user = None
         self.credentials = None
         self.user_role = None
+        self.login_task = None
 
         # visual update
         self.ui.AdminpushButton.clicked.connect(self.Login_button)
@@ -92,10 +93,34 @@ class LoginPages(QMainWindow):
             # return early to prevent further login evaluation.
             return
 
-        # attempt to login, class transformation method. If successful, self.user is either an
-        # Admin, GP or patient, otherwise self.user is still a User with updated internal state
-        # signifying the reason why login was unsuccessful.
-        self.user = self.user.login(self.user, self.ui.email_login_lineEdit.text().strip(), self.ui.pass_login_lineEdit.text())
+        # attempt to login off the UI thread, passwords are verified with a deliberately slow key
+        # derivation function (see store/passwords.py). Class transformation method, if successful
+        # self.user is either an Admin, GP or patient, otherwise self.user is still a User with
+        # updated internal state signifying the reason why login was unsuccessful. The button is
+        # disabled until the result is back so a login cannot be submitted twice.
+        self.ui.login_pushButton.setEnabled(False)
+        self.login_task = get_executor().submit(None, self.user.login, self.user,
+                                                self.ui.email_login_lineEdit.text().strip(),
+                                                self.ui.pass_login_lineEdit.text(),
+                                                on_result=self.Login_finished, on_error=self.Login_failed)
+
+
+    def Login_failed(self, error):
+        logging.error("Login failed.", exc_info=error)
+        self.Login_finished(None)
+
+
+    def Login_finished(self, user):
+        self.ui.login_pushButton.setEnabled(True)
+
+        # the login failed with an error, e.g. the database could not be reached.
+        if user is None:
+            self.ui.error_login_label.setText('Login failed! Please try again.')
+            self.ui.error_login_label.show()
+
+            return
+
+        self.user = user
 
         # check updated internal for whether the email exists.
         if self.user.incorrect_email == True:
@@ -127,6 +152,7 @@ class LoginPages(QMainWindow):
 
             # user has successfully logged in and is either an Admin, GP or Patient. Initialise the
             # correct Admin, GP or Patient class to visually update the UI for their respective pages.
+            # The pages of a role are only imported once a user of that role logs in.
             else:
                 self.ui.error_login_label.hide()
                 self.ui.back_page_pushButton.hide()
@@ -135,14 +161,17 @@ class LoginPages(QMainWindow):
 
                 if self.user.user_role_id == 0:
                     # self.user has now changed to an Admin Class. They can do some Admin stuff now! 📚
+                    from pages.admin_page import AdminPages
                     self.user = AdminPages(self.user, self.ui)
 
                 elif self.user.user_role_id == 1:
                     # self.user has now changed to a GP Class. They can starting fixing people! 🩺
+                    from pages.gp_page import GPPages
                     self.user = GPPages(self.user, self.ui)
 
                 else:
                     # self.user has now changed to a Patient Class. They can book to see the GP! 😷
+                    from pages.patient_page import PatientPages
                     self.user = PatientPages(self.user, self.ui)
 
 
@@ -4,14 +4,12 @@ from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 
 # import helper widgets for UI tables.
-from widgets.table_widgets import table_data_settings, table_row_select, table_goes_blank, table_display_data
+from widgets.table_widgets import table_data_settings, table_row_select, table_goes_blank, table_display_data, table_display_query, \
+    table_display_query_pages
 
 # ad-hoc requirements.
 import datetime
 
-# import app.
-from ehealthApp import *
-
 # import the Patient.
 from store.patient import Patient
 
@@ -138,9 +136,11 @@ class PatientPages(QMainWindow):
         appointment_status = self.ui.appointment_comboBox.currentText()
         now = datetime.datetime.now()
 
-        # make backend query and populate appointment table base on dropdown box selection.
-        query_result = self.patient.check_appointments(self.patient.user_id, now, appointment_status)
-        table_display_data(self.ui.check_appointment_widget, query_result)
+        # make backend query off the UI thread and populate appointment table base on dropdown box
+        # selection, further pages are loaded on scrolling.
+        table_display_query_pages(self.ui.check_appointment_widget,
+                                  lambda page_token: self.patient.check_appointments(self.patient.user_id, now, appointment_status,
+                                                                                     page_token=page_token))
 
 
     def Change_Location(self):
@@ -179,9 +179,9 @@ class PatientPages(QMainWindow):
         date = self.ui.appointment_date.selectedDate()
         availability_date = "{:4d}-{:02d}-{:02d}".format(date.year(), date.month(), date.day())
 
-        # query database and populate gp availability table based on date and location selected.
-        query_result = self.patient.search_gp_availability(availability_date, GP_location)
-        table_display_data(self.ui.availabilityTable, query_result)
+        # query database off the UI thread and populate gp availability table based on date and
+        # location selected, a query for a date clicked before is superseded.
+        table_display_query(self.ui.availabilityTable, self.patient.search_gp_availability, availability_date, GP_location)
 
 
     def Search_appointment(self):
@@ -204,9 +204,11 @@ class PatientPages(QMainWindow):
         appointment_status = self.ui.appointment_comboBox.currentText()
         now = datetime.datetime.now()
 
-        # query database and populate booked appointments table.
-        query_result = self.patient.check_appointments(self.patient.user_id, now, appointment_status)
-        table_display_data(self.ui.check_appointment_widget, query_result)
+        # query database off the UI thread and populate booked appointments table, further pages are
+        # loaded on scrolling.
+        table_display_query_pages(self.ui.check_appointment_widget,
+                                  lambda page_token: self.patient.check_appointments(self.patient.user_id, now, appointment_status,
+                                                                                     page_token=page_token))
 
 
     def Description(self):
@@ -304,7 +306,23 @@ class PatientPages(QMainWindow):
             self.ui.fields_error_label_2.hide()
 
             # submit appointment booking to the backend for gp to late confirm or cancel.
-            self.patient.submit_appointment_booking(availability_id, self.patient.user_id, problem_info)
+            booked = self.patient.submit_appointment_booking(availability_id, self.patient.user_id, problem_info)
+
+            # another patient booked the slot after it was listed or its time has passed, refresh the
+            # list and let the patient pick a different one.
+            if not booked:
+                slot_datetime = self.ui.datetime_label.text()[len('datetime: '):]
+
+                if slot_datetime < datetime.datetime.now().strftime("%Y-%m-%d %H:%M"):
+                    message = 'Sorry, this slot has already passed!'
+
+                else:
+                    message = 'Sorry, this slot has just been booked!'
+
+                self.Search_Button_date()
+                self.ui.fields_error_label_2.setText(message)
+                self.ui.fields_error_label_2.show()
+                return
 
             self.ui.availability_id_label.setText('availability_id: ')
             self.ui.doctor_id_label.setText('doctor_id: ')
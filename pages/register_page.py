@@ -1,13 +1,11 @@
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
+from PyQt5 import QtCore
 
 # import the Register class.
 from store.register import Register
 
-# import the app.
-from ehealthApp import *
-
 
 class RegisterPages(QMainWindow):
     """ Handles registering into the system.
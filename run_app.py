@@ -8,23 +8,41 @@ from PyQt5.QtWidgets import *
 
 # backend store library
 from store.conn import connect_to_database, create_database
+from store.maintenance import incremental_vacuum, sweep_appointment_statuses
+from store.outbox import start_outbox_worker
+from store.scheduler import start_scheduler
 
-# import UI pages
+# import UI pages, the register page and the pages of each role are imported when first needed.
 from pages.login_page import *
-from pages.register_page import *
 
-from ehealthApp import *
-import datetime
-import sqlite3
+# model backed views for the query result tables.
+from widgets.table_widgets import install_table_views
+
+# lazily built window and deferred start up work.
+from widgets.lazy_ui import LazyUi
+from widgets.query_executor import get_executor
+from widgets.startup import after_first_paint
+
 import os
 
 
 # application setup
 app = QApplication(sys.argv)
 window = QMainWindow()
-ui = Ui_App_GUI()
+
+# only the start and login pages are built before the window is shown, the pages of each role are
+# built the first time they are used. UCLH_EAGER_UI=1 builds every page up front. Either way the
+# window is built from ehealthApp.ui, compiled once into the ui cache (see widgets/lazy_ui.py).
+if os.environ.get('UCLH_EAGER_UI') == '1':
+    ui = LazyUi(eager_pages=None)
+else:
+    ui = LazyUi()
+
 ui.setupUi(window)
 
+# display query results through QueryTableModel, must happen before any page connects to a table.
+install_table_views(ui)
+
 # Connecting to the database AND creating it if it doesn't exist
 # (function for conn and cursor already called inside create database):
 database_path = os.path.join(os.path.abspath(os.getcwd()), 'store', 'UCLH.db')
@@ -80,43 +98,37 @@ def go_Back():
 ui.back_page_pushButton.clicked.connect(go_Back)
 
 
-# Updating the status of past appointments to 4 (GP ACTION REQUIRED) or -4 (CANCELLED BY SYSTEM)
-# DEPENDING on whether the appointment was confirmed or still pending
-# Update happens as soon as running the app:
+def startup_maintenance():
+    # Updating the status of past appointments to 4 (GP ACTION REQUIRED) or -4 (CANCELLED BY SYSTEM)
+    # DEPENDING on whether the appointment was confirmed or still pending
+    # Update happens as soon as running the app, only appointments that passed since the last run are
+    # looked at (see store/maintenance.py):
+    sweep_appointment_statuses()
 
-# Queries for CONFIRMED PAST appointments
-query1_confirmed = """SELECT appointment_id, datetime FROM availability, appointment
-    WHERE appointment_status_id = 1 AND availability.availability_id = appointment.availability_id"""
-query2_confirmed = """UPDATE appointment SET appointment_status_id = 4 WHERE appointment_id = ?"""
+    # reclaim space left behind by deleted rows.
+    incremental_vacuum()
 
 
-# Queries for PENDING PAST Appointments:
-query1_pending = """SELECT appointment_id, datetime FROM availability, appointment
-    WHERE appointment_status_id = 0 AND availability.availability_id = appointment.availability_id"""
-query2_pending = """UPDATE appointment SET appointment_status_id = -4 WHERE appointment_id = ?"""
+def start_background_work():
+    global scheduler, outbox_worker
 
+    # run the start up maintenance off the UI thread.
+    get_executor().submit(None, startup_maintenance)
 
-def update_appointment_status(query_select, query_update):
-    conn = sqlite3.connect('store/UCLH.db')
-    cursor = conn.cursor()
-    now = datetime.datetime.now()
-    now_formatted = now.strftime("%Y-%m-%d %H:%M")
+    # keep sweeping in the background as appointments pass while the application is open.
+    scheduler = start_scheduler()
+    app.aboutToQuit.connect(scheduler.stop)
 
-    result = cursor.execute(query_select)
-    row = result.fetchall()
-    for i in range(len(row)):
-        if row[i][1] < now_formatted:
-            appointment_id = row[i][0]
-            cursor.execute(query_update,
-                           (appointment_id,))
-    conn.commit()
-    conn.close()
+    # deliver queued notification emails in the background.
+    outbox_worker = start_outbox_worker()
+    app.aboutToQuit.connect(outbox_worker.stop)
 
 
-# PAST CONFIRMED
-update_appointment_status(query1_confirmed, query2_confirmed)
-# PAST PENDING
-update_appointment_status(query1_pending, query2_pending)
+# none of the background work is needed to show the login screen, so it starts once the window has
+# been painted.
+scheduler = None
+outbox_worker = None
+after_first_paint(window, start_background_work)
 
 
 # create memory location that will hold the soon to be instantiated RegisterPages class.
@@ -127,6 +139,8 @@ new_registration = None
 # this pattern is used to facilitate that requirement, otherwise UI components do not load.
 def go_to_registration():
     global new_registration
+
+    from pages.register_page import RegisterPages
     new_registration = RegisterPages(ui)
 
 
@@ -0,0 +1,66 @@
+""" Runs the store operations as a JSON API over HTTP, without the window.
+
+Patients, GPs and admins log in with POST /login and use the routes of their role (see
+service/api.py) with the token it returns. Run from the top level directory, e.g.:
+
+    python3 run_service.py --port 8080 --connections 8
+"""
+import argparse
+import logging
+import os
+
+# backend store library
+from store.conn import connect_to_database, create_database
+from store.maintenance import incremental_vacuum, sweep_appointment_statuses
+from store.outbox import start_outbox_worker
+from store.pool import configure_pool
+from store.scheduler import start_scheduler
+
+from service.api import Service
+from service.server import make_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=8,
+                        help='the number of database connections shared by the requests')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    # connecting to the database AND creating it if it doesn't exist, like run_app.py.
+    database_path = os.path.join(os.path.abspath(os.getcwd()), 'store', 'UCLH.db')
+
+    if os.path.exists(database_path):
+        connect_to_database()
+    else:
+        create_database()
+
+    configure_pool(max_connections=args.connections)
+
+    # the same start up maintenance and background work as the application.
+    sweep_appointment_statuses()
+    incremental_vacuum()
+
+    scheduler = start_scheduler()
+    outbox_worker = start_outbox_worker()
+
+    server = make_server(args.host, args.port, Service())
+    logging.info("Serving on http://%s:%d", *server.server_address[:2])
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
+        scheduler.stop()
+        outbox_worker.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -26,4 +26,8 @@ if __name__ == "__main__":
     p.join()
 
     os.remove(os.path.join(".", "store", "UCLH.db"))
+    # remove the write ahead log of the test database so it cannot be applied to the restored one.
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(os.path.join(".", "store", "UCLH.db" + suffix)):
+            os.remove(os.path.join(".", "store", "UCLH.db" + suffix))
     os.rename(os.path.join(".", "store", "UCLH_save.db"), os.path.join(".", "store", "UCLH.db"))
\ No newline at end of file
@@ -0,0 +1,540 @@
+import datetime
+import http
+import json
+import logging
+import re
+import sqlite3
+import urllib.parse
+
+from store.gp import APPOINTMENT_ACTIONS
+from store.pool import get_pool
+from store.user import User
+
+from service.sessions import SessionStore
+
+
+# the largest page of a paged view a client can ask for.
+MAX_PAGE_SIZE = 500
+
+# the largest request body accepted, in bytes.
+MAX_BODY_SIZE = 64 * 1024
+
+# user_role_id -> the name of the role in urls and responses.
+ROLES = {0: 'admin', 1: 'gp', 2: 'patient'}
+
+
+class ServiceError(Exception):
+    """ Raised by a request handler to answer with an error status.
+
+    Attributes:
+        status (int): the HTTP status of the response.
+        message (string): the error returned to the client.
+    """
+
+    def __init__(self, status, message):
+        """ Instatiates the class and initializes internal variables. """
+
+        super().__init__(message)
+
+        self.status = status
+        self.message = message
+
+
+class Request:
+    """ A request to the service, as seen by the request handlers.
+
+    Attributes:
+        method (string): the HTTP method.
+        path (string): the path of the url.
+        query (dict): the query string parameters, only the first value of each.
+        body (dict): the JSON body, empty if there is none.
+        params (tuple): the groups matched by the route, e.g. the id in /admin/users/<id>/activate.
+        session (Session): the session of the bearer token, None for requests that need none.
+    """
+
+    def __init__(self, environ):
+        """ Instatiates the class and parses the request. """
+
+        self.method = environ['REQUEST_METHOD']
+        self.path = environ.get('PATH_INFO') or '/'
+        self.query = {name: values[0] for name, values in urllib.parse.parse_qs(environ.get('QUERY_STRING', '')).items()}
+        self.params = ()
+        self.session = None
+
+        # the token of an 'Authorization: Bearer <token>' header.
+        authorization = environ.get('HTTP_AUTHORIZATION', '')
+        self.token = authorization[len('Bearer '):].strip() if authorization.startswith('Bearer ') else None
+
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+
+        except ValueError:
+            raise ServiceError(400, "Invalid Content-Length.")
+
+        if length > MAX_BODY_SIZE:
+            raise ServiceError(413, "The request body is too large.")
+
+        try:
+            self.body = json.loads(environ['wsgi.input'].read(length) or b'{}') if length else {}
+
+        except ValueError:
+            raise ServiceError(400, "The request body is not valid JSON.")
+
+        if not isinstance(self.body, dict):
+            raise ServiceError(400, "The request body must be a JSON object.")
+
+
+    def field(self, name, kind=str):
+        """ Returns a required field of the JSON body.
+
+        Args:
+            name (string): the name of the field.
+            kind (type): the type the field must have, int fields may also be given as strings.
+
+        Raises:
+            ServiceError: 400 if the field is missing or has the wrong type.
+        """
+
+        if name not in self.body:
+            raise ServiceError(400, "Missing field '{}'.".format(name))
+
+        return _convert(name, self.body[name], kind)
+
+
+    def arg(self, name, kind=str, default=None):
+        """ Returns a query string parameter.
+
+        Args:
+            name (string): the name of the parameter.
+            kind (type): the type of the parameter.
+            default: the value if the parameter is not given, required parameters have None.
+
+        Raises:
+            ServiceError: 400 if a required parameter is missing or has the wrong type.
+        """
+
+        if name not in self.query:
+            if default is None:
+                raise ServiceError(400, "Missing parameter '{}'.".format(name))
+
+            return default
+
+        return _convert(name, self.query[name], kind)
+
+
+    def page_size(self):
+        """ Returns the page_size parameter of a paged view, bounded by MAX_PAGE_SIZE. """
+
+        from store.pagination import DEFAULT_PAGE_SIZE
+
+        return max(1, min(self.arg('page_size', int, DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+
+
+class Service:
+    """ The Service class exposes the store operations as a JSON API, as a WSGI application.
+
+    Each request is handled by the store classes, exactly like the pages of the window use them.
+    A user logs in with POST /login and sends the returned token in an 'Authorization: Bearer'
+    header with every other request. The routes of each role can only be used by a user of that
+    role, and the routes that read or change an appointment only accept the appointments of the
+    user's own session. The store classes query through the connection of the calling thread (see
+    store/storage.py), which is released back to the shared pool once the response has been built,
+    so the number of requests that query the database at the same time is bounded by the pool.
+
+    Attributes:
+        sessions (SessionStore): the sessions of the logged in users.
+    """
+
+    def __init__(self, sessions=None):
+        """ Instatiates the class and initializes internal variables. """
+
+        self.sessions = sessions if sessions is not None else SessionStore()
+
+        # (method, path pattern, role allowed, None if any user, or False if no session is needed,
+        # handler).
+        self.routes = [
+            ('GET', r'/health', False, self.health),
+            ('POST', r'/login', False, self.login),
+            ('POST', r'/logout', None, self.logout),
+
+            ('GET', r'/admin/users', 'admin', self.admin_users),
+            ('POST', r'/admin/users/(\d+)/activate', 'admin', self.admin_activate_user),
+            ('POST', r'/admin/users/(\d+)/deactivate', 'admin', self.admin_deactivate_user),
+            ('DELETE', r'/admin/users/(\d+)', 'admin', self.admin_delete_user),
+            ('POST', r'/admin/emails', 'admin', self.admin_send_emails),
+
+            ('GET', r'/gp/availability', 'gp', self.gp_availability),
+            ('PUT', r'/gp/availability', 'gp', self.gp_set_availability),
+            ('GET', r'/gp/appointments', 'gp', self.gp_appointments),
+            ('POST', r'/gp/appointments/(\d+)', 'gp', self.gp_update_appointment),
+            ('GET', r'/gp/appointments/(\d+)/prescription', 'gp', self.gp_prescription),
+            ('PUT', r'/gp/appointments/(\d+)/prescription', 'gp', self.gp_issue_prescription),
+
+            ('GET', r'/patient/availability', 'patient', self.patient_availability),
+            ('GET', r'/patient/appointments', 'patient', self.patient_appointments),
+            ('POST', r'/patient/appointments', 'patient', self.patient_book_appointment),
+            ('POST', r'/patient/appointments/(\d+)/cancel', 'patient', self.patient_cancel_appointment),
+            ('GET', r'/patient/prescriptions', 'patient', self.patient_prescriptions),
+        ]
+
+        self.routes = [(method, re.compile(pattern + '$'), role, handler)
+                       for method, pattern, role, handler in self.routes]
+
+
+    def __call__(self, environ, start_response):
+        try:
+            status, body = self.handle(environ)
+
+        finally:
+            # request threads come and go, so their connection goes back to the pool with the response.
+            get_pool().release_thread_connection()
+
+        payload = json.dumps(body).encode('utf-8')
+
+        start_response('{} {}'.format(status, http.HTTPStatus(status).phrase),
+                       [('Content-Type', 'application/json'), ('Content-Length', str(len(payload)))])
+
+        return [payload]
+
+
+    def handle(self, environ):
+        """ Routes a request to its handler.
+
+        Args:
+            environ (dict): the WSGI environment of the request.
+
+        Returns:
+            status (int): the HTTP status of the response.
+            body (dict): the JSON body of the response.
+        """
+
+        try:
+            request = Request(environ)
+            handler = self._route(request)
+
+            return 200, handler(request)
+
+        except ServiceError as error:
+            return error.status, {'error': error.message}
+
+        # e.g. an invalid date or page token.
+        except ValueError as error:
+            return 400, {'error': str(error)}
+
+        # the database stayed locked or the connection pool was exhausted.
+        except sqlite3.OperationalError as error:
+            logging.warning("Request could not be served: %s", error)
+            return 503, {'error': "The service is busy, please try again."}
+
+        except Exception:
+            logging.exception("Request failed.")
+            return 500, {'error': "Internal error."}
+
+
+    def _route(self, request):
+        """ Finds the handler of a request and checks the session is allowed to use it. """
+
+        methods = []
+
+        for method, pattern, role, handler in self.routes:
+            match = pattern.match(request.path)
+
+            if match is None:
+                continue
+
+            if method != request.method:
+                methods.append(method)
+                continue
+
+            request.params = match.groups()
+
+            if role is False:
+                return handler
+
+            request.session = self.sessions.get(request.token) if request.token else None
+
+            if request.session is None:
+                raise ServiceError(401, "Please log in.")
+
+            if role is not None and ROLES[request.session.user_role_id] != role:
+                raise ServiceError(403, "Please log in with the correct {} credentials.".format(role))
+
+            return handler
+
+        if methods:
+            raise ServiceError(405, "Use {} for {}.".format(' or '.join(methods), request.path))
+
+        raise ServiceError(404, "No such resource {}.".format(request.path))
+
+
+    # -----------------------------------------------------------------------------------------------
+    # sessions
+    # -----------------------------------------------------------------------------------------------
+
+    def health(self, request):
+        return {'status': 'ok', 'sessions': len(self.sessions)}
+
+
+    def login(self, request):
+        email = request.field('email').strip()
+        password = request.field('password')
+
+        # User.login keeps the outcome of a login on the class it is called on (see
+        # pages/login_page.py), so every login is made through its own subclass and concurrent
+        # logins never see each other's state.
+        user = type(User.__name__, (User,), {}).create_user()
+        store = user.login(user, email, password)
+
+        if user.incorrect_email or user.incorrect_password:
+            raise ServiceError(401, "Incorrect email or password.")
+
+        if user.user_status_id == -1:
+            raise ServiceError(403, "Your account has been DEACTIVATED.")
+
+        if user.user_status_id == 0:
+            raise ServiceError(403, "Your account is PENDING. Please wait for Admin activation.")
+
+        session = self.sessions.create(user, store)
+
+        return {'token': session.token, 'user_id': session.user_id, 'role': ROLES[session.user_role_id],
+                'first_name': session.first_name, 'last_name': session.last_name}
+
+
+    def logout(self, request):
+        self.sessions.remove(request.session.token)
+
+        return {}
+
+
+    # -----------------------------------------------------------------------------------------------
+    # admin
+    # -----------------------------------------------------------------------------------------------
+
+    def admin_users(self, request):
+        page = request.session.store.manage_records(request.arg('filter', default='All'),
+                                                    request.page_size(), request.arg('page_token', default=''))
+
+        return _table(page)
+
+
+    def admin_activate_user(self, request):
+        request.session.store.activate_user(int(request.params[0]))
+
+        return {}
+
+
+    def admin_deactivate_user(self, request):
+        request.session.store.deactivate_user(int(request.params[0]))
+
+        return {}
+
+
+    def admin_delete_user(self, request):
+        request.session.store.delete_user(int(request.params[0]))
+
+        return {}
+
+
+    def admin_send_emails(self, request):
+        option = request.field('option')
+
+        if option not in ('pending', 'not_pending'):
+            raise ServiceError(400, "option must be 'pending' or 'not_pending'.")
+
+        request.session.store.send_emails_patients(option)
+
+        return {}
+
+
+    # -----------------------------------------------------------------------------------------------
+    # gp
+    # -----------------------------------------------------------------------------------------------
+
+    def gp_availability(self, request):
+        return _table(request.session.store.availability_data(request.session.user_id, request.arg('date')))
+
+
+    def gp_set_availability(self, request):
+        slots = request.field('slots', list)
+        date = request.field('date')
+
+        # patients cannot book slots that have passed, so past days are not offered either.
+        if datetime.date.fromisoformat(date) < datetime.date.today():
+            raise ServiceError(400, "The availability of past days cannot be changed.")
+
+        added, removed = request.session.store.set_day_availability(request.session.user_id, date,
+                                                                     [str(slot) for slot in slots])
+
+        return {'added': added, 'removed': removed}
+
+
+    def gp_appointments(self, request):
+        gp = request.session.store
+        status = request.arg('status', default='confirmed')
+
+        if status == 'pending':
+            return _table(gp.display_pending_appointments(request.session.user_id, request.arg('date')))
+
+        if status == 'confirmed':
+            return _table(gp.display_confirmed_appointments(request.session.user_id, request.arg('date')))
+
+        raise ServiceError(400, "status must be 'pending' or 'confirmed'.")
+
+
+    def gp_update_appointment(self, request):
+        action = request.field('action')
+
+        if action not in APPOINTMENT_ACTIONS:
+            raise ServiceError(400, "action must be 'confirm', 'remove' or 'missed'.")
+
+        appointment_id = self._gp_appointment(request)
+
+        # the status is checked again in the transaction that changes it.
+        if not request.session.store.update_booked_appointment(appointment_id, request.session.user_id, action):
+            raise ServiceError(409, "The appointment cannot be marked '{}' in its current status.".format(action))
+
+        return {}
+
+
+    def gp_prescription(self, request):
+        return _table(request.session.store.view_past_prescriptions(self._gp_appointment(request)))
+
+
+    def gp_issue_prescription(self, request):
+        request.session.store.issue_prescription(self._gp_appointment(request), request.field('prescription_info'),
+                                                 request.field('diagnosis'), request.field('doctors_comment'))
+
+        return {}
+
+
+    def _gp_appointment(self, request):
+        """ Returns the id of the appointment in the url, checking it is booked with the session's GP.
+
+        Raises:
+            ServiceError: 404 if the appointment does not exist, 403 if it belongs to another GP.
+        """
+
+        appointment_id = int(request.params[0])
+        owner = request.session.store.appointment_owner(appointment_id)
+
+        if owner is None:
+            raise ServiceError(404, "No such appointment.")
+
+        if owner[1] != request.session.user_id:
+            raise ServiceError(403, "The appointment is booked with another GP.")
+
+        return appointment_id
+
+
+    # -----------------------------------------------------------------------------------------------
+    # patient
+    # -----------------------------------------------------------------------------------------------
+
+    def patient_availability(self, request):
+        return _table(request.session.store.search_gp_availability(request.arg('date'), request.arg('location')))
+
+
+    def patient_appointments(self, request):
+        view = request.arg('view', default='new')
+
+        if view not in ('new', 'past'):
+            raise ServiceError(400, "view must be 'new' or 'past'.")
+
+        # datetimes are stored to the minute.
+        current_time = request.arg('now', default=_now())
+
+        page = request.session.store.check_appointments(request.session.user_id, current_time, view,
+                                                        request.page_size(), request.arg('page_token', default=''))
+
+        return _table(page)
+
+
+    def patient_book_appointment(self, request):
+        patient = request.session.store
+        availability_id = request.field('availability_id', int)
+        problem = request.field('problem')
+
+        slot = patient.availability_status(availability_id)
+
+        if slot is None:
+            raise ServiceError(404, "No such slot.")
+
+        if slot[1] < _now():
+            raise ServiceError(400, "The slot has already passed.")
+
+        # the slot may still be taken by another patient in the meantime.
+        if not patient.submit_appointment_booking(availability_id, request.session.user_id, problem):
+            raise ServiceError(409, "The slot has already been booked.")
+
+        return {'booked': True}
+
+
+    def patient_cancel_appointment(self, request):
+        patient = request.session.store
+        appointment_id = int(request.params[0])
+        owner = patient.appointment_owner(appointment_id)
+
+        # the appointments of other patients are not disclosed.
+        if owner is None or owner[0] != request.session.user_id:
+            raise ServiceError(404, "No such appointment.")
+
+        # the slot freed is the appointment's own, checked again in the transaction that frees it.
+        if not patient.cancel_booked_appointment(appointment_id, request.session.user_id):
+            raise ServiceError(409, "The appointment can no longer be cancelled.")
+
+        return {}
+
+
+    def patient_prescriptions(self, request):
+        return _table(request.session.store.search_prescriptions(request.session.user_id))
+
+
+def _convert(name, value, kind):
+    """ Converts a request value to the type a handler expects. """
+
+    if kind is int and isinstance(value, str):
+        try:
+            return int(value)
+
+        except ValueError:
+            pass
+
+    if kind is int and isinstance(value, bool):
+        raise ServiceError(400, "'{}' must be an integer.".format(name))
+
+    if not isinstance(value, kind):
+        raise ServiceError(400, "'{}' must be {}.".format(name, {int: 'an integer', str: 'a string', list: 'a list'}[kind]))
+
+    return value
+
+
+def _table(result):
+    """ Converts the resultset a store method returned into a JSON body.
+
+    Args:
+        result (sqlite3.cursor or Page): a resultset queried through the cursor of the calling
+            thread, as every store class does.
+
+    Returns:
+        body (dict): the rows as objects keyed by column, and the next_page_token of a page.
+    """
+
+    columns = getattr(result, 'columns', None)
+
+    # a page has already been fetched, unless it names its columns they are still those of the
+    # thread's cursor.
+    if columns is None:
+        columns = [column[0] for column in get_pool().thread_cursor().description or ()]
+
+    body = {'rows': [dict(zip(columns, row)) for row in result.fetchall()]}
+
+    if hasattr(result, 'next_page_token'):
+        body['next_page_token'] = result.next_page_token
+
+    return body
+
+
+def _now():
+    """ Returns the current time formatted as the datetimes stored in the availability table. """
+
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
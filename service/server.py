@@ -0,0 +1,42 @@
+import logging
+import socketserver
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """ A WSGI server that handles every request in its own thread.
+
+    The number of requests querying the database at the same time is bounded by the connection pool
+    (see store/pool.py), a request that waits longer than its timeout is answered with 503.
+    """
+
+    # requests still running do not keep the process alive once the server is shut down.
+    daemon_threads = True
+
+    # the listen backlog, requests beyond it are refused by the operating system.
+    request_queue_size = 128
+
+
+class RequestHandler(WSGIRequestHandler):
+    """ Logs requests through the logging module rather than to standard error. """
+
+    def log_message(self, format, *args):
+        logging.info("%s %s", self.address_string(), format % args)
+
+
+def make_server(host, port, app):
+    """ Creates the server of the service.
+
+    Args:
+        host (string): the address to listen on.
+        port (int): the port to listen on, 0 for any free port.
+        app (Service): the WSGI application that handles the requests.
+
+    Returns:
+        server (ThreadingWSGIServer): the server, not yet serving.
+    """
+
+    server = ThreadingWSGIServer((host, port), RequestHandler)
+    server.set_app(app)
+
+    return server
@@ -0,0 +1,132 @@
+import os
+import secrets
+import threading
+import time
+
+
+# seconds a session lasts without being used, can be overridden per deployment with UCLH_SESSION_TTL.
+SESSION_TTL = int(os.environ.get('UCLH_SESSION_TTL', 3600))
+
+
+class Session:
+    """ A user logged into the service.
+
+    Attributes:
+        token (string): the bearer token the client authenticates its requests with.
+        user_id (int): the user id of the user.
+        user_role_id (int): the role of the user (0: Admin, 1: GP, 2: Patient).
+        email (string): the email address of the user.
+        first_name (string): the first name of the user.
+        last_name (string): the family name of the user.
+        store (User): the Admin, GP or Patient returned by User.login, whose methods run the
+            requests of the session.
+        expires (float): the time.monotonic() after which the session is no longer valid.
+    """
+
+    def __init__(self, token, user, store, expires):
+        """ Instatiates the class and initializes internal variables. """
+
+        self.token = token
+
+        # the outcome of the login is copied, so the session never depends on the class it was
+        # logged in through.
+        self.user_id = user.user_id
+        self.user_role_id = user.user_role_id
+        self.email = user.email
+        self.first_name = user.first_name
+        self.last_name = user.last_name
+
+        self.store = store
+        self.expires = expires
+
+
+class SessionStore:
+    """ The SessionStore class keeps the sessions of the service in memory.
+
+    A session expires once it has not been used for ttl seconds, using it again extends it. Every
+    method is safe to call from the threads that handle the requests.
+
+    Attributes:
+        ttl (float): seconds a session lasts without being used.
+    """
+
+    def __init__(self, ttl=SESSION_TTL):
+        """ Instatiates the class and initializes internal variables. """
+
+        self.ttl = ttl
+
+        # token -> Session, guarded by the lock.
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+
+    def create(self, user, store):
+        """ Starts a session for a user that has logged in.
+
+        Args:
+            user (User): the class User.login was called on, holding the outcome of the login.
+            store (User): the Admin, GP or Patient returned by User.login.
+
+        Returns:
+            session (Session): the new session.
+        """
+
+        session = Session(secrets.token_urlsafe(32), user, store, time.monotonic() + self.ttl)
+
+        with self._lock:
+            self._expire()
+            self._sessions[session.token] = session
+
+        return session
+
+
+    def get(self, token):
+        """ Looks up the session of a token and extends it.
+
+        Args:
+            token (string): the bearer token of a request.
+
+        Returns:
+            session (Session): the session, None if the token is unknown or the session expired.
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            session = self._sessions.get(token)
+
+            if session is None:
+                return None
+
+            if session.expires < now:
+                del self._sessions[token]
+                return None
+
+            session.expires = now + self.ttl
+
+            return session
+
+
+    def remove(self, token):
+        """ Ends a session, e.g. when the user logs out.
+
+        Args:
+            token (string): the bearer token of the session.
+        """
+
+        with self._lock:
+            self._sessions.pop(token, None)
+
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+    def _expire(self):
+        """ Removes every expired session, the lock must be held. """
+
+        now = time.monotonic()
+
+        for token in [token for token, session in self._sessions.items() if session.expires < now]:
+            del self._sessions[token]
@@ -1,7 +1,21 @@
+from store import queries
+from store.identity import identity_cache, user_key
+from store.pagination import DEFAULT_PAGE_SIZE, decode_page_token, fetch_page
 from store.user import User
 from store.send_email_gmail import *
 
 
+# the user_status_id and user_role_id of the accounts shown by each management view filter.
+MANAGE_RECORDS_FILTERS = {
+    'Pending GPs': (0, 1),
+    'Pending Patients': (0, 2),
+    'Active GPs': (1, 1),
+    'Active Patients': (1, 2),
+    'Deactivated GPs': (-1, 1),
+    'Deactivated Patients': (-1, 2),
+}
+
+
 class Admin(User):
     """ The Admin class groups methods required for the functionality of an Admin user. 
 
@@ -16,49 +30,35 @@ class Admin(User):
         User().__init__()
 
 
-    def manage_records(self, view_filter):
-        """ Gets a list of all users in the database. 
+    def manage_records(self, view_filter, page_size=DEFAULT_PAGE_SIZE, page_token=None):
+        """ Gets a page of the users in the database.
 
         Args:
             view_filter (string): additional information to provide filtering of the user table to
                 get specific views i.e. view all pending GP's or view all deactivated Patient's etc.
+            page_size (int): the maximum number of users returned.
+            page_token (string): the next_page_token of the previous page, None for the first page.
 
         Returns:
-            result (list): resultset of executing an SQL query.
+            page (Page): the users ordered by id and the token of the next page.
         """
 
-        # database query (space left at the end for additional filtering based on admin input).
-        statement = """
-            SELECT user_id, email, first_name, last_name, phone_num, location, address, user_status_name, user_role_name 
-            FROM user, user_status, user_role
-            WHERE user.user_status_id = user_status.user_status_id 
-            AND user.user_role_id = user_role.user_role_id """
+        # users are paged by their id.
+        after = decode_page_token(page_token, 1) if page_token else (0,)
 
         # apply any filters on the view that the admin sees depending on their input. If no filters
         # were selected then all records are selected by default.
-        if view_filter == '' or view_filter == 'All':
-            statement = statement + "AND user.user_role_id != 0" 
-
-        elif view_filter == 'Pending GPs':
-            statement = statement + "AND user.user_status_id = 0 AND user.user_role_id = 1"
-
-        elif view_filter == 'Pending Patients':
-            statement = statement + "AND user.user_status_id = 0 AND user.user_role_id = 2"
+        if view_filter in MANAGE_RECORDS_FILTERS:
+            statement = queries.ADMIN_MANAGE_RECORDS_FILTERED
 
-        elif view_filter == 'Active GPs':
-            statement = statement + "AND user.user_status_id = 1 AND user.user_role_id = 1"
+            # return the page to the caller
+            return fetch_page(self.cursor, statement, MANAGE_RECORDS_FILTERS[view_filter] + after,
+                              lambda row: (row[0],), page_size)
 
-        elif view_filter == 'Active Patients':
-            statement = statement + "AND user.user_status_id = 1 AND user.user_role_id = 2"
+        statement = queries.ADMIN_MANAGE_RECORDS_ALL
 
-        elif view_filter == 'Deactivated GPs':
-            statement = statement + "AND user.user_status_id = -1 AND user.user_role_id = 1"
-
-        elif view_filter == "Deactivated Patients":
-            statement = statement + "AND user.user_status_id = -1 AND user.user_role_id = 2"
-
-        # return the result of the query execution to the caller
-        return self.cursor.execute(statement)
+        # return the page to the caller
+        return fetch_page(self.cursor, statement, after, lambda row: (row[0],), page_size)
 
 
     def delete_user(self, user_id):
@@ -68,16 +68,20 @@ class Admin(User):
             user_id (string): the user id of a user in the system.
         """
 
+        # pages pass the id as typed, an id that is not a number matches no user.
+        user_id = user_key(user_id)
+
         # database query
-        statement = """
-            DELETE FROM user
-            WHERE user_id = '{}'""".format(user_id)
+        statement = queries.ADMIN_DELETE_USER
 
         # execute the statement.
-        self.cursor.execute(statement)
+        self.cursor.execute(statement, (user_id,))
 
         self.conn.commit()
 
+        # drop the cached profile so the change is visible immediately.
+        identity_cache.invalidate(user_id)
+
 
     def activate_user(self, user_id):
         """ Activates a newly registered user in the database.
@@ -89,17 +93,20 @@ class Admin(User):
             user_id (string): the user id of a user in the system.
         """
 
+        # pages pass the id as typed, an id that is not a number matches no user.
+        user_id = user_key(user_id)
+
         # database query
-        statement = """
-            UPDATE user 
-            SET user_status_id = 1 
-            WHERE user_id = '{}'""".format(user_id)
+        statement = queries.ADMIN_SET_USER_STATUS
 
         # execute the statement.
-        self.cursor.execute(statement)
+        self.cursor.execute(statement, (1, user_id))
 
         self.conn.commit()
 
+        # drop the cached profile so the change is visible immediately.
+        identity_cache.invalidate(user_id)
+
 
     def deactivate_user(self, user_id):
         """ Activates a newly registered user in the database.
@@ -108,21 +115,26 @@ class Admin(User):
             user_id (string): the user id of a user in the system.
         """
 
+        # pages pass the id as typed, an id that is not a number matches no user.
+        user_id = user_key(user_id)
+
         # database query
-        statement = """
-            UPDATE user 
-            SET user_status_id = -1 
-            WHERE user_id = '{}'""".format(user_id)
+        statement = queries.ADMIN_SET_USER_STATUS
 
         # execute the statement.
-        self.cursor.execute(statement)
+        self.cursor.execute(statement, (-1, user_id))
 
         self.conn.commit()
 
+        # drop the cached profile so the change is visible immediately.
+        identity_cache.invalidate(user_id)
+
 
     def send_emails_patients(self, option):
         """Sends emails to patients for pending or not pending appointments.
 
+        The emails are only queued here and delivered in the background by the outbox worker.
+
         Args:
             option (string): the status of the next day appointment.
         """
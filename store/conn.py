@@ -1,29 +1,110 @@
-import hashlib
 import logging
 import os
 import platform
 import sqlite3
 
+from store import queries
+from store.passwords import hash_password
 
-def connect_to_database():
+
+# pragmas applied to every connection, in order. Each can be overridden per deployment with an
+# environment variable named after it, e.g. UCLH_PRAGMA_CACHE_SIZE=-64000.
+DEFAULT_PRAGMAS = {
+    # reclaim space of deleted rows with the incremental vacuum job. This only takes effect on a new
+    # database or after a full VACUUM, so it has to come before the journal mode is written.
+    'auto_vacuum': 'INCREMENTAL',
+
+    # write ahead logging lets readers carry on while a write is in progress.
+    'journal_mode': 'WAL',
+
+    # in WAL mode NORMAL is still durable against application crashes but only syncs at checkpoints.
+    'synchronous': 'NORMAL',
+
+    # page cache size, negative values are in KiB (64 MiB).
+    'cache_size': -64000,
+
+    # memory map up to 256 MiB of the database file to avoid read system calls.
+    'mmap_size': 268435456,
+
+    # keep temporary tables and indexes used for sorting in memory.
+    'temp_store': 'MEMORY',
+
+    # wait for other connections to release their locks instead of failing immediately.
+    'busy_timeout': 5000,
+
+    # enforce the foreign keys and cascading deletes declared by the schema.
+    'foreign_keys': 'ON',
+}
+
+
+# number of compiled statements each connection keeps for reuse. This must be at least the number of
+# statements in store/queries.py so that the statements used on hot paths are never evicted.
+CACHED_STATEMENTS = int(os.environ.get('UCLH_CACHED_STATEMENTS', 256))
+
+
+def database_pragmas():
+    """ Returns the pragmas to apply to new connections for this deployment.
+
+    Returns:
+        pragmas (dict): DEFAULT_PRAGMAS updated with any UCLH_PRAGMA_<NAME> environment variables.
+    """
+
+    pragmas = dict(DEFAULT_PRAGMAS)
+
+    for name in pragmas:
+        value = os.environ.get('UCLH_PRAGMA_' + name.upper())
+
+        if value is not None:
+            pragmas[name] = value
+
+    return pragmas
+
+
+def configure_connection(conn, pragmas=None):
+    """ Applies the deployment pragmas followed by any extra pragmas to a connection.
+
+    Args:
+        conn (sqlite3.connection): sqlite3 class object obtained from connecting to the database.
+        pragmas (dict): optional pragma names and values that take precedence over the defaults.
+    """
+
+    settings = database_pragmas()
+    settings.update(pragmas or {})
+
+    for name, value in settings.items():
+        # pragma values cannot be bound as parameters.
+        conn.execute("PRAGMA {} = {}".format(name, value))
+
+
+def connect_to_database(database_path=None, check_same_thread=True, pragmas=None):
     """ Connects to the database file and instantiates sqlite3
 
     This function opens and connects to the sqlite3 database. This function is private and should
     not be used directly outside the store library. If no existing database is found in the store
     directory the user will recieve a warning and a new database will automatically be created.
 
+    Args:
+        database_path (string): optional path to a database file, defaults to store/UCLH.db.
+        check_same_thread (bool): whether only the creating thread may use the connection.
+        pragmas (dict): optional pragma names and values that take precedence over the defaults.
+
     Returns:
         conn (sqlite3.connection): sqlite3 class object obtained from connecting to the database.
         cursor (sqlite3.cursor): sqlite3 class object to enable querying the database.
     """
 
     # the database file should reside in the below location (under the store/ directory).
-    database_path = os.path.join(os.path.abspath(os.getcwd()), 'store', 'UCLH.db')
+    if database_path is None:
+        database_path = os.path.join(os.path.abspath(os.getcwd()), 'store', 'UCLH.db')
 
     # attempt to 
     try:
         # connect to the database and create a sqlite3.conn object
-        conn = sqlite3.connect(database_path)
+        conn = sqlite3.connect(database_path, check_same_thread=check_same_thread,
+                               cached_statements=CACHED_STATEMENTS)
+
+        # apply the journaling, caching and locking settings of this deployment.
+        configure_connection(conn, pragmas)
 
         # create a sqlite3.cursor object
         cursor = conn.cursor()
@@ -50,16 +131,21 @@ def connect_to_database():
             os._exit(-43)
 
 
-def create_database():
+def create_database(database_path=None, migrate=True, pragmas=None):
     """ Creates the backend database schema.
 
     This function creates the tables required for operation of the application. The function is 
     private and should not be used directly outside the store library. If the database already has
-    the required tables up and running this function does nothing.
+    the required tables up and running this function only applies any pending schema migrations.
+
+    Args:
+        database_path (string): optional path to a database file, defaults to store/UCLH.db.
+        migrate (bool): whether to upgrade the schema to the latest version after creation.
+        pragmas (dict): optional pragma names and values that take precedence over the defaults.
     """
 
     # calling connect to db to create conn and cursor:
-    conn, cursor = connect_to_database()
+    conn, cursor = connect_to_database(database_path, pragmas=pragmas)
 
     # the user_status table stores whether an account is pending activation, active or deactivated.
     cursor.execute("""
@@ -221,106 +307,341 @@ def create_database():
             (4, 'GP ACTION REQUIRED')
     """)
 
-    # insert an initialized Admin.
-    admin_pass = 'AdminPassword'
-    hash_admin_pass = hashlib.sha1(admin_pass.encode('utf-8')).hexdigest()
-
-    statement = """
-        INSERT OR IGNORE INTO user (
-            email,
-            password,
-            first_name,
-            last_name,
-            phone_num,
-            address,
-            location,
-            user_status_id,
-            user_role_id
-        ) 
-        VALUES (
-            'admin@mail.com',
-            '{}',
-            'AdminBro',
-            'AdminSmith',
-            '07965434794',
-            'admin avenue',
-            'London',
-            1,
-            0)""".format(hash_admin_pass)
-
-    cursor.execute(statement)
-
-    # insert an initialized GP.
-    gp_pass = 'GpPassword'
-    hash_gp_pass = hashlib.sha1(gp_pass.encode('utf-8')).hexdigest()
-
-    statement = """
-        INSERT OR IGNORE INTO user (
-            email,
-            password,
-            first_name,
-            last_name,
-            phone_num,
-            address,
-            location,
-            user_status_id,
-            user_role_id
-        ) 
-        VALUES (
-            'gp@mail.com',
-            '{}',
-            'GpHuman',
-            'GpSmith',
-            '07965434794',
-            'gp grange',
-            'London',
-            1,
-            1)""".format(hash_gp_pass)
-
-    cursor.execute(statement)
-
-    # insert an initialized Patient.
-    patient_pass = 'PatientPassword'
-    hash_patient_pass = hashlib.sha1(patient_pass.encode('utf-8')).hexdigest()
-
-    statement = """
-        INSERT OR IGNORE INTO user (
-            email,
-            password,
-            first_name,
-            last_name,
-            phone_num,
-            address,
-            location,
-            user_status_id,
-            user_role_id
-        ) 
-        VALUES (
-            'patient@mail.com',
-            '{}',
-            'Patience',
-            'PatientSmith',
-            '07965434794',
-            'patient parade',
-            'London',
-            1,
-            2)""".format(hash_patient_pass)
-
-    cursor.execute(statement)
-
-    # enable foreign key usage within sqlite3.
-    cursor.execute("""
-        PRAGMA foreign_keys = ON
-    """)
-
-    # enable automatic compaction upon deleting rows within the database to save space.
-    cursor.execute("""
-        PRAGMA auto_vacuum = FULL
-    """)
+    # insert the initialized Admin, GP and Patient. A password takes tens of milliseconds to hash
+    # (see store/passwords.py) and the database is created every time the store is imported, so
+    # only the accounts that do not exist yet are hashed.
+    seed_users = [
+        ('admin@mail.com', 'AdminPassword', 'AdminBro', 'AdminSmith', '07965434794', 'admin avenue', 'London', 1, 0),
+        ('gp@mail.com', 'GpPassword', 'GpHuman', 'GpSmith', '07965434794', 'gp grange', 'London', 1, 1),
+        ('patient@mail.com', 'PatientPassword', 'Patience', 'PatientSmith', '07965434794', 'patient parade', 'London', 1, 2),
+    ]
+
+    for email, password, *details in seed_users:
+        if not cursor.execute(queries.USER_EMAIL_EXISTS, (email,)).fetchone()[0]:
+            cursor.execute(queries.SEED_USER, (email, hash_password(password), *details))
+
+    # foreign keys and compaction upon deleting rows are enabled by the connection pragmas, see
+    # DEFAULT_PRAGMAS and store.maintenance.incremental_vacuum.
 
     # commit insertion operations
     conn.commit()
 
+    # upgrade the schema of new and existing databases in place.
+    if migrate:
+        migrate_database(conn, cursor)
+
+    conn.close()
+
+
+def _migration_1_secondary_indexes(cursor):
+    """ Adds secondary indexes matching the lookups made by the Admin, GP and Patient classes. """
+
+    # gp availability lookups filter on the doctor and then on a date range of the slot datetime.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_availability_doctor_datetime
+        ON availability (doctor_id, datetime)
+    """)
+
+    # patient availability searches and the appointment status sweeps filter on datetime alone.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_availability_datetime
+        ON availability (datetime)
+    """)
+
+    # patient appointment and prescription views filter on the patient and then on the status.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointment_patient_status
+        ON appointment (patient_id, appointment_status_id)
+    """)
+
+    # every appointment view joins appointments back to the availability they were booked for.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointment_availability
+        ON appointment (availability_id)
+    """)
+
+    # the reminder emails and status sweeps select appointments by status only.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_appointment_status
+        ON appointment (appointment_status_id)
+    """)
+
+    # medical records are always looked up through the appointment they belong to.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_medical_record_appointment
+        ON medical_record (appointment_id)
+    """)
+
+    # patients search for gp's by location and role.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_location_role
+        ON user (location, user_role_id)
+    """)
+
+    # the admin management views and gp patient searches filter on role and account status.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_role_status
+        ON user (user_role_id, user_status_id)
+    """)
+
+
+def _migration_2_unique_availability(cursor):
+    """ Makes a gp's availability slots unique so that bulk writes can use INSERT OR IGNORE. """
+
+    # slots were previously added with a check-then-insert, so duplicates may already exist. Point any
+    # appointment booked on a duplicate at the oldest copy of the slot before removing the others.
+    cursor.execute("""
+        UPDATE appointment
+        SET availability_id = (
+            SELECT MIN(keep.availability_id)
+            FROM availability AS slot, availability AS keep
+            WHERE slot.availability_id = appointment.availability_id
+            AND keep.doctor_id = slot.doctor_id
+            AND keep.datetime = slot.datetime)
+        WHERE availability_id IN (SELECT availability_id FROM availability)
+    """)
+
+    # a slot stays booked if any of its copies was booked.
+    cursor.execute("""
+        UPDATE availability
+        SET availability_status_id = (
+            SELECT MAX(copy.availability_status_id)
+            FROM availability AS copy
+            WHERE copy.doctor_id = availability.doctor_id
+            AND copy.datetime = availability.datetime)
+    """)
+
+    cursor.execute("""
+        DELETE FROM availability
+        WHERE availability_id NOT IN (
+            SELECT MIN(availability_id)
+            FROM availability
+            GROUP BY doctor_id, datetime)
+    """)
+
+    # replace the plain lookup index from version 1 with a unique one on the same columns.
+    cursor.execute("DROP INDEX IF EXISTS idx_availability_doctor_datetime")
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_availability_doctor_datetime
+        ON availability (doctor_id, datetime)
+    """)
+
+
+def _migration_3_availability_templates(cursor):
+    """ Adds the availability_template table storing gp's recurring weekly availability. """
+
+    # each row is a rule such as "Mon-Fri 09:00-12:00 until the end of June", the slots it describes
+    # are written to the availability table when the template is materialized (see store/schedule.py).
+    # weekdays is a comma separated list of day numbers, 0 is Monday and 6 is Sunday.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS availability_template (
+            template_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doctor_id INTEGER,
+            weekdays TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            slot_minutes INTEGER,
+
+            FOREIGN KEY (doctor_id)
+                REFERENCES user (user_id)
+                ON DELETE CASCADE
+                ON UPDATE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_availability_template_doctor
+        ON availability_template (doctor_id)
+    """)
+
+
+def _migration_4_maintenance_state(cursor):
+    """ Adds the maintenance_state table storing progress of the background maintenance jobs. """
+
+    # a key / value store, e.g. the datetime up to which past appointments have been swept.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def _migration_5_outbox(cursor):
+    """ Adds the outbox table holding notification emails waiting to be delivered. """
+
+    # notifications are written here in the same transaction as the change they are about and
+    # delivered later by the outbox worker (see store/outbox.py). The idempotency key makes sure the
+    # same notification is only ever queued once, status is 0 while waiting, 1 once sent and -1 once
+    # delivery has been given up on.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            outbox_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT UNIQUE,
+            recipient TEXT,
+            subject TEXT,
+            body TEXT,
+            status INTEGER DEFAULT 0,
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at TEXT,
+            last_error TEXT,
+            created_at TEXT,
+            sent_at TEXT
+        )
+    """)
+
+    # the worker looks for waiting notifications that are due.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_status_next_attempt
+        ON outbox (status, next_attempt_at)
+    """)
+
+
+def _migration_6_outbox_text_body(cursor):
+    """ Adds the plain text alternative of a notification to the outbox table. """
+
+    # notifications queued before this migration only have the html body and are still sent as is.
+    cursor.execute("ALTER TABLE outbox ADD COLUMN text_body TEXT")
+
+
+def _migration_7_user_search(cursor):
+    """ Adds the user_search full text index over the names and contact details of users.
+
+    The index is kept in sync with the user table by triggers. If sqlite was built without FTS5 the
+    index is not created and patient searches fall back to LIKE (see GP.search_patients), the index
+    is then created by migrate_database once sqlite supports FTS5.
+
+    Returns:
+        created (bool): whether the index was created.
+    """
+
+    # an external content table, the indexed text is read from the user table so it is not stored
+    # twice. Prefix indexes of 2 and 3 characters make as-you-type searches cheap.
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5 (
+                first_name,
+                last_name,
+                email,
+                phone_num,
+                address,
+                content = 'user',
+                content_rowid = 'user_id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+
+    except sqlite3.OperationalError as er:
+        logging.warning("Full text patient search is not available: %s", er)
+        return False
+
+    # matches on a name rank above matches on contact details.
+    cursor.execute("""
+        INSERT INTO user_search (user_search, rank)
+        VALUES ('rank', 'bm25(10.0, 10.0, 2.0, 1.0, 1.0)')
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS user_search_insert AFTER INSERT ON user BEGIN
+            INSERT INTO user_search (rowid, first_name, last_name, email, phone_num, address)
+            VALUES (new.user_id, new.first_name, new.last_name, new.email, new.phone_num, new.address);
+        END
+    """)
+
+    # an external content index is updated by 'deleting' the old values and inserting the new ones.
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS user_search_delete AFTER DELETE ON user BEGIN
+            INSERT INTO user_search (user_search, rowid, first_name, last_name, email, phone_num, address)
+            VALUES ('delete', old.user_id, old.first_name, old.last_name, old.email, old.phone_num, old.address);
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS user_search_update
+        AFTER UPDATE OF user_id, first_name, last_name, email, phone_num, address ON user BEGIN
+            INSERT INTO user_search (user_search, rowid, first_name, last_name, email, phone_num, address)
+            VALUES ('delete', old.user_id, old.first_name, old.last_name, old.email, old.phone_num, old.address);
+            INSERT INTO user_search (rowid, first_name, last_name, email, phone_num, address)
+            VALUES (new.user_id, new.first_name, new.last_name, new.email, new.phone_num, new.address);
+        END
+    """)
+
+    # index the users that already exist.
+    cursor.execute("INSERT INTO user_search (user_search) VALUES ('rebuild')")
+
+    return True
+
+
+# ordered list of schema migrations as (version, migration) pairs. A migration is a function that
+# takes a sqlite3.cursor and upgrades the schema from the previous version. New migrations must be
+# appended with the next version number; existing entries must never be edited as they may have
+# already been applied to a deployed database.
+MIGRATIONS = [
+    (1, _migration_1_secondary_indexes),
+    (2, _migration_2_unique_availability),
+    (3, _migration_3_availability_templates),
+    (4, _migration_4_maintenance_state),
+    (5, _migration_5_outbox),
+    (6, _migration_6_outbox_text_body),
+    (7, _migration_7_user_search),
+]
+
+
+def migrate_database(conn, cursor):
+    """ Upgrades the database schema to the latest version.
+
+    The schema version of a database is stored in the sqlite 'user_version' pragma. Every migration
+    with a version greater than the stored version is applied in order, each one in its own
+    transaction together with the update of the stored version, so an interrupted upgrade can be
+    safely resumed the next time the application starts.
+
+    Args:
+        conn (sqlite3.connection): sqlite3 class object obtained from connecting to the database.
+        cursor (sqlite3.cursor): sqlite3 class object to enable querying the database.
+
+    Returns:
+        version (int): the schema version of the database after migrating.
+    """
+
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+
+    for migration_version, migration in MIGRATIONS:
+        # skip migrations that have already been applied to this database.
+        if migration_version <= version:
+            continue
+
+        try:
+            cursor.execute("BEGIN")
+            migration(cursor)
+
+            # pragma values cannot be bound as parameters.
+            cursor.execute("PRAGMA user_version = {}".format(int(migration_version)))
+            conn.commit()
+
+        except sqlite3.Error:
+            conn.rollback()
+            logging.warning("Database migration to version %s failed.", migration_version)
+            raise
+
+        version = migration_version
+
+    # migration 7 is recorded as applied even where sqlite was built without FTS5, so the index is
+    # created as soon as sqlite supports it.
+    if version >= 7 and not cursor.execute(queries.GP_FULL_TEXT_SEARCH_AVAILABLE).fetchone()[0]:
+        try:
+            cursor.execute("BEGIN")
+            _migration_7_user_search(cursor)
+            conn.commit()
+
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    return version
+
 
 # if the file is run as main, the above two methods are called to generate the conn and cursor
 # objects and to enable unit tests.
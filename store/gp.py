@@ -1,6 +1,24 @@
+import datetime
+import sqlite3
+
+from store import queries
+from store.identity import identity_cache
+from store.pagination import DEFAULT_PAGE_SIZE, Page, decode_page_token, fetch_page
+from store.schedule import AvailabilityTemplate, chunked
+from store.search import SEARCH_LIMIT, match_expression
 from store.user import User
 
 
+# action -> the appointment_status_id it sets and the statuses it can be applied to, as offered by
+# the manage appointment page: pending requests are confirmed or removed, confirmed appointments
+# (also once the sweep has marked them GP ACTION REQUIRED) are marked missed.
+APPOINTMENT_ACTIONS = {
+    'confirm': (1, (0,)),
+    'remove': (-1, (0,)),
+    'missed': (-3, (1, 4)),
+}
+
+
 class GP(User):
     """ The GP class groups methods required for the functionality of an GP user. """
 
@@ -22,13 +40,11 @@ class GP(User):
             result (list): the set of time slots that the GP is available
         """
 
-        statement = """
-            SELECT date(datetime), time(datetime) 
-            FROM availability 
-            WHERE doctor_id = '{}' 
-            AND date(datetime) = '{}'""".format(gp_id, availability_date)
+        day_start, day_end = self.day_range(availability_date)
+
+        statement = queries.GP_AVAILABILITY_DATA
 
-        return self.cursor.execute(statement)
+        return self.cursor.execute(statement, (gp_id, day_start, day_end))
 
 
     def update_availability_add(self, gp_id, timestamp):
@@ -39,24 +55,10 @@ class GP(User):
              timestamp (string): the date + time that the GP is available.
         """
 
-        # statement that checks whether the availability already exists in the database.
-        check_availability_statement = """
-            SELECT datetime 
-            FROM availability 
-            WHERE doctor_id = '{}' 
-            AND datetime = '{}'""".format(gp_id, timestamp)
+        # statement that inserts the new availability unless the slot already exists.
+        statement = queries.GP_INSERT_AVAILABILITY
 
-        # statement that inserts the new availability into the database.
-        insert_availability_statement = """
-            INSERT INTO availability (doctor_id, datetime, availability_status_id) 
-            VALUES ('{}', '{}', '{}')""".format(gp_id, timestamp, 0)
-
-        result = self.cursor.execute(check_availability_statement)
-        row = result.fetchall()
-
-        # if the date does not already exists in the database then execure the insert statement.
-        if len(row) < 1:
-            self.cursor.execute(insert_availability_statement)
+        self.cursor.execute(statement, (gp_id, timestamp))
 
         self.conn.commit()
 
@@ -69,16 +71,232 @@ class GP(User):
              timestamp (string): the date + time that the GP is available.
         """
 
-        statement = """
-            DELETE FROM availability 
-            WHERE doctor_id = '{}' 
-            AND datetime = '{}'""".format(gp_id, timestamp)
+        statement = queries.GP_DELETE_AVAILABILITY
         
-        self.cursor.execute(statement)
+        self.cursor.execute(statement, (gp_id, timestamp))
 
         self.conn.commit()
 
 
+    def set_day_availability(self, gp_id, availability_date, slots):
+        """ Makes the given time slots the GP's availability for one day.
+
+        The desired slots are compared with the ones already stored for the day and only the
+        difference is written, all in a single transaction. Slots that a patient has already booked
+        are never removed.
+
+        Args:
+            gp_id (int): the GP's user id.
+            availability_date (string): the day to update, formatted as YYYY-MM-DD.
+            slots (list): the times the GP is available on that day, formatted as HH:MM.
+
+        Returns:
+            added (int): the number of slots that were made available.
+            removed (int): the number of slots that were removed.
+        """
+
+        day_start, day_end = self.day_range(availability_date)
+
+        desired = set(slot[0:5] for slot in slots)
+
+        # map the time of every stored slot to its id and status.
+        stored = {}
+        for availability_id, slot, status in self.cursor.execute(queries.GP_DAY_AVAILABILITY, (gp_id, day_start, day_end)):
+            stored[slot] = (availability_id, status)
+
+        added = [(gp_id, availability_date + " " + slot) for slot in sorted(desired - set(stored))]
+        removed = [(stored[slot][0],) for slot in sorted(set(stored) - desired) if stored[slot][1] == 0]
+
+        try:
+            self.cursor.executemany(queries.GP_INSERT_AVAILABILITY, added)
+            self.cursor.executemany(queries.GP_DELETE_FREE_AVAILABILITY, removed)
+            self.conn.commit()
+
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+        return len(added), len(removed)
+
+
+    def add_availability_template(self, gp_id, template):
+        """ Saves a recurring availability template and makes its slots available.
+
+        Args:
+            gp_id (int): the GP's user id.
+            template (AvailabilityTemplate): the recurring weekly availability.
+
+        Returns:
+            template_id (int): the id of the saved template.
+            added (int): the number of slots that were made available.
+        """
+
+        try:
+            self.cursor.execute(queries.GP_INSERT_TEMPLATE, (gp_id,) + template.to_row())
+            template_id = self.cursor.lastrowid
+
+            added = self._write_slots(queries.GP_INSERT_AVAILABILITY, gp_id, template.expand(self._today()))
+            self.conn.commit()
+
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+        return template_id, added
+
+
+    def availability_templates(self, gp_id):
+        """ Fetch the recurring availability templates of a GP.
+
+        Args:
+            gp_id (int): the GP's user id.
+
+        Returns:
+            templates (list): (template_id, AvailabilityTemplate) pairs in the order they were added.
+        """
+
+        rows = self.cursor.execute(queries.GP_TEMPLATES, (gp_id,)).fetchall()
+
+        return [(row[0], AvailabilityTemplate.from_row(row[1:])) for row in rows]
+
+
+    def materialize_template(self, template_id, since=None):
+        """ Makes every slot of a saved template available from the given day onwards.
+
+        Slots that already exist are left untouched, so this can safely be run again, e.g. to
+        restore slots that were removed by hand.
+
+        Args:
+            template_id (int): the id of the template.
+            since (string): the first day to write slots for, formatted as YYYY-MM-DD. Defaults to
+                today as slots in the past can never be booked.
+
+        Returns:
+            added (int): the number of slots that were made available.
+        """
+
+        gp_id, template = self._template(template_id)
+
+        try:
+            added = self._write_slots(queries.GP_INSERT_AVAILABILITY, gp_id, template.expand(since or self._today()))
+            self.conn.commit()
+
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+        return added
+
+
+    def update_availability_template(self, template_id, template, since=None):
+        """ Replaces a saved template and re-materializes only the slots that changed.
+
+        Slots described by the old rule but not the new one are removed unless a patient has booked
+        them, slots only described by the new rule are added and every other slot is left untouched.
+
+        Args:
+            template_id (int): the id of the template to replace.
+            template (AvailabilityTemplate): the new recurring weekly availability.
+            since (string): the first day to change slots for, formatted as YYYY-MM-DD. Defaults to
+                today so past availability is kept as it was.
+
+        Returns:
+            added (int): the number of slots that were made available.
+            removed (int): the number of slots that were removed.
+        """
+
+        gp_id, old_template = self._template(template_id)
+        since = since or self._today()
+
+        old_slots = set(old_template.expand(since))
+        new_slots = set(template.expand(since))
+
+        try:
+            self.cursor.execute(queries.GP_UPDATE_TEMPLATE, template.to_row() + (template_id,))
+            removed = self._write_slots(queries.GP_DELETE_FREE_SLOT, gp_id, sorted(old_slots - new_slots))
+            added = self._write_slots(queries.GP_INSERT_AVAILABILITY, gp_id, sorted(new_slots - old_slots))
+            self.conn.commit()
+
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+        return added, removed
+
+
+    def remove_availability_template(self, template_id, since=None):
+        """ Deletes a saved template together with its slots that have not been booked.
+
+        Args:
+            template_id (int): the id of the template to delete.
+            since (string): the first day to remove slots for, formatted as YYYY-MM-DD. Defaults to
+                today.
+
+        Returns:
+            removed (int): the number of slots that were removed.
+        """
+
+        gp_id, template = self._template(template_id)
+
+        try:
+            removed = self._write_slots(queries.GP_DELETE_FREE_SLOT, gp_id, template.expand(since or self._today()))
+            self.cursor.execute(queries.GP_DELETE_TEMPLATE, (template_id,))
+            self.conn.commit()
+
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+        return removed
+
+
+    def _template(self, template_id):
+        """ Loads a saved template.
+
+        Returns:
+            gp_id (int): the user id of the GP the template belongs to.
+            template (AvailabilityTemplate): the recurring weekly availability.
+
+        Raises:
+            KeyError: if no template with the given id exists.
+        """
+
+        row = self.cursor.execute(queries.GP_TEMPLATE, (template_id,)).fetchone()
+
+        if row is None:
+            raise KeyError(template_id)
+
+        return row[0], AvailabilityTemplate.from_row(row[1:])
+
+
+    def _write_slots(self, statement, gp_id, slots):
+        """ Runs an insert or delete statement for each slot in chunks, without committing.
+
+        Args:
+            statement (string): a statement taking the gp id and the slot datetime as parameters.
+            gp_id (int): the GP's user id.
+            slots (iterable): slot datetimes, consumed lazily so long templates are never held in
+                memory all at once.
+
+        Returns:
+            changed (int): the number of rows inserted or deleted.
+        """
+
+        changes = self.conn.total_changes
+
+        for chunk in chunked((gp_id, slot) for slot in slots):
+            self.cursor.executemany(statement, chunk)
+
+        return self.conn.total_changes - changes
+
+
+    @staticmethod
+    def _today():
+        """ Returns the current day formatted as YYYY-MM-DD. """
+
+        return datetime.date.today().isoformat()
+
+
     def display_pending_appointments(self, gp_id, appointment_date):
         """ Fetch list of appointments with a status of pending.
 
@@ -90,17 +308,12 @@ class GP(User):
             result (list): the set of time slots that the GP is available
         """
 
-        statement = """
-            SELECT appointment_id, user_id, first_name, last_name, datetime, patient_summary 
-            FROM user, appointment, availability
-            WHERE user.user_id = patient_id 
-            AND appointment_status_id = '0' 
-            AND date(datetime) > '{}'
-            AND appointment.availability_id = availability.availability_id 
-            AND doctor_id = '{}'
-            ORDER BY datetime ASC""".format(appointment_date, gp_id)
+        # appointments after the given date start from the beginning of the following day.
+        day_start, day_end = self.day_range(appointment_date)
+
+        statement = queries.GP_PENDING_APPOINTMENTS
 
-        return self.cursor.execute(statement)
+        return self.cursor.execute(statement, (day_end, gp_id))
 
 
     def display_confirmed_appointments(self, gp_id, appointment_date):
@@ -114,18 +327,11 @@ class GP(User):
             result (list): the set of time slots that the GP is available
         """
 
-        statement = """
-            SELECT appointment_id,user_id,first_name, last_name, time(datetime), appointment_status_name, patient_summary
-            FROM user, appointment, availability, appointment_status
-            WHERE user.user_id = patient_id 
-            AND (appointment.appointment_status_id > 0 OR appointment.appointment_status_id = -3)
-            AND appointment.availability_id=availability.availability_id
-            AND appointment.appointment_status_id = appointment_status.appointment_status_id
-            AND date(datetime) = '{}' 
-            AND doctor_id = '{}'
-            ORDER BY time(datetime) ASC""".format(appointment_date, gp_id)
+        day_start, day_end = self.day_range(appointment_date)
+
+        statement = queries.GP_CONFIRMED_APPOINTMENTS
 
-        return self.cursor.execute(statement)
+        return self.cursor.execute(statement, (day_start, day_end, gp_id))
 
 
     def update_appointment(self, appointment_id, gp_id, appointment_time, action):
@@ -138,44 +344,63 @@ class GP(User):
              action (string): the option the gp selects (confirm, remove or missed).
         """
 
-        confirm_appointment_statement = """
-            UPDATE appointment 
-            SET appointment_status_id = 1 
-            WHERE appointment_id = '{}'""".format(appointment_id)
-
-        remove_appointment_statement = """
-            UPDATE appointment 
-            SET appointment_status_id = -1 
-            WHERE appointment_id = '{}'""".format(appointment_id)
-
-        update_removed_appointment_availability_statement = """
-            UPDATE availability 
-            SET availability_status_id = 0 
-            WHERE datetime = '{}'
-            AND doctor_id = '{}'""".format(appointment_time, gp_id)
+        # statement that changes the status of the appointment.
+        appointment_status_statement = queries.GP_SET_APPOINTMENT_STATUS
 
-        missed_appointment_statement = """
-            UPDATE appointment 
-            SET appointment_status_id = -3 
-            WHERE appointment_id = '{}'""".format(appointment_id)
+        update_removed_appointment_availability_statement = queries.GP_RELEASE_AVAILABILITY
 
         # GP approves the appointment requested by the patient
         if action == "confirm":
-            self.cursor.execute(confirm_appointment_statement)
+            self.cursor.execute(appointment_status_statement, (1, appointment_id))
 
         # GP cancels the appointment requested by the patient change the appointment status to cancelled by GP
         # change the availability status of the appointment to 0 - available
         elif action == "remove":
-            self.cursor.execute(remove_appointment_statement)
-            self.cursor.execute (update_removed_appointment_availability_statement)
+            self.cursor.execute(appointment_status_statement, (-1, appointment_id))
+            self.cursor.execute(update_removed_appointment_availability_statement, (appointment_time, gp_id))
 
         elif action == "missed":
             # GP changes the status of the appointment when the patient misses the appointment
-            self.cursor.execute(missed_appointment_statement)
+            self.cursor.execute(appointment_status_statement, (-3, appointment_id))
 
         self.conn.commit()
 
 
+    def update_booked_appointment(self, appointment_id, gp_id, action):
+        """ Updates the status of one of the GP's own appointments.
+
+        Unlike update_appointment the appointment must be booked on one of the GP's slots and be in
+        a status the action applies to (see APPOINTMENT_ACTIONS), and a removed appointment frees
+        the slot it was booked on. Everything happens in one transaction holding the write lock.
+
+        Args:
+            appointment_id (int): the unique id of the appointment.
+            gp_id (int): the GP's user id.
+            action (string): the option the gp selects (confirm, remove or missed).
+
+        Returns:
+            updated (bool): False if the GP has no such appointment or the action does not apply
+                to its status.
+        """
+
+        status, applies_to = APPOINTMENT_ACTIONS[action]
+
+        def update(cursor):
+            owner = cursor.execute(queries.USER_APPOINTMENT_OWNER, (appointment_id,)).fetchone()
+
+            if owner is None or owner[1] != gp_id or owner[4] not in applies_to:
+                return False
+
+            cursor.execute(queries.GP_SET_APPOINTMENT_STATUS, (status, appointment_id))
+
+            if action == 'remove':
+                cursor.execute(queries.USER_RELEASE_APPOINTMENT_AVAILABILITY, (owner[2],))
+
+            return True
+
+        return self._immediate_transaction(update)
+
+
     def patient_data(self, id, id_type, data_type):
         """ Retrieves the patient's data from the database
 
@@ -188,41 +413,40 @@ class GP(User):
             row (list): resultset row of executing an SQL query.
         """
 
-        # Retrieve the patient's personal data using the patient id
+        # Retrieve the patient's personal data using the patient id, served from the identity cache.
         if data_type == "personal" and id_type == "patient":
-            res = self.cursor.execute("""SELECT user_id,first_name, last_name, email, phone_num, location, address 
-                                        FROM user WHERE user_id=? """, (id,))
-            row = res.fetchall()
-            return row
+            return self._patient_profile(id)
 
         # Retrieve the patient's personal data using the appointment id
         elif data_type == "personal" and id_type == "appointment":
-            res = self.cursor.execute("""SELECT user_id,first_name, last_name, email, phone_num, location, address 
-                                FROM appointment, user WHERE appointment_id=? AND appointment.patient_id=user.user_id """,
-                                 (id,))
-            row = res.fetchall()
-            return row
+            res = self.cursor.execute(queries.GP_APPOINTMENT_PATIENT, (id,)).fetchone()
+            return self._patient_profile(res[0]) if res is not None else []
 
         # Retrieve the patient's medical data using the patient id
         elif data_type == "medical" and id_type == "patient":
-            res = self.cursor.execute("""SELECT datetime,diagnosis, prescription_info, doctors_comment
-                    FROM medical_record, appointment,availability,user WHERE appointment.appointment_id=medical_record.appointment_id
-                                 AND appointment.availability_id=availability.availability_id AND appointment.patient_id=user.user_id
-                                 AND appointment.patient_id=?
-                                 ORDER BY datetime ASC """, (id,))
+            res = self.cursor.execute(queries.GP_PATIENT_MEDICAL_BY_PATIENT, (id,))
             row = res.fetchall()
             return row
 
         # Retrieve the patient's appointment data using the appointment id
         elif data_type == "appointment" and id_type == "appointment":
-            res = self.cursor.execute("""SELECT appointment_id, appointment_status_name, time(datetime), patient_summary
-                                FROM appointment, availability, appointment_status 
-                                WHERE appointment_id=? AND appointment.appointment_status_id=appointment_status.appointment_status_id """,
-                                 (id,))
+            res = self.cursor.execute(queries.GP_APPOINTMENT_BY_APPOINTMENT, (id,))
             row = res.fetchall()
             return row
 
 
+    def _patient_profile(self, patient_id):
+        """ Returns the personal data of a patient in the shape of a resultset, empty if not found. """
+
+        # a patient id selected in an empty table row is None.
+        if patient_id is None:
+            return []
+
+        row = identity_cache.profile(self.cursor, patient_id)
+
+        return [row[:7]] if row is not None else []
+
+
     def view_past_prescriptions(self, appointment_id,):
         """ Allows a gp to view a previous prescription of an appointment.
 
@@ -233,13 +457,9 @@ class GP(User):
             result (list): resultset of executing an SQL query.
         """
 
-        statement = """
-            SELECT medical_record.appointment_id, diagnosis, prescription_info, doctors_comment
-            FROM medical_record, appointment 
-            WHERE appointment.appointment_id = '{}' 
-            AND appointment.appointment_id = medical_record.appointment_id""".format(appointment_id)
+        statement = queries.GP_PAST_PRESCRIPTIONS
 
-        return self.cursor.execute(statement)
+        return self.cursor.execute(statement, (appointment_id,))
 
 
     def issue_prescription(self, appointment_id, prescription_info, diagnosis, doctors_comment):
@@ -252,52 +472,37 @@ class GP(User):
              doctors_comment (string): any extra comments the doctor has regarding the patient.
         """
         
-        # update appointment status statement executed if prescription not given.
-        no_prescription_statement = """
-            UPDATE appointment 
-            SET appointment_status_id = 2 
-            WHERE appointment_id = '{}'""".format(appointment_id)
-
-        # update appointment status statement executed if prescription was given at appointment.
-        prescription_given_statement = """
-            UPDATE appointment 
-            SET appointment_status_id = 3 
-            WHERE appointment_id = '{}'""".format(appointment_id)
-        # statement to check if a medical record already exists in the database.
+        # update appointment status statement, 2 if prescription not given and 3 if it was given.
+        appointment_status_statement = queries.GP_SET_APPOINTMENT_STATUS
 
-        check_record_exists_statement = """
-            SELECT appointment_id, prescription_info, diagnosis, doctors_comment 
-            FROM medical_record
-            WHERE appointment_id = '{}'""".format(appointment_id)
+        # statement to check if a medical record already exists in the database.
+        check_record_exists_statement = queries.GP_CHECK_MEDICAL_RECORD
 
-        insert_new_record_statement = """
-            INSERT INTO medical_record (appointment_id, prescription_info, diagnosis, doctors_comment) 
-            VALUES ('{}','{}','{}','{}')""".format(appointment_id, prescription_info, diagnosis, doctors_comment)
+        insert_new_record_statement = queries.GP_INSERT_MEDICAL_RECORD
 
-        update_record_statement = """
-            UPDATE medical_record 
-            SET prescription_info = '{}', diagnosis = '{}', doctors_comment = '{}' 
-            WHERE appointment_id = '{}'""".format(prescription_info, diagnosis, doctors_comment, appointment_id)
+        update_record_statement = queries.GP_UPDATE_MEDICAL_RECORD
 
         if prescription_info == "":
-            self.cursor.execute(no_prescription_statement)
+            self.cursor.execute(appointment_status_statement, (2, appointment_id))
 
         else:
-            self.cursor.execute(prescription_given_statement)
+            self.cursor.execute(appointment_status_statement, (3, appointment_id))
 
         self.conn.commit()
 
-        result = self.cursor.execute(check_record_exists_statement)
+        result = self.cursor.execute(check_record_exists_statement, (appointment_id,))
 
         row = result.fetchone()
 
         # if no rows are return from above query then this is a new appointment record.
         if row is None:
-            self.cursor.execute(insert_new_record_statement)
+            self.cursor.execute(insert_new_record_statement,
+                                (appointment_id, prescription_info, diagnosis, doctors_comment))
 
         # an existing appointment record is being updated.
         else:
-            self.cursor.execute(update_record_statement)
+            self.cursor.execute(update_record_statement,
+                                (prescription_info, diagnosis, doctors_comment, appointment_id))
 
         self.conn.commit()
 
@@ -311,29 +516,59 @@ class GP(User):
         Returns:
             result (list): resultset of executing an SQL query.
         """
-        
-        # prepares the patient name to be searched using the 'LIKE' function of SQL.
-        sql_prepared_name = "%" + patient_name + "%"
-
-        statement = """
-            SELECT user_id, first_name, last_name, phone_num,address, location
-            FROM user 
-            WHERE (first_name LIKE '{}' OR last_name LIKE '{}') 
-            AND user_role_id = 2 
-            AND user_status_id = 1""".format(sql_prepared_name, sql_prepared_name)
-
-        # default search if the patient_name is empty.
-        empty_name_statement = """
-            SELECT user_id, first_name, last_name, phone_num,address, location
-            FROM user 
-            WHERE user_role_id = 2 
-            AND user_status_id = 1"""
-
-        if patient_name == "":
-            return self.cursor.execute(empty_name_statement)
-        
-        else:
-            return self.cursor.execute(statement)
+
+        return self.search_patients(patient_name)
+
+
+    def all_patients(self, page_size=DEFAULT_PAGE_SIZE, page_token=None):
+        """ Gets a page of the active patients.
+
+        Args:
+            page_size (int): the maximum number of patients returned.
+            page_token (string): the next_page_token of the previous page, None for the first page.
+
+        Returns:
+            page (Page): the patients ordered by id and the token of the next page.
+        """
+
+        # patients are paged by their id.
+        after = decode_page_token(page_token, 1) if page_token else (0,)
+
+        return fetch_page(self.cursor, queries.GP_ALL_PATIENTS, after, lambda row: (row[0],), page_size)
+
+
+    def search_patients(self, text, limit=SEARCH_LIMIT, page_token=None):
+        """ Searches active patients by name, email, phone number or address.
+
+        Every word of the text matches the start of a word in the indexed fields, e.g. 'ann smi'
+        finds 'Anna Smith', and results are ranked with matches on names first. The search uses the
+        user_search full text index, or a slower LIKE search on the names if sqlite was built
+        without FTS5.
+
+        Args:
+            text (string): the search text, all active patients are returned page by page if it is
+                empty.
+            limit (int): the maximum number of patients returned.
+            page_token (string): the next_page_token of the previous page when listing all patients.
+
+        Returns:
+            page (Page): the patients, search results only have a single page.
+        """
+
+        expression = match_expression(text)
+
+        # default search if the text has no words.
+        if expression is None:
+            return self.all_patients(limit, page_token)
+
+        if self.cursor.execute(queries.GP_FULL_TEXT_SEARCH_AVAILABLE).fetchone()[0]:
+            return Page(self.cursor.execute(queries.GP_SEARCH_PATIENTS_FULL_TEXT, (expression, limit)).fetchall())
+
+        # prepares the text to be searched using the 'LIKE' function of SQL.
+        sql_prepared_name = "%" + text.strip() + "%"
+
+        return Page(self.cursor.execute(queries.GP_SEARCH_PATIENTS_BY_NAME,
+                                        (sql_prepared_name, sql_prepared_name, limit)).fetchall())
 
 
     def search_patients_via_id(self, patient_id):
@@ -343,25 +578,15 @@ class GP(User):
              patient_id (int): the user id of the patient.
 
         Returns:
-            result (list): resultset of executing an SQL query.
+            page (Page): the patient with the id, or the first page of all patients if the
+                patient_id is empty, like search_patients.
         """
 
-        statement = """
-            SELECT user_id, first_name, last_name, phone_num,address, location
-            FROM user 
-            WHERE user_id = '{}' 
-            AND user_role_id = 2
-            AND user_status_id = 1""".format(patient_id)
+        statement = queries.GP_SEARCH_PATIENTS_BY_ID
 
         # default search if the patient_id is empty.
-        empty_id_statement = """
-            SELECT user_id, first_name, last_name, phone_num,address, location
-            FROM user 
-            WHERE user_role_id = 2 
-            AND user_status_id = 1"""
-
         if patient_id == "":
-            return self.cursor.execute(empty_id_statement)
+            return self.all_patients()
         
         else:
-            return self.cursor.execute(statement)
+            return Page(self.cursor.execute(statement, (patient_id,)).fetchall())
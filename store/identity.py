@@ -0,0 +1,139 @@
+import collections
+import threading
+import time
+
+from store import queries
+
+
+# seconds a cached profile is served before it is read from the database again, so changes made by
+# another process are picked up eventually.
+IDENTITY_TTL = 300
+
+# the number of profiles kept in memory.
+IDENTITY_CACHE_SIZE = 1024
+
+
+def user_key(user_id):
+    """ Returns the id of a user as an int, or None if it is not one, e.g. '' from an empty field.
+
+    Args:
+        user_id (int or string): the id of a user as passed by a page.
+    """
+
+    try:
+        return int(user_id)
+
+    except (TypeError, ValueError):
+        return None
+
+
+class IdentityCache:
+    """ The IdentityCache class keeps the profiles of patients and doctors in memory.
+
+    Pages look up the same user rows over and over, e.g. a GP clicking through the appointments of
+    a day, so profiles are cached for ttl seconds. The Admin methods that change or delete a user
+    invalidate its entry, so an account change made in this process is visible immediately.
+
+    Attributes:
+        ttl (float): seconds a profile is served from memory.
+        size (int): the maximum number of profiles kept.
+        hits (int): the number of lookups served from memory.
+        misses (int): the number of lookups that had to query the database.
+    """
+
+    def __init__(self, ttl=IDENTITY_TTL, size=IDENTITY_CACHE_SIZE):
+        """ Instatiates the class and initializes internal variables. """
+
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+        # user_id -> (expiry time, profile row), least recently used first.
+        self._entries = collections.OrderedDict()
+
+        # user_id -> the number of times it was invalidated, so a profile read from the database
+        # while the user was being changed is not cached.
+        self._generations = {}
+        self._lock = threading.Lock()
+
+
+    def profile(self, cursor, user_id):
+        """ Returns the profile of a user.
+
+        Args:
+            cursor (sqlite3.cursor): the cursor used if the profile is not cached.
+            user_id (int): the id of the user, an id that is not a number is looked up uncached.
+
+        Returns:
+            row (tuple): user_id, first_name, last_name, email, phone_num, location, address,
+                user_role_id and user_status_id, or None if the user does not exist.
+        """
+
+        key = user_key(user_id)
+
+        if key is None:
+            with self._lock:
+                self.misses += 1
+
+            return cursor.execute(queries.IDENTITY_PROFILE, (user_id,)).fetchone()
+
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            generation = self._generations.get(key, 0)
+
+        row = cursor.execute(queries.IDENTITY_PROFILE, (key,)).fetchone()
+
+        # users that do not exist are not cached, they may be registered at any time. Neither is a
+        # row read while the user was invalidated, it may be older than the change.
+        if row is not None:
+            with self._lock:
+                if self._generations.get(key, 0) != generation:
+                    return row
+
+                self._entries[key] = (now + self.ttl, row)
+                self._entries.move_to_end(key)
+
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+
+        return row
+
+
+    def invalidate(self, user_id):
+        """ Forgets the profile of a user after it has been changed or deleted.
+
+        Args:
+            user_id (int): the id of the user, an id that is not a number is never cached.
+        """
+
+        key = user_key(user_id)
+
+        if key is None:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+
+    def clear(self):
+        """ Forgets every profile and resets the counters. """
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# the cache shared by the store library.
+identity_cache = IdentityCache()
@@ -0,0 +1,284 @@
+import concurrent.futures
+import logging
+import os
+import queue
+import smtplib
+import threading
+
+
+# connection settings of the outgoing mail server, each can be overridden per deployment with an
+# environment variable named after it, e.g. UCLH_SMTP_HOST=localhost.
+DEFAULT_SMTP_SETTINGS = {
+    'host': 'smtp.gmail.com',
+    'port': 587,
+    'username': 'uclpatientsystem@gmail.com',
+    'password': 'qwqiufeng1',
+    'starttls': True,
+}
+
+
+def smtp_settings():
+    """ Returns the mail server settings for this deployment.
+
+    Returns:
+        settings (dict): DEFAULT_SMTP_SETTINGS updated with any UCLH_SMTP_<NAME> environment variables.
+    """
+
+    settings = dict(DEFAULT_SMTP_SETTINGS)
+
+    for name, default in DEFAULT_SMTP_SETTINGS.items():
+        value = os.environ.get('UCLH_SMTP_' + name.upper())
+
+        if value is None:
+            continue
+
+        if isinstance(default, bool):
+            settings[name] = value.lower() in ('1', 'true', 'yes', 'on')
+        elif isinstance(default, int):
+            settings[name] = int(value)
+        else:
+            settings[name] = value
+
+    return settings
+
+
+class SMTPPool:
+    """ The SMTPPool class keeps a small set of authenticated SMTP sessions for sending email.
+
+    Opening a session costs several round trips to the mail server (EHLO, STARTTLS, EHLO again and
+    AUTH) and mail servers rate limit new logins, so sessions are kept open and used for many
+    messages each. A session that has been dropped by the server is replaced and the message is sent
+    again once, and sessions are recycled after messages_per_session messages.
+
+    Attributes:
+        host (string): the mail server host name.
+        port (int): the mail server port.
+        username (string): the account to log in with, None to send without logging in.
+        password (string): the password of the account.
+        starttls (bool): whether to upgrade sessions to TLS before logging in.
+        max_sessions (int): the maximum number of sessions the pool will open.
+        messages_per_session (int): the number of messages sent on a session before it is replaced.
+        timeout (float): seconds to wait for the mail server before giving up.
+    """
+
+    def __init__(self, host=None, port=None, username=None, password=None, starttls=None,
+                 max_sessions=2, messages_per_session=100, timeout=30.0):
+        """ Instatiates the class and initializes internal variables, unset connection settings are
+        taken from smtp_settings.
+        """
+
+        settings = smtp_settings()
+
+        self.host = settings['host'] if host is None else host
+        self.port = settings['port'] if port is None else port
+        self.username = settings['username'] if username is None else username
+        self.password = settings['password'] if password is None else password
+        self.starttls = settings['starttls'] if starttls is None else starttls
+        self.max_sessions = max_sessions
+        self.messages_per_session = messages_per_session
+        self.timeout = timeout
+
+        # sessions that are not in use, as [smtplib.SMTP, messages sent] pairs.
+        self._idle = queue.LifoQueue()
+
+        # the number of sessions opened and not yet closed, guarded by the lock.
+        self._opened = 0
+        self._lock = threading.Lock()
+
+
+    def _connect(self):
+        """ Opens and authenticates a new session. """
+
+        session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+
+        try:
+            session.ehlo()
+
+            if self.starttls:
+                session.starttls()
+                session.ehlo()
+
+            if self.username:
+                session.login(self.username, self.password)
+
+        except Exception:
+            session.close()
+            raise
+
+        return session
+
+
+    def _acquire(self):
+        """ Checks a session out of the pool, opening one if none are idle and the pool is not full. """
+
+        try:
+            return self._idle.get_nowait()
+
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.max_sessions
+
+            if can_open:
+                self._opened += 1
+
+        if not can_open:
+            # every session is in use, wait for one to be released.
+            try:
+                return self._idle.get(timeout=self.timeout)
+
+            except queue.Empty:
+                raise TimeoutError("no SMTP session was released within {} seconds".format(self.timeout))
+
+        try:
+            return [self._connect(), 0]
+
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+
+
+    def _discard(self, entry):
+        """ Closes a session that will not be used again. """
+
+        session = entry[0]
+
+        try:
+            session.quit()
+
+        except (smtplib.SMTPException, OSError):
+            session.close()
+
+        with self._lock:
+            self._opened -= 1
+
+
+    def send(self, message):
+        """ Sends a single message on one of the pooled sessions.
+
+        Args:
+            message (email.message.Message): the message to send, the sender and recipients are
+                taken from its From, To, Cc and Bcc headers.
+
+        Raises:
+            smtplib.SMTPException: if the mail server rejected the message.
+            OSError: if the mail server could not be reached.
+        """
+
+        entry = self._acquire()
+
+        try:
+            try:
+                entry[0].send_message(message)
+
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # the server dropped the idle session, replace it and try once more.
+                logging.info("SMTP session to %s was closed, reconnecting.", self.host)
+                entry[0].close()
+                entry[:] = [self._connect(), 0]
+                entry[0].send_message(message)
+
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+            # the server refused this message but the session itself is still fine.
+            self._idle.put(entry)
+            raise
+
+        except Exception:
+            self._discard(entry)
+            raise
+
+        entry[1] += 1
+
+        if entry[1] >= self.messages_per_session:
+            self._discard(entry)
+        else:
+            self._idle.put(entry)
+
+
+    def send_many(self, messages):
+        """ Sends messages spread over the pooled sessions.
+
+        A message that cannot be sent does not stop the others from being sent.
+
+        Args:
+            messages (iterable): the email.message.Message objects to send.
+
+        Returns:
+            sent (int): the number of messages that were sent.
+            failed (list): (message, exception) pairs for the messages that could not be sent.
+        """
+
+        messages = list(messages)
+        failed = []
+
+        # one worker per session, each sending its share of the messages one after the other.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_sessions) as executor:
+            futures = [(message, executor.submit(self.send, message)) for message in messages]
+
+            for message, future in futures:
+                error = future.exception()
+
+                if error is not None:
+                    logging.warning("Could not send email to %s: %s", message['to'], error)
+                    failed.append((message, error))
+
+        return len(messages) - len(failed), failed
+
+
+    def close(self):
+        """ Closes every idle session in the pool. """
+
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+
+            except queue.Empty:
+                break
+
+            self._discard(entry)
+
+
+# the pool shared by the store library, created on first use.
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer():
+    """ Returns the SMTP pool shared by the store library, creating it if necessary.
+
+    Returns:
+        mailer (SMTPPool): the shared SMTP pool.
+    """
+
+    global _mailer
+
+    with _mailer_lock:
+        if _mailer is None:
+            _mailer = SMTPPool()
+
+        return _mailer
+
+
+def configure_mailer(**kwargs):
+    """ Replaces the shared SMTP pool with one created using the given settings.
+
+    Idle sessions of the previous pool are closed.
+
+    Args:
+        **kwargs: keyword arguments passed on to SMTPPool.
+
+    Returns:
+        mailer (SMTPPool): the new shared SMTP pool.
+    """
+
+    global _mailer
+
+    with _mailer_lock:
+        if _mailer is not None:
+            _mailer.close()
+
+        _mailer = SMTPPool(**kwargs)
+
+        return _mailer
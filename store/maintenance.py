@@ -0,0 +1,119 @@
+import datetime
+import logging
+import time
+
+from store import queries
+from store.pool import get_pool
+
+
+# status changes applied to appointments once their slot has passed, as (from, to) pairs of
+# appointment_status_id. Confirmed appointments need the gp to record the outcome (GP ACTION
+# REQUIRED) and requests the gp never confirmed are cancelled (CANCELLED BY SYSTEM).
+SWEEP_TRANSITIONS = [
+    (1, 4),
+    (0, -4),
+]
+
+# maintenance_state key of the datetime up to which appointments have been swept.
+SWEEP_WATERMARK = 'appointment_sweep_watermark'
+
+
+def incremental_vacuum(conn=None, pages=1000):
+    """ Returns free pages left behind by deleted rows to the file system.
+
+    Databases created before the auto_vacuum pragma was applied at connect time are still in
+    auto_vacuum NONE mode, in which case a one-off full VACUUM is run to switch them over to
+    INCREMENTAL mode. After that each run only frees at most the given number of pages so the job
+    never holds the write lock for long.
+
+    Args:
+        conn (sqlite3.connection): optional connection to use, a pooled one is borrowed otherwise.
+        pages (int): the maximum number of free pages to reclaim.
+
+    Returns:
+        freed (int): the number of pages that were reclaimed.
+    """
+
+    if conn is None:
+        with get_pool().connection() as conn:
+            return incremental_vacuum(conn, pages)
+
+    # VACUUM cannot run inside a transaction.
+    if conn.in_transaction:
+        conn.commit()
+
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    # 2 is INCREMENTAL, the mode only changes when the database is rebuilt.
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        logging.warning("Converting the database to incremental auto vacuum, this may take a while.")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    else:
+        # the pragma returns a row per freed page which must be stepped through to do the work.
+        conn.execute("PRAGMA incremental_vacuum({})".format(int(pages))).fetchall()
+
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def sweep_appointment_statuses(conn=None, now=None, full=False):
+    """ Moves appointments whose slot has passed on to their follow up status.
+
+    Each transition in SWEEP_TRANSITIONS is a single UPDATE over the slots between the watermark
+    left by the previous sweep and now, found through the index on availability.datetime, so a
+    sweep only looks at appointments that have passed since it last ran. The watermark is moved
+    forward in the same transaction as the updates.
+
+    Args:
+        conn (sqlite3.connection): optional connection to use, a pooled one is borrowed otherwise.
+        now (string): the current datetime formatted as 'YYYY-MM-DD HH:MM', defaults to the clock.
+        full (bool): whether to ignore the watermark and sweep the whole appointment history.
+
+    Returns:
+        stats (dict): 'updated' the number of appointments changed, 'since' and 'until' the swept
+            datetime range and 'seconds' how long the sweep took.
+    """
+
+    if conn is None:
+        with get_pool().connection() as conn:
+            return sweep_appointment_statuses(conn, now, full)
+
+    start = time.perf_counter()
+
+    if now is None:
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+
+    # take the write lock up front so concurrent sweeps cannot both read the same watermark.
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+
+    try:
+        row = conn.execute(queries.MAINTENANCE_GET_STATE, (SWEEP_WATERMARK,)).fetchone()
+
+        # an empty string sorts before every datetime, i.e. sweep everything.
+        since = '' if full or row is None else row[0]
+        updated = 0
+
+        if since == '':
+            statement = queries.MAINTENANCE_SWEEP_ALL_APPOINTMENTS
+        else:
+            statement = queries.MAINTENANCE_SWEEP_APPOINTMENTS
+
+        for from_status, to_status in SWEEP_TRANSITIONS:
+            cursor = conn.execute(statement, (to_status, from_status, since, now))
+            updated += cursor.rowcount
+
+        # never move the watermark backwards, e.g. when the clock was changed.
+        conn.execute(queries.MAINTENANCE_SET_STATE, (SWEEP_WATERMARK, max(since, now)))
+        conn.commit()
+
+    except BaseException:
+        conn.rollback()
+        raise
+
+    stats = {'updated': updated, 'since': since, 'until': now, 'seconds': time.perf_counter() - start}
+    logging.info("Swept %(updated)s appointments between '%(since)s' and '%(until)s' in %(seconds).3f s.", stats)
+
+    return stats
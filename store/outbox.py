@@ -0,0 +1,282 @@
+import datetime
+import logging
+import random
+import threading
+
+from store import queries, templates
+from store.pool import get_pool
+
+
+# a notification is given up on after this many failed delivery attempts.
+MAX_ATTEMPTS = 5
+
+# seconds to wait before retrying a failed delivery, doubled after every attempt up to MAX_BACKOFF.
+RETRY_BACKOFF = 60
+MAX_BACKOFF = 3600
+
+# the number of notifications delivered per batch.
+BATCH_SIZE = 50
+
+# seconds a claimed notification is hidden from other workers while it is being delivered.
+LEASE = 300
+
+# the longest time in seconds the worker sleeps before looking for due notifications again, so
+# notifications queued by another process are still delivered.
+POLL_INTERVAL = 300
+
+
+def _timestamp(moment=None):
+    """ Formats a datetime, by default the current time, as stored in the outbox table. """
+
+    return (moment or datetime.datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def enqueue(cursor, idempotency_key, recipient, subject, body, text_body=None):
+    """ Queues a notification email for delivery by the outbox worker.
+
+    The notification is not committed here, so it is committed or rolled back together with the
+    change it is about.
+
+    Args:
+        cursor (sqlite3.cursor): the cursor of the caller's transaction.
+        idempotency_key (string): identifies the notification, e.g. 'appointment-12-status-1'. A
+            notification with a key that has already been queued is ignored.
+        recipient (string): the email address to send the notification to.
+        subject (string): the subject line.
+        body (string): the html body.
+        text_body (string): the optional plain text alternative of the html body.
+
+    Returns:
+        queued (bool): False if the notification had already been queued.
+    """
+
+    now = _timestamp()
+    cursor.execute(queries.OUTBOX_ENQUEUE, (idempotency_key, recipient, subject, body, text_body, now, now))
+
+    return cursor.rowcount == 1
+
+
+def build_message(idempotency_key, recipient, subject, body, text_body=None, sender=None):
+    """ Creates the email for a queued notification.
+
+    The Message-ID is derived from the idempotency key, so if a notification is delivered again
+    after a crash the receiving mail server can recognise the duplicate.
+
+    Returns:
+        msg (email.message.Message): the message to send, multipart/alternative if the notification
+            has a plain text body.
+    """
+
+    # smtplib and the ssl module are only imported once a notification is delivered, not when the
+    # application starts.
+    from store.mailer import smtp_settings
+
+    if sender is None:
+        sender = smtp_settings()['username']
+
+    msg = templates.build_message(sender, recipient, subject, body, text_body)
+    msg['Message-ID'] = '<{}@uclh-ehealth>'.format(idempotency_key)
+
+    return msg
+
+
+def _retry_delay(attempts):
+    """ Returns the jittered number of seconds to wait after the given number of failed attempts. """
+
+    return min(RETRY_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF) * random.uniform(0.5, 1.5)
+
+
+def deliver_due(conn=None, mailer=None, batch_size=BATCH_SIZE):
+    """ Delivers one batch of the notifications that are due.
+
+    The batch is claimed in a short write transaction, sent over the shared SMTP pool with its
+    bounded number of sessions, and the outcome of every notification is then recorded in a second
+    transaction. Failed deliveries are retried with exponential backoff until MAX_ATTEMPTS is
+    reached.
+
+    Args:
+        conn (sqlite3.connection): optional connection to use, a pooled one is borrowed otherwise.
+        mailer (SMTPPool): optional SMTP pool to send with, the shared one is used otherwise.
+        batch_size (int): the maximum number of notifications to deliver.
+
+    Returns:
+        sent (int): the number of notifications delivered.
+        retried (int): the number of notifications that will be retried later.
+        failed (int): the number of notifications that were given up on.
+    """
+
+    if conn is None:
+        with get_pool().connection() as conn:
+            return deliver_due(conn, mailer, batch_size)
+
+    now = datetime.datetime.now()
+
+    # claim the batch, the write lock stops two workers from claiming the same notifications.
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+
+    try:
+        rows = conn.execute(queries.OUTBOX_DUE, (_timestamp(now), batch_size)).fetchall()
+        lease = _timestamp(now + datetime.timedelta(seconds=LEASE))
+        conn.executemany(queries.OUTBOX_LEASE, [(lease, row[0]) for row in rows])
+        conn.commit()
+
+    except BaseException:
+        conn.rollback()
+        raise
+
+    if not rows:
+        return 0, 0, 0
+
+    # imported on first delivery, see build_message.
+    from store.mailer import get_mailer, smtp_settings
+
+    if mailer is None:
+        mailer = get_mailer()
+
+    # the settings are read once for the whole batch.
+    sender = smtp_settings()['username']
+    messages = [build_message(*row[1:6], sender=sender) for row in rows]
+    sent, failures = mailer.send_many(messages)
+    errors = {id(message): error for message, error in failures}
+
+    retried = failed = 0
+
+    try:
+        for row, message in zip(rows, messages):
+            outbox_id, attempts = row[0], row[6] + 1
+            error = errors.get(id(message))
+
+            if error is None:
+                conn.execute(queries.OUTBOX_MARK_SENT, (_timestamp(), outbox_id))
+
+            elif attempts >= MAX_ATTEMPTS:
+                conn.execute(queries.OUTBOX_MARK_FAILED, (str(error), outbox_id))
+                failed += 1
+
+            else:
+                retry_at = _timestamp(now + datetime.timedelta(seconds=_retry_delay(attempts)))
+                conn.execute(queries.OUTBOX_MARK_RETRY, (retry_at, str(error), outbox_id))
+                retried += 1
+
+        conn.commit()
+
+    except BaseException:
+        conn.rollback()
+        raise
+
+    return sent, retried, failed
+
+
+class OutboxWorker(threading.Thread):
+    """ The OutboxWorker class delivers queued notification emails in the background.
+
+    The worker delivers due notifications batch by batch and then sleeps until the next retry is
+    due, it is notified of a new notification (see notify_outbox) or POLL_INTERVAL has passed, so the
+    UI thread only ever has to queue notifications.
+
+    Attributes:
+        poll_interval (float): the longest time in seconds to sleep between deliveries.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        """ Instatiates the class and initializes internal variables. """
+
+        # a daemon thread never keeps the application open once the window has been closed.
+        super().__init__(name='outbox-worker', daemon=True)
+
+        self.poll_interval = poll_interval
+
+        self._condition = threading.Condition()
+        self._notified = False
+        self._stopped = False
+
+
+    def notify(self):
+        """ Wakes the worker to deliver newly queued notifications. """
+
+        with self._condition:
+            self._notified = True
+            self._condition.notify()
+
+
+    def stop(self, timeout=None):
+        """ Stops the worker and waits for it to finish its current batch.
+
+        Args:
+            timeout (float): the longest time in seconds to wait for the thread to finish.
+        """
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        if self.is_alive():
+            self.join(timeout)
+
+
+    def _seconds_until_next_attempt(self):
+        """ Returns the seconds until the earliest waiting notification is due, at most poll_interval. """
+
+        with get_pool().connection() as conn:
+            next_attempt = conn.execute(queries.OUTBOX_NEXT_ATTEMPT).fetchone()[0]
+
+        if next_attempt is None:
+            return self.poll_interval
+
+        delay = (datetime.datetime.fromisoformat(next_attempt) - datetime.datetime.now()).total_seconds()
+
+        return min(max(delay, 0), self.poll_interval)
+
+
+    def run(self):
+        """ Delivers notifications until the worker is stopped. """
+
+        while not self._stopped:
+            try:
+                # keep going while full batches are delivered, there may be more waiting.
+                while not self._stopped and sum(deliver_due()) == BATCH_SIZE:
+                    pass
+
+                delay = self._seconds_until_next_attempt()
+
+            except Exception:
+                logging.exception("Outbox delivery failed, retrying in a minute.")
+                delay = 60
+
+            with self._condition:
+                if not self._notified and not self._stopped:
+                    self._condition.wait(delay)
+
+                self._notified = False
+
+
+# the worker started by start_outbox_worker, if any.
+_worker = None
+
+
+def start_outbox_worker(**kwargs):
+    """ Starts the outbox worker of this process, if it is not already running.
+
+    Args:
+        **kwargs: keyword arguments passed on to OutboxWorker.
+
+    Returns:
+        worker (OutboxWorker): the running worker.
+    """
+
+    global _worker
+
+    if _worker is None or not _worker.is_alive():
+        _worker = OutboxWorker(**kwargs)
+        _worker.start()
+
+    return _worker
+
+
+def notify_outbox():
+    """ Wakes the running outbox worker, if any, to deliver newly queued notifications. """
+
+    if _worker is not None:
+        _worker.notify()
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import json
+
+
+# the number of rows in a page of a table-backed view.
+DEFAULT_PAGE_SIZE = 100
+
+# larger than any rowid, the id a page of a descending view starts after when there is no token.
+MAX_ID = 2 ** 63 - 1
+
+
+class Page:
+    """ The Page class holds one page of the rows of a view.
+
+    Pages are fetched with keyset pagination: the rows are ordered by a unique sort key and the next
+    page starts after the key of the last row of this one, so fetching a page costs the same however
+    deep into the results it is, unlike OFFSET. A page can be iterated like the cursor it replaces.
+
+    Attributes:
+        rows (list): the rows of the page.
+        next_page_token (string): the opaque token of the next page, None if this is the last page.
+        columns (tuple): the names of the columns of the rows, None if they are those of the cursor
+            that fetched the page.
+    """
+
+    def __init__(self, rows, next_page_token=None, columns=None):
+        """ Instatiates the class and initializes internal variables. """
+
+        self.rows = rows
+        self.next_page_token = next_page_token
+        self.columns = columns
+
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+    def __len__(self):
+        return len(self.rows)
+
+
+    def fetchall(self):
+        """ Returns the rows of the page, like sqlite3.cursor.fetchall. """
+
+        return self.rows
+
+
+def encode_page_token(key):
+    """ Encodes the sort key of the last row of a page as an opaque token.
+
+    Args:
+        key (tuple): the values of the sort key, e.g. (datetime, appointment_id).
+
+    Returns:
+        token (string): a url safe token.
+    """
+
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_page_token(token, size):
+    """ Decodes a token created by encode_page_token.
+
+    Args:
+        token (string): the token.
+        size (int): the number of values the sort key of the view has.
+
+    Returns:
+        key (tuple): the values of the sort key.
+
+    Raises:
+        ValueError: if the token is not a valid token for the view.
+    """
+
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("invalid page token {!r}".format(token))
+
+    if not isinstance(key, list) or len(key) != size:
+        raise ValueError("invalid page token {!r}".format(token))
+
+    return tuple(key)
+
+
+def fetch_page(cursor, statement, parameters, key, page_size):
+    """ Fetches a page of a keyset paginated statement.
+
+    Args:
+        cursor (sqlite3.cursor): the cursor to query with.
+        statement (string): a statement from store/queries.py ending in 'LIMIT ?', whose parameters
+            already include the sort key to start after.
+        parameters (tuple): the parameters of the statement without the limit.
+        key (function): returns the sort key of a row, e.g. lambda row: (row[2], row[0]).
+        page_size (int): the maximum number of rows in the page.
+
+    Returns:
+        page (Page): the rows and the token of the next page.
+    """
+
+    # one extra row tells whether there is a next page without a separate count.
+    rows = cursor.execute(statement, tuple(parameters) + (page_size + 1,)).fetchall()
+
+    if len(rows) <= page_size:
+        return Page(rows)
+
+    rows = rows[:page_size]
+
+    return Page(rows, encode_page_token(key(rows[-1])))
@@ -0,0 +1,201 @@
+import collections
+import hashlib
+import hmac
+import os
+import threading
+
+
+# settings of the key derivation function passwords are hashed with, each can be overridden per
+# deployment with an environment variable named after it, e.g. UCLH_KDF_SCRYPT_N=32768. Raising the
+# cost only affects new hashes; existing ones are upgraded the next time their user logs in.
+DEFAULT_KDF_SETTINGS = {
+    # 'scrypt' or 'pbkdf2_sha256', scrypt falls back to pbkdf2_sha256 if OpenSSL does not provide it.
+    'algorithm': 'scrypt',
+
+    # scrypt cost parameters, n=2**14 takes around 40ms and 16 MiB of memory per hash.
+    'scrypt_n': 16384,
+    'scrypt_r': 8,
+    'scrypt_p': 1,
+
+    # pbkdf2_sha256 iterations.
+    'pbkdf2_iterations': 600000,
+}
+
+# the number of bytes of random salt and of derived key stored per password.
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+# the number of successful verifications remembered by the auth cache.
+AUTH_CACHE_SIZE = 128
+
+
+def kdf_settings():
+    """ Returns the key derivation settings for this deployment.
+
+    Returns:
+        settings (dict): DEFAULT_KDF_SETTINGS updated with any UCLH_KDF_<NAME> environment variables.
+    """
+
+    settings = dict(DEFAULT_KDF_SETTINGS)
+
+    for name, default in DEFAULT_KDF_SETTINGS.items():
+        value = os.environ.get('UCLH_KDF_' + name.upper())
+
+        if value is not None:
+            settings[name] = int(value) if isinstance(default, int) else value
+
+    if settings['algorithm'] == 'scrypt' and not hasattr(hashlib, 'scrypt'):
+        settings['algorithm'] = 'pbkdf2_sha256'
+
+    return settings
+
+
+def _derive(password, algorithm, parameters, salt):
+    """ Derives the key of a password with the given algorithm and cost parameters. """
+
+    if algorithm == 'scrypt':
+        n, r, p = parameters
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * n * r * p + 1024 * 1024, dklen=KEY_SIZE)
+
+    if algorithm == 'pbkdf2_sha256':
+        iterations, = parameters
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations, KEY_SIZE)
+
+    raise ValueError("unknown password hashing algorithm {!r}".format(algorithm))
+
+
+def _current_parameters(settings):
+    """ Returns the cost parameters of the configured algorithm. """
+
+    if settings['algorithm'] == 'scrypt':
+        return settings['scrypt_n'], settings['scrypt_r'], settings['scrypt_p']
+
+    return settings['pbkdf2_iterations'],
+
+
+def hash_password(password):
+    """ Hashes a password for storing in the user table.
+
+    Args:
+        password (string): the password supplied by the user.
+
+    Returns:
+        stored (string): the algorithm, cost parameters, salt and derived key, formatted as
+            'scrypt$16384$8$1$<salt>$<key>' or 'pbkdf2_sha256$600000$<salt>$<key>'.
+    """
+
+    settings = kdf_settings()
+    parameters = _current_parameters(settings)
+    salt = os.urandom(SALT_SIZE)
+    key = _derive(password, settings['algorithm'], parameters, salt)
+
+    return '$'.join([settings['algorithm']] + [str(value) for value in parameters] + [salt.hex(), key.hex()])
+
+
+def verify_password(password, stored):
+    """ Checks a password against the hash stored for it.
+
+    Besides hashes created by hash_password, the unsalted SHA-1 hex digests stored by earlier
+    versions of the application are still accepted so their users can log in and be upgraded.
+
+    Args:
+        password (string): the password supplied by the user.
+        stored (string): the hash stored in the user table.
+
+    Returns:
+        valid (bool): True if the password is correct.
+        needs_rehash (bool): True if the password is correct but the stored hash uses a legacy or
+            outdated algorithm and should be replaced with hash_password(password).
+    """
+
+    if not stored:
+        return False, False
+
+    # a legacy unsalted SHA-1 hex digest.
+    if '$' not in stored:
+        incoming = hashlib.sha1(password.encode('utf-8')).hexdigest()
+        valid = hmac.compare_digest(incoming, stored)
+
+        return valid, valid
+
+    algorithm, *fields = stored.split('$')
+    parameters = tuple(int(value) for value in fields[:-2])
+    salt, key = bytes.fromhex(fields[-2]), bytes.fromhex(fields[-1])
+
+    valid = hmac.compare_digest(_derive(password, algorithm, parameters, salt), key)
+
+    settings = kdf_settings()
+    outdated = algorithm != settings['algorithm'] or parameters != _current_parameters(settings)
+
+    return valid, valid and outdated
+
+
+class AuthCache:
+    """ The AuthCache class remembers recent successful password verifications.
+
+    A deliberately slow key derivation function makes every login cost tens of milliseconds, so the
+    outcome of a successful verification is kept for a repeated login with the same password, e.g.
+    after logging out and back in. Entries are keyed by an HMAC of the stored hash and the password
+    under a random per-process secret, so neither the password nor anything that could be used to
+    check guesses outside the process is kept. An entry stops matching as soon as the stored hash
+    changes, and only the size most recently used entries are kept.
+
+    Attributes:
+        size (int): the maximum number of entries.
+    """
+
+    def __init__(self, size=AUTH_CACHE_SIZE):
+        """ Instatiates the class and initializes internal variables. """
+
+        self.size = size
+
+        self._secret = os.urandom(32)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def _key(self, password, stored):
+        """ Returns the cache key of a password and its stored hash. """
+
+        return hmac.new(self._secret, stored.encode('utf-8') + b'\0' + password.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+
+    def verify(self, password, stored):
+        """ Checks a password like verify_password, skipping the key derivation on a cache hit.
+
+        Returns:
+            valid (bool): True if the password is correct.
+            needs_rehash (bool): True if the stored hash should be replaced.
+        """
+
+        key = self._key(password, stored)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return True, False
+
+        valid, needs_rehash = verify_password(password, stored)
+
+        # only current hashes are cached, outdated ones are about to be replaced.
+        if valid and not needs_rehash:
+            with self._lock:
+                self._entries[key] = True
+
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+
+        return valid, needs_rehash
+
+
+    def clear(self):
+        """ Forgets every entry. """
+
+        with self._lock:
+            self._entries.clear()
+
+
+# the cache shared by the store library.
+auth_cache = AuthCache()
@@ -1,6 +1,22 @@
+# aliased, several methods take a parameter named datetime.
+import datetime as _datetime
+
+from store import queries
+from store.identity import identity_cache
+from store.pagination import DEFAULT_PAGE_SIZE, MAX_ID, Page, decode_page_token, fetch_page
+from store.scheduler import notify_appointment_booked
 from store.user import User
 
 
+# the columns of the appointments shown on the check appointments page.
+APPOINTMENT_COLUMNS = ('appointment_id', 'appointment_status_name', 'datetime', 'email', 'doctor_id', 'location',
+                       'address', 'first_name', 'last_name')
+
+# the columns of the prescriptions shown on the view prescriptions page.
+PRESCRIPTION_COLUMNS = ('appointment_id', 'datetime', 'doctor_id', 'first_name', 'last_name', 'email',
+                        'diagnosis', 'prescription_info', 'doctors_comment')
+
+
 class Patient(User):
     """ The Patient class groups methods required for the functionality of an Patient user. """
 
@@ -11,44 +27,51 @@ class Patient(User):
         User().__init__()
 
 
-    def check_appointments(self, patient_id, current_time, view_filter):
+    def check_appointments(self, patient_id, current_time, view_filter, page_size=DEFAULT_PAGE_SIZE,
+                           page_token=None):
         """ Retrieves GP requested appointments.
 
         Args:
             patient_id (string): the user id of the patient
             view_filter (string): additional information to provide filtering of either past or new appointments.
+            page_size (int): the maximum number of appointments returned.
+            page_token (string): the next_page_token of the previous page, None for the first page.
 
         Returns:
-            result (list): resultset of executing an SQL query to be tabulated.
+            page (Page): the appointments and the token of the next page, past appointments are
+                ordered from the most recent one and new appointments from the soonest one.
         """
 
-        past_appointments_statment = """
-            SELECT appointment_id, appointment_status_name, datetime, email, doctor_id, location, address, first_name, last_name 
-            FROM appointment, availability, user, appointment_status
-            WHERE appointment.patient_id = '{}'
-            AND datetime < '{}'
-            AND appointment.appointment_status_id = appointment_status.appointment_status_id
-            AND appointment.availability_id = availability.availability_id
-            AND availability.doctor_id = user.user_id
-            ORDER BY datetime DESC """.format(patient_id, current_time)
-
-        new_appointments_statement = """
-            SELECT appointment_id, appointment_status_name, datetime, email, doctor_id, location, address, first_name, last_name 
-            FROM appointment, availability, user, appointment_status
-            WHERE appointment.patient_id = '{}'
-            AND datetime > '{}'
-            AND appointment.appointment_status_id = appointment_status.appointment_status_id
-            AND appointment.availability_id = availability.availability_id
-            AND availability.doctor_id = user.user_id
-            ORDER BY datetime ASC """.format(patient_id, current_time)
-
-        # if the patient selects the past view filter, return the resultset of the first query.
-        if view_filter == 'past': 
-            return self.cursor.execute(past_appointments_statment)
-        
-        # otherwise return the resultset of the second query to show upcoming appointments.
+        past_appointments_statment = queries.PATIENT_PAST_APPOINTMENTS
+
+        new_appointments_statement = queries.PATIENT_NEW_APPOINTMENTS
+
+        # datetimes are stored as text, so the current time is compared as text too.
+        current_time = str(current_time)
+
+        # appointments are paged by their (datetime, appointment_id).
+        def key(row):
+            return row[2], row[0]
+
+        # if the patient selects the past view filter, fetch a page of the first query.
+        if view_filter == 'past':
+            after = decode_page_token(page_token, 2) if page_token else (current_time, MAX_ID)
+
+            page = fetch_page(self.cursor, past_appointments_statment, (patient_id, current_time) + after,
+                              key, page_size)
+
+        # otherwise fetch a page of the second query to show upcoming appointments.
         else:
-            return self.cursor.execute(new_appointments_statement)
+            after = decode_page_token(page_token, 2) if page_token else (current_time, 0)
+
+            page = fetch_page(self.cursor, new_appointments_statement, (patient_id, current_time) + after,
+                              key, page_size)
+
+        # add the email, location, address and name of each doctor from the identity cache.
+        rows = [row[:3] + (doctor[3], row[3], doctor[5], doctor[6], doctor[1], doctor[2])
+                for row, doctor in self._with_doctors(page.rows, 3)]
+
+        return Page(rows, page.next_page_token, APPOINTMENT_COLUMNS)
 
 
     def search_gp_availability(self, datetime, location):
@@ -62,17 +85,12 @@ class Patient(User):
             result (list): resultset of executing an SQL query to be tabulated.
         """
 
-        statement = """
-            SELECT availability_id, doctor_id, datetime, address, first_name, last_name 
-            FROM availability, user 
-            WHERE date(datetime) = '{}'
-            AND location = '{}'
-            AND availability_status_id = 0
-            AND user_role_id = 1 
-            AND availability.doctor_id = user.user_id """.format(datetime, location)
+        day_start, day_end = self.day_range(datetime)
+
+        statement = queries.PATIENT_SEARCH_GP_AVAILABILITY
 
         # return the result of the query execution to the caller
-        return self.cursor.execute(statement)
+        return self.cursor.execute(statement, (day_start, day_end, location))
 
 
     def search_prescriptions(self, patient_id):
@@ -82,21 +100,55 @@ class Patient(User):
             patient_id (int): the user id of the patient
 
         Returns:
-            result (list): resultset of executing an SQL query to be tabulated.
+            result (Page): the prescriptions, most recent first, to be tabulated.
         """
 
-        statement = """
-            SELECT medical_record.appointment_id, datetime, doctor_id, first_name, last_name, email, diagnosis, prescription_info, doctors_comment
-            FROM appointment, availability, medical_record, user
-            WHERE (appointment.appointment_status_id =2 OR appointment.appointment_status_id =3)
-            AND appointment.patient_id = '{}'
-            AND availability.doctor_id = user.user_id 
-            AND medical_record.appointment_id = appointment.appointment_id
-            AND appointment.availability_id = availability.availability_id
-            ORDER BY datetime DESC """.format(patient_id)
+        statement = queries.PATIENT_SEARCH_PRESCRIPTIONS
 
-        # return the result of the query execution to the caller
-        return self.cursor.execute(statement)
+        # add the name and email of each doctor from the identity cache.
+        rows = [row[:3] + (doctor[1], doctor[2], doctor[3]) + row[3:]
+                for row, doctor in self._with_doctors(self.cursor.execute(statement, (patient_id,)).fetchall(), 2)]
+
+        return Page(rows, columns=PRESCRIPTION_COLUMNS)
+
+
+    def _with_doctors(self, rows, doctor_column):
+        """ Pairs rows with the profile of the doctor whose user id is in the given column.
+
+        Doctors are looked up through the identity cache, as the same few doctors appear on most
+        rows. Rows of a doctor that no longer exists are left out, like the join they replace did.
+
+        Args:
+            rows (list): the rows of a query.
+            doctor_column (int): the index of the doctor_id in each row.
+
+        Returns:
+            pairs (list): (row, profile) for every row, see IdentityCache.profile.
+        """
+
+        pairs = []
+
+        for row in rows:
+            doctor = identity_cache.profile(self.cursor, row[doctor_column])
+
+            if doctor is not None:
+                pairs.append((row, doctor))
+
+        return pairs
+
+
+    def availability_status(self, availability_id):
+        """ Looks up whether a slot is free.
+
+        Args:
+            availability_id (int): the unique availability_id of the slot.
+
+        Returns:
+            status (tuple): the availability_status_id and datetime of the slot, None if it does
+                not exist.
+        """
+
+        return self.cursor.execute(queries.PATIENT_AVAILABILITY_STATUS, (availability_id,)).fetchone()
 
 
     def submit_appointment_booking(self, availability_id, patient_id, problem_info):
@@ -111,21 +163,76 @@ class Patient(User):
             availability_id (int): the unique availability_id for the doctor that the patient selected.
             patient_id (int): the user id of the patient
             problem_info (string): a summary of whats wrong with the patient.
+
+        Slots that have already passed cannot be booked, the appointment could never take place.
+
+        Returns:
+            booked (bool): False if another patient booked the slot first or the slot has passed.
         """
 
-        insert_appointment_request_statement = """
-            INSERT into appointment (availability_id, appointment_status_id, patient_id, patient_summary)
-            VALUES('{}', '{}', '{}', '{}')""".format(availability_id, 0, patient_id, problem_info)
+        insert_appointment_request_statement = queries.PATIENT_INSERT_APPOINTMENT
 
-        update_availability_statement = """
-            UPDATE availability 
-            SET availability_status_id = 1 
-            WHERE availability_id = '{}'""".format(availability_id)
+        update_availability_statement = queries.PATIENT_CLAIM_AVAILABILITY
 
-        # execute the statements and commit it to the datebase.
-        self.cursor.execute(insert_appointment_request_statement)
-        self.cursor.execute(update_availability_statement)
-        self.conn.commit()
+        # datetimes are stored to the minute, a slot has passed once it is earlier than the current minute.
+        now = _datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        # most attempts on a slot that has already gone are seen without taking the write lock.
+        row = self.cursor.execute(queries.PATIENT_AVAILABILITY_STATUS, (availability_id,)).fetchone()
+
+        if row is None or row[0] != 0 or row[1] < now:
+            return False
+
+        def book(cursor):
+            # claim the slot first, nothing is updated if it has already been booked or has passed.
+            cursor.execute(update_availability_statement, (availability_id, now))
+
+            if cursor.rowcount != 1:
+                return False
+
+            cursor.execute(insert_appointment_request_statement, (availability_id, patient_id, problem_info))
+
+            return True
+
+        # claiming the slot and inserting the appointment happen in one transaction holding the write
+        # lock, so two patients can never book the same slot.
+        booked = self._immediate_transaction(book)
+
+        # let the scheduler know when the new appointment passes.
+        if booked:
+            notify_appointment_booked(row[1])
+
+        return booked
+
+
+    def cancel_booked_appointment(self, appointment_id, patient_id):
+        """ Cancels an upcoming appointment of a patient and frees its slot.
+
+        Unlike cancel_appointment nothing is taken from the caller but the ids: the appointment must
+        belong to the patient and still be pending or confirmed, and the slot freed is the one the
+        appointment was booked on. Both updates happen in one transaction holding the write lock.
+
+        Args:
+            appointment_id (int): the unique appointment id of the booking.
+            patient_id (int): the user id of the patient cancelling it.
+
+        Returns:
+            cancelled (bool): False if the patient has no such appointment or it can no longer be
+                cancelled.
+        """
+
+        def cancel(cursor):
+            owner = cursor.execute(queries.USER_APPOINTMENT_OWNER, (appointment_id,)).fetchone()
+
+            if owner is None or owner[0] != patient_id or owner[4] not in (0, 1):
+                return False
+
+            cursor.execute(queries.PATIENT_CANCEL_APPOINTMENT, (appointment_id,))
+            cursor.execute(queries.USER_RELEASE_APPOINTMENT_AVAILABILITY, (owner[2],))
+
+            return True
+
+        return self._immediate_transaction(cancel)
 
 
     def cancel_appointment(self, appointment_id, datetime, doctor_id):
@@ -140,18 +247,11 @@ class Patient(User):
             doctor_id (int): the id of the GP that was to see the patient prior to cancellation.
         """
 
-        update_appointment_statement = """
-            UPDATE appointment 
-            SET appointment_status_id = -2 
-            WHERE appointment_id = '{}'""".format(appointment_id)
+        update_appointment_statement = queries.PATIENT_CANCEL_APPOINTMENT
 
-        update_availability_statement = """
-            UPDATE availability 
-            SET availability_status_id = 0 
-            WHERE datetime = '{}' 
-            AND doctor_id = '{}'""".format(datetime, doctor_id)
+        update_availability_statement = queries.PATIENT_RELEASE_AVAILABILITY
 
         # execute the statements and commit it to the datebase.
-        self.cursor.execute(update_appointment_statement)
-        self.cursor.execute(update_availability_statement)
+        self.cursor.execute(update_appointment_statement, (appointment_id,))
+        self.cursor.execute(update_availability_statement, (datetime, doctor_id))
         self.conn.commit()
@@ -0,0 +1,267 @@
+import contextlib
+import queue
+import sqlite3
+import threading
+import weakref
+
+from store.conn import connect_to_database
+
+
+class ConnectionPool:
+    """ The ConnectionPool class manages a bounded set of reusable sqlite3 connections.
+
+    Connections are opened lazily up to max_connections and handed back out once they are released.
+    Each thread can hold one long lived connection (see thread_connection) which is returned to the
+    pool when the thread ends, and any code can borrow a connection for a single unit of work with
+    the connection() context manager. Because a connection is only ever used by one thread at a time,
+    background workers and the UI thread can query the database concurrently without sharing a
+    cursor.
+
+    Attributes:
+        database_path (string): path to the database file, None for the default store/UCLH.db.
+        max_connections (int): the maximum number of connections the pool will open.
+        timeout (float): seconds to wait for a connection to be released when the pool is exhausted.
+        pragmas (dict): pragma names and values applied to every new connection on top of the
+            deployment defaults from store.conn.database_pragmas.
+    """
+
+    def __init__(self, database_path=None, max_connections=5, timeout=10.0, pragmas=None):
+        """ Instatiates the class and initializes internal variables. """
+
+        self.database_path = database_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self.pragmas = dict(pragmas or {})
+
+        # connections that have been released and can be handed out again, most recent first.
+        self._idle = queue.LifoQueue()
+
+        # the number of connections opened so far, guarded by the lock.
+        self._opened = 0
+        self._lock = threading.Lock()
+
+        # per thread storage of the connection and cursor checked out by thread_connection.
+        self._local = threading.local()
+
+
+    def _connect(self):
+        """ Opens a new connection with the configured pragmas applied to it. """
+
+        # connections may be released by a different thread to the one that used them last.
+        conn, cursor = connect_to_database(self.database_path, check_same_thread=False,
+                                           pragmas=self.pragmas)
+        cursor.close()
+
+        return conn
+
+
+    def acquire(self):
+        """ Checks a connection out of the pool.
+
+        Returns:
+            conn (sqlite3.connection): a connection only the caller may use until it is released.
+
+        Raises:
+            sqlite3.OperationalError: if no connection was released within the pool timeout.
+        """
+
+        # prefer reusing an idle connection.
+        try:
+            return self._idle.get_nowait()
+
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.max_connections
+
+            if can_open:
+                self._opened += 1
+
+        if can_open:
+            try:
+                return self._connect()
+
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        # the pool is exhausted, wait for another thread to release a connection.
+        try:
+            return self._idle.get(timeout=self.timeout)
+
+        except queue.Empty:
+            raise sqlite3.OperationalError("connection pool exhausted ({} connections in use)".format(
+                self.max_connections))
+
+
+    def release(self, conn):
+        """ Returns a connection to the pool, discarding any uncommitted changes.
+
+        Args:
+            conn (sqlite3.connection): a connection previously returned by acquire.
+        """
+
+        if conn.in_transaction:
+            conn.rollback()
+
+        self._idle.put(conn)
+
+
+    @contextlib.contextmanager
+    def connection(self):
+        """ Borrows a connection for a single unit of work.
+
+        The work is committed if the block exits normally and rolled back if it raises, after which
+        the connection is returned to the pool.
+
+        Yields:
+            conn (sqlite3.connection): a connection only the caller may use inside the block.
+        """
+
+        conn = self.acquire()
+
+        try:
+            yield conn
+            conn.commit()
+
+        except BaseException:
+            conn.rollback()
+            raise
+
+        finally:
+            self.release(conn)
+
+
+    def thread_connection(self):
+        """ Returns the connection held by the calling thread, checking one out if necessary.
+
+        The connection stays checked out for the lifetime of the thread and is released back to the
+        pool once the thread has finished.
+
+        Returns:
+            conn (sqlite3.connection): the connection of the calling thread.
+        """
+
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None:
+            conn = self.acquire()
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+
+            # release the connection once the thread object has been garbage collected.
+            self._local.finalizer = weakref.finalize(threading.current_thread(), self.release, conn)
+
+        return conn
+
+
+    def release_thread_connection(self):
+        """ Releases the connection held by the calling thread back to the pool straight away.
+
+        Threads started outside the threading module, e.g. by a QThreadPool, are never garbage
+        collected as far as thread_connection can tell, so they must release their connection once
+        they are done with it. The next call to thread_connection checks a connection out again.
+        """
+
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None:
+            return
+
+        # the connection must not be released a second time when the thread ends.
+        self._local.finalizer.detach()
+        self._local.cursor.close()
+        self._local.conn = self._local.cursor = self._local.finalizer = None
+
+        self.release(conn)
+
+
+    def thread_cursor(self):
+        """ Returns the cursor of the connection held by the calling thread.
+
+        Returns:
+            cursor (sqlite3.cursor): the cursor of the calling thread.
+        """
+
+        self.thread_connection()
+
+        return self._local.cursor
+
+
+    def detach_thread_cursor(self, cursor):
+        """ Hands a resultset of the calling thread's cursor over to the caller.
+
+        The store classes return the cursor of the thread, which the next query of the thread would
+        reuse. Once detached the cursor is left alone and the thread gets a new one, so the caller
+        can keep reading the resultset, e.g. a table fetching rows as it is scrolled.
+
+        Args:
+            cursor (sqlite3.cursor): a cursor returned by a store method on the calling thread.
+        """
+
+        if cursor is not None and cursor is getattr(self._local, 'cursor', None):
+            self._local.cursor = self._local.conn.cursor()
+
+
+    def close(self):
+        """ Closes every idle connection in the pool. """
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+
+            except queue.Empty:
+                break
+
+            conn.close()
+
+            with self._lock:
+                self._opened -= 1
+
+
+# the pool shared by the store classes, created on first use.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """ Returns the connection pool shared by the store library, creating it if necessary.
+
+    Returns:
+        pool (ConnectionPool): the shared connection pool.
+    """
+
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+
+        return _pool
+
+
+def configure_pool(**kwargs):
+    """ Replaces the shared connection pool with one created using the given settings.
+
+    This should be called once at application start up, before the store classes are used. Idle
+    connections of the previous pool are closed.
+
+    Args:
+        **kwargs: keyword arguments passed on to ConnectionPool.
+
+    Returns:
+        pool (ConnectionPool): the new shared connection pool.
+    """
+
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+
+        _pool = ConnectionPool(**kwargs)
+
+        return _pool
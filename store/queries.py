@@ -0,0 +1,506 @@
+""" Registry of the parameterized SQL statements used by the store library.
+
+Every statement is a constant string with '?' placeholders, values are always bound when the
+statement is executed and never formatted into the SQL. Because the text of a statement never
+changes between calls, sqlite3 can reuse the compiled statement from the connection's statement
+cache (see CACHED_STATEMENTS in store/conn.py) instead of parsing it again, and user input can
+never change the meaning of a query.
+
+Statements are grouped by the class that uses them and named <CLASS>_<PURPOSE>.
+"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# database creation (store/conn.py)
+# ---------------------------------------------------------------------------------------------------
+
+# seeds one of the initial Admin, GP and Patient accounts.
+SEED_USER = """
+    INSERT OR IGNORE INTO user (
+        email,
+        password,
+        first_name,
+        last_name,
+        phone_num,
+        address,
+        location,
+        user_status_id,
+        user_role_id
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# User and Register (store/user.py, store/register.py)
+# ---------------------------------------------------------------------------------------------------
+
+USER_EMAIL_EXISTS = """
+    SELECT EXISTS(SELECT 1 FROM user WHERE email = ?)"""
+
+# everything needed to log a user in, looked up with a single probe of the unique email index.
+USER_LOGIN = """
+    SELECT user_id, password, user_role_id, user_status_id, first_name, last_name
+    FROM user
+    WHERE email = ?"""
+
+# replaces a legacy or outdated password hash, unless the password was changed in the meantime.
+USER_REHASH_PASSWORD = """
+    UPDATE user
+    SET password = ?
+    WHERE user_id = ?
+    AND password = ?"""
+
+# the patient, gp, slot and status of an appointment, to check who it belongs to before changing it.
+USER_APPOINTMENT_OWNER = """
+    SELECT appointment.patient_id, availability.doctor_id, availability.availability_id,
+           availability.datetime, appointment.appointment_status_id
+    FROM appointment, availability
+    WHERE appointment.appointment_id = ?
+    AND appointment.availability_id = availability.availability_id"""
+
+# frees the slot of an appointment that has been cancelled.
+USER_RELEASE_APPOINTMENT_AVAILABILITY = """
+    UPDATE availability
+    SET availability_status_id = 0
+    WHERE availability_id = ?"""
+
+REGISTER_INSERT_USER = """
+    INSERT INTO user (email, password, first_name, last_name, phone_num, location, address,
+                      user_status_id, user_role_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# Admin (store/admin.py)
+# ---------------------------------------------------------------------------------------------------
+
+# every account apart from the Admins. Like the other paginated views (see store/pagination.py) the
+# rows are ordered by a unique sort key and a page starts after the key of the last row of the
+# previous one.
+ADMIN_MANAGE_RECORDS_ALL = """
+    SELECT user_id, email, first_name, last_name, phone_num, location, address, user_status_name, user_role_name
+    FROM user, user_status, user_role
+    WHERE user.user_status_id = user_status.user_status_id
+    AND user.user_role_id = user_role.user_role_id
+    AND user.user_role_id != 0
+    AND user.user_id > ?
+    ORDER BY user.user_id
+    LIMIT ?"""
+
+# accounts with a given status and role.
+ADMIN_MANAGE_RECORDS_FILTERED = """
+    SELECT user_id, email, first_name, last_name, phone_num, location, address, user_status_name, user_role_name
+    FROM user, user_status, user_role
+    WHERE user.user_status_id = user_status.user_status_id
+    AND user.user_role_id = user_role.user_role_id
+    AND user.user_status_id = ?
+    AND user.user_role_id = ?
+    AND user.user_id > ?
+    ORDER BY user.user_id
+    LIMIT ?"""
+
+ADMIN_DELETE_USER = """
+    DELETE FROM user
+    WHERE user_id = ?"""
+
+ADMIN_SET_USER_STATUS = """
+    UPDATE user
+    SET user_status_id = ?
+    WHERE user_id = ?"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# GP (store/gp.py)
+# ---------------------------------------------------------------------------------------------------
+
+GP_AVAILABILITY_DATA = """
+    SELECT date(datetime), time(datetime)
+    FROM availability
+    WHERE doctor_id = ?
+    AND datetime >= ?
+    AND datetime < ?"""
+
+# every slot of a gp on one day, keyed by its time so that slots stored with seconds still match.
+GP_DAY_AVAILABILITY = """
+    SELECT availability_id, strftime('%H:%M', datetime), availability_status_id
+    FROM availability
+    WHERE doctor_id = ?
+    AND datetime >= ?
+    AND datetime < ?"""
+
+# slots are unique per gp and datetime (schema version 2), so an existing slot is left untouched.
+GP_INSERT_AVAILABILITY = """
+    INSERT OR IGNORE INTO availability (doctor_id, datetime, availability_status_id)
+    VALUES (?, ?, 0)"""
+
+GP_DELETE_AVAILABILITY = """
+    DELETE FROM availability
+    WHERE doctor_id = ?
+    AND datetime = ?"""
+
+# deleting a slot cascades to its appointments, so only slots nobody has booked are removed.
+GP_DELETE_FREE_AVAILABILITY = """
+    DELETE FROM availability
+    WHERE availability_id = ?
+    AND availability_status_id = 0"""
+
+# removes a slot by its datetime, unless a patient has booked it.
+GP_DELETE_FREE_SLOT = """
+    DELETE FROM availability
+    WHERE doctor_id = ?
+    AND datetime = ?
+    AND availability_status_id = 0"""
+
+GP_INSERT_TEMPLATE = """
+    INSERT INTO availability_template (doctor_id, weekdays, start_time, end_time, start_date, end_date,
+                                       slot_minutes)
+    VALUES (?, ?, ?, ?, ?, ?, ?)"""
+
+GP_TEMPLATE = """
+    SELECT doctor_id, weekdays, start_time, end_time, start_date, end_date, slot_minutes
+    FROM availability_template
+    WHERE template_id = ?"""
+
+GP_TEMPLATES = """
+    SELECT template_id, weekdays, start_time, end_time, start_date, end_date, slot_minutes
+    FROM availability_template
+    WHERE doctor_id = ?
+    ORDER BY template_id ASC"""
+
+GP_UPDATE_TEMPLATE = """
+    UPDATE availability_template
+    SET weekdays = ?, start_time = ?, end_time = ?, start_date = ?, end_date = ?, slot_minutes = ?
+    WHERE template_id = ?"""
+
+GP_DELETE_TEMPLATE = """
+    DELETE FROM availability_template
+    WHERE template_id = ?"""
+
+GP_PENDING_APPOINTMENTS = """
+    SELECT appointment_id, user_id, first_name, last_name, datetime, patient_summary
+    FROM user, appointment, availability
+    WHERE user.user_id = patient_id
+    AND appointment_status_id = 0
+    AND datetime >= ?
+    AND appointment.availability_id = availability.availability_id
+    AND doctor_id = ?
+    ORDER BY datetime ASC"""
+
+GP_CONFIRMED_APPOINTMENTS = """
+    SELECT appointment_id, user_id, first_name, last_name, time(datetime), appointment_status_name, patient_summary
+    FROM user, appointment, availability, appointment_status
+    WHERE user.user_id = patient_id
+    AND (appointment.appointment_status_id > 0 OR appointment.appointment_status_id = -3)
+    AND appointment.availability_id = availability.availability_id
+    AND appointment.appointment_status_id = appointment_status.appointment_status_id
+    AND datetime >= ?
+    AND datetime < ?
+    AND doctor_id = ?
+    ORDER BY datetime ASC"""
+
+GP_SET_APPOINTMENT_STATUS = """
+    UPDATE appointment
+    SET appointment_status_id = ?
+    WHERE appointment_id = ?"""
+
+GP_RELEASE_AVAILABILITY = """
+    UPDATE availability
+    SET availability_status_id = 0
+    WHERE datetime = ?
+    AND doctor_id = ?"""
+
+# the personal data itself is served by the identity cache (see IDENTITY_PROFILE).
+GP_APPOINTMENT_PATIENT = """
+    SELECT patient_id
+    FROM appointment
+    WHERE appointment_id = ?"""
+
+GP_PATIENT_MEDICAL_BY_PATIENT = """
+    SELECT datetime, diagnosis, prescription_info, doctors_comment
+    FROM medical_record, appointment, availability, user
+    WHERE appointment.appointment_id = medical_record.appointment_id
+    AND appointment.availability_id = availability.availability_id
+    AND appointment.patient_id = user.user_id
+    AND appointment.patient_id = ?
+    ORDER BY datetime ASC"""
+
+GP_APPOINTMENT_BY_APPOINTMENT = """
+    SELECT appointment_id, appointment_status_name, time(datetime), patient_summary
+    FROM appointment, availability, appointment_status
+    WHERE appointment_id = ?
+    AND appointment.availability_id = availability.availability_id
+    AND appointment.appointment_status_id = appointment_status.appointment_status_id"""
+
+GP_PAST_PRESCRIPTIONS = """
+    SELECT medical_record.appointment_id, diagnosis, prescription_info, doctors_comment
+    FROM medical_record, appointment
+    WHERE appointment.appointment_id = ?
+    AND appointment.appointment_id = medical_record.appointment_id"""
+
+GP_CHECK_MEDICAL_RECORD = """
+    SELECT appointment_id, prescription_info, diagnosis, doctors_comment
+    FROM medical_record
+    WHERE appointment_id = ?"""
+
+GP_INSERT_MEDICAL_RECORD = """
+    INSERT INTO medical_record (appointment_id, prescription_info, diagnosis, doctors_comment)
+    VALUES (?, ?, ?, ?)"""
+
+GP_UPDATE_MEDICAL_RECORD = """
+    UPDATE medical_record
+    SET prescription_info = ?, diagnosis = ?, doctors_comment = ?
+    WHERE appointment_id = ?"""
+
+# used when sqlite was built without FTS5, a leading wildcard scans the whole user table.
+GP_SEARCH_PATIENTS_BY_NAME = """
+    SELECT user_id, first_name, last_name, phone_num, address, location
+    FROM user
+    WHERE (first_name LIKE ? OR last_name LIKE ?)
+    AND user_role_id = 2
+    AND user_status_id = 1
+    LIMIT ?"""
+
+# ranked full text search over names, email, phone number and address (see migration 7). The CROSS
+# JOIN keeps the full text index as the outer loop, scanning the user table for every match instead
+# is orders of magnitude slower.
+GP_SEARCH_PATIENTS_FULL_TEXT = """
+    SELECT user.user_id, user.first_name, user.last_name, user.phone_num, user.address, user.location
+    FROM user_search CROSS JOIN user
+    WHERE user_search MATCH ?
+    AND user.user_id = user_search.rowid
+    AND user_role_id = 2
+    AND user_status_id = 1
+    ORDER BY user_search.rank
+    LIMIT ?"""
+
+GP_FULL_TEXT_SEARCH_AVAILABLE = """
+    SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_search')"""
+
+GP_SEARCH_PATIENTS_BY_ID = """
+    SELECT user_id, first_name, last_name, phone_num, address, location
+    FROM user
+    WHERE user_id = ?
+    AND user_role_id = 2
+    AND user_status_id = 1"""
+
+# a page of the active patients, ordered by id so idx_user_role_status serves the order and the seek.
+GP_ALL_PATIENTS = """
+    SELECT user_id, first_name, last_name, phone_num, address, location
+    FROM user
+    WHERE user_role_id = 2
+    AND user_status_id = 1
+    AND user_id > ?
+    ORDER BY user_id
+    LIMIT ?"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# Patient (store/patient.py)
+# ---------------------------------------------------------------------------------------------------
+
+# the details of the doctor are served by the identity cache (see IDENTITY_PROFILE).
+PATIENT_PAST_APPOINTMENTS = """
+    SELECT appointment_id, appointment_status_name, datetime, doctor_id
+    FROM appointment, availability, appointment_status
+    WHERE appointment.patient_id = ?
+    AND datetime < ?
+    AND (datetime, appointment_id) < (?, ?)
+    AND appointment.appointment_status_id = appointment_status.appointment_status_id
+    AND appointment.availability_id = availability.availability_id
+    ORDER BY datetime DESC, appointment_id DESC
+    LIMIT ?"""
+
+PATIENT_NEW_APPOINTMENTS = """
+    SELECT appointment_id, appointment_status_name, datetime, doctor_id
+    FROM appointment, availability, appointment_status
+    WHERE appointment.patient_id = ?
+    AND datetime > ?
+    AND (datetime, appointment_id) > (?, ?)
+    AND appointment.appointment_status_id = appointment_status.appointment_status_id
+    AND appointment.availability_id = availability.availability_id
+    ORDER BY datetime ASC, appointment_id ASC
+    LIMIT ?"""
+
+PATIENT_SEARCH_GP_AVAILABILITY = """
+    SELECT availability_id, doctor_id, datetime, address, first_name, last_name
+    FROM availability, user
+    WHERE datetime >= ?
+    AND datetime < ?
+    AND location = ?
+    AND availability_status_id = 0
+    AND user_role_id = 1
+    AND availability.doctor_id = user.user_id"""
+
+# the details of the doctor are served by the identity cache as well.
+PATIENT_SEARCH_PRESCRIPTIONS = """
+    SELECT medical_record.appointment_id, datetime, doctor_id, diagnosis, prescription_info, doctors_comment
+    FROM appointment, availability, medical_record
+    WHERE (appointment.appointment_status_id = 2 OR appointment.appointment_status_id = 3)
+    AND appointment.patient_id = ?
+    AND medical_record.appointment_id = appointment.appointment_id
+    AND appointment.availability_id = availability.availability_id
+    ORDER BY datetime DESC"""
+
+PATIENT_INSERT_APPOINTMENT = """
+    INSERT INTO appointment (availability_id, appointment_status_id, patient_id, patient_summary)
+    VALUES (?, 0, ?, ?)"""
+
+PATIENT_AVAILABILITY_STATUS = """
+    SELECT availability_status_id, datetime
+    FROM availability
+    WHERE availability_id = ?"""
+
+# only claims the slot if it is still available and has not passed, the row count tells whether the
+# claim succeeded.
+PATIENT_CLAIM_AVAILABILITY = """
+    UPDATE availability
+    SET availability_status_id = 1
+    WHERE availability_id = ?
+    AND availability_status_id = 0
+    AND datetime >= ?"""
+
+PATIENT_CANCEL_APPOINTMENT = """
+    UPDATE appointment
+    SET appointment_status_id = -2
+    WHERE appointment_id = ?"""
+
+PATIENT_RELEASE_AVAILABILITY = """
+    UPDATE availability
+    SET availability_status_id = 0
+    WHERE datetime = ?
+    AND doctor_id = ?"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# notification emails (store/send_email_gmail.py)
+# ---------------------------------------------------------------------------------------------------
+
+# appointments with a status in a datetime range. The unary + makes sqlite find the slots in the
+# range through idx_availability_datetime rather than walking every appointment with the status.
+EMAILS_APPOINTMENTS_BY_STATUS = """
+    SELECT datetime, email, first_name, appointment_id
+    FROM appointment, availability, user
+    WHERE +appointment.appointment_status_id = ?
+    AND availability.datetime >= ?
+    AND availability.datetime < ?
+    AND appointment.availability_id = availability.availability_id
+    AND appointment.patient_id = user.user_id"""
+
+EMAILS_CANCEL_BY_SYSTEM = """
+    UPDATE appointment
+    SET appointment_status_id = -4
+    WHERE appointment_id = ?"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# maintenance jobs (store/maintenance.py)
+# ---------------------------------------------------------------------------------------------------
+
+MAINTENANCE_GET_STATE = """
+    SELECT value
+    FROM maintenance_state
+    WHERE key = ?"""
+
+MAINTENANCE_SET_STATE = """
+    INSERT OR REPLACE INTO maintenance_state (key, value)
+    VALUES (?, ?)"""
+
+# moves every appointment in a status whose slot lies in [since, until) on to a new status. The unary
+# + stops sqlite from walking every appointment in the status, so the slots in the range are found
+# through idx_availability_datetime and their appointments through idx_appointment_availability.
+MAINTENANCE_SWEEP_APPOINTMENTS = """
+    UPDATE appointment
+    SET appointment_status_id = ?
+    WHERE +appointment_status_id = ?
+    AND availability_id IN (
+        SELECT availability_id
+        FROM availability
+        WHERE datetime >= ?
+        AND datetime < ?)"""
+
+# the same for a sweep of the whole history, where walking the appointments in the status through
+# idx_appointment_status is cheaper than looking up every past slot.
+MAINTENANCE_SWEEP_ALL_APPOINTMENTS = """
+    UPDATE appointment
+    SET appointment_status_id = ?
+    WHERE appointment_status_id = ?
+    AND availability_id IN (
+        SELECT availability_id
+        FROM availability
+        WHERE datetime >= ?
+        AND datetime < ?)"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# appointment scheduler (store/scheduler.py)
+# ---------------------------------------------------------------------------------------------------
+
+# the next slot times at which a pending or confirmed appointment passes, in order. Walking the slots
+# through idx_availability_datetime lets the LIMIT stop the scan early.
+SCHEDULER_NEXT_DUE = """
+    SELECT DISTINCT datetime
+    FROM availability
+    WHERE datetime >= ?
+    AND EXISTS (
+        SELECT 1
+        FROM appointment
+        WHERE appointment.availability_id = availability.availability_id
+        AND appointment.appointment_status_id IN (0, 1))
+    ORDER BY datetime ASC
+    LIMIT ?"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# notification outbox (store/outbox.py)
+# ---------------------------------------------------------------------------------------------------
+
+# queues a notification, a notification with the same idempotency key is never queued twice.
+OUTBOX_ENQUEUE = """
+    INSERT OR IGNORE INTO outbox (idempotency_key, recipient, subject, body, text_body, status,
+                                  attempts, next_attempt_at, created_at)
+    VALUES (?, ?, ?, ?, ?, 0, 0, ?, ?)"""
+
+OUTBOX_DUE = """
+    SELECT outbox_id, idempotency_key, recipient, subject, body, text_body, attempts
+    FROM outbox
+    WHERE status = 0
+    AND next_attempt_at <= ?
+    ORDER BY next_attempt_at ASC
+    LIMIT ?"""
+
+# pushes the next attempt of claimed notifications back so no other worker picks them up meanwhile.
+OUTBOX_LEASE = """
+    UPDATE outbox
+    SET next_attempt_at = ?
+    WHERE outbox_id = ?"""
+
+OUTBOX_MARK_SENT = """
+    UPDATE outbox
+    SET status = 1, attempts = attempts + 1, sent_at = ?, last_error = NULL
+    WHERE outbox_id = ?"""
+
+OUTBOX_MARK_RETRY = """
+    UPDATE outbox
+    SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+    WHERE outbox_id = ?"""
+
+OUTBOX_MARK_FAILED = """
+    UPDATE outbox
+    SET status = -1, attempts = attempts + 1, last_error = ?
+    WHERE outbox_id = ?"""
+
+OUTBOX_NEXT_ATTEMPT = """
+    SELECT MIN(next_attempt_at)
+    FROM outbox
+    WHERE status = 0"""
+
+
+# ---------------------------------------------------------------------------------------------------
+# identity cache (store/identity.py)
+# ---------------------------------------------------------------------------------------------------
+
+IDENTITY_PROFILE = """
+    SELECT user_id, first_name, last_name, email, phone_num, location, address, user_role_id,
+           user_status_id
+    FROM user
+    WHERE user_id = ?"""
@@ -1,8 +1,10 @@
-import hashlib
 import logging
 import re
 import sqlite3
 
+from store import queries
+from store.passwords import hash_password
+from store.pool import get_pool
 from store.storage import Storage
 
 
@@ -29,12 +31,9 @@ class Register(Storage):
             cls (Register): A new instance of the Register class with query-enabled internal variables.
         """
 
-        # create an instance of the storage class object.
-        store = Storage
-
-        # establish a connection, create the database and embed the connection and cursor object
-        # within the store class.
-        store._establish_connection(store)
+        # make sure the shared connection pool is available, the conn and cursor used by the class
+        # are checked out of it for each thread the first time they are used.
+        get_pool()
 
         # create an instance of the User class using the store
         return cls
@@ -102,8 +101,8 @@ class Register(Storage):
         """
 
         # database query statement
-        statement = "SELECT EXISTS(SELECT 1 FROM user WHERE email = '{}')".format(email)
-        lookup = self.cursor.execute(statement)
+        statement = queries.USER_EMAIL_EXISTS
+        lookup = self.cursor.execute(statement, (email,))
         row = lookup.fetchone()
         # if the same email was found in the database return True
         if row[0] == 1:
@@ -120,14 +119,11 @@ class Register(Storage):
         """
 
         try:
-            self.cursor.execute('''INSERT INTO user (email,password,first_name,last_name,phone_num,
-                                                    location,address,user_status_id,user_role_id)
-                                    VALUES (?,?,?,?,?,?,?,?,?)''',
-                                                    (email, hashlib.sha1(password.encode('utf-8')).hexdigest(),
-                                                    firstname, lastname, phone,
-                                                    location, address, 0, role))
+            self.cursor.execute(queries.REGISTER_INSERT_USER,
+                                (email, hash_password(password),
+                                 firstname, lastname, phone,
+                                 location, address, 0, role))
             self.conn.commit()
-            self.conn.close()
 
         except sqlite3.Error as er:
             logging.warning(er)
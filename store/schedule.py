@@ -0,0 +1,143 @@
+import datetime
+
+
+# number of availability rows written per executemany call when a template is materialized.
+CHUNK_SIZE = 500
+
+
+class AvailabilityTemplate:
+    """ The AvailabilityTemplate class describes a GP's recurring weekly availability.
+
+    A template such as "Mon-Fri 09:00-12:00 every week until the end of June" is stored as a single
+    row of the availability_template table and expanded into individual availability slots when it
+    is materialized (see GP.materialize_template).
+
+    Attributes:
+        weekdays (tuple): the days of the week the GP is available, 0 is Monday and 6 is Sunday.
+        start_time (string): the time of the first slot of each day, formatted as HH:MM.
+        end_time (string): the time the last slot of each day ends by, formatted as HH:MM.
+        start_date (string): the first day of the template, formatted as YYYY-MM-DD.
+        end_date (string): the last day of the template (inclusive), formatted as YYYY-MM-DD.
+        slot_minutes (int): the length of each appointment slot in minutes.
+    """
+
+    def __init__(self, weekdays, start_time, end_time, start_date, end_date, slot_minutes=15):
+        """ Instatiates the class and validates the rule. """
+
+        self.weekdays = tuple(sorted(set(int(day) for day in weekdays)))
+        self.start_time = start_time
+        self.end_time = end_time
+        self.start_date = start_date
+        self.end_date = end_date
+        self.slot_minutes = int(slot_minutes)
+
+        # fail early on rules that could never produce a slot.
+        if not self.weekdays or self.weekdays[0] < 0 or self.weekdays[-1] > 6:
+            raise ValueError("weekdays must be between 0 (Monday) and 6 (Sunday)")
+
+        if self.slot_minutes <= 0:
+            raise ValueError("slot_minutes must be positive")
+
+        if _parse_time(self.start_time) >= _parse_time(self.end_time):
+            raise ValueError("start_time must be before end_time")
+
+        if datetime.date.fromisoformat(self.start_date) > datetime.date.fromisoformat(self.end_date):
+            raise ValueError("start_date must not be after end_date")
+
+
+    @classmethod
+    def from_row(cls, row):
+        """ Creates a template from the weekdays, start_time, end_time, start_date, end_date and
+        slot_minutes columns of an availability_template row.
+        """
+
+        weekdays, start_time, end_time, start_date, end_date, slot_minutes = row
+
+        return cls(weekdays.split(','), start_time, end_time, start_date, end_date, slot_minutes)
+
+
+    def to_row(self):
+        """ Returns the values of the weekdays, start_time, end_time, start_date, end_date and
+        slot_minutes columns of the availability_template table.
+        """
+
+        weekdays = ','.join(str(day) for day in self.weekdays)
+
+        return weekdays, self.start_time, self.end_time, self.start_date, self.end_date, self.slot_minutes
+
+
+    def slot_times(self):
+        """ Returns the start time of every slot in a day, formatted as HH:MM. """
+
+        times = []
+        minutes = _parse_time(self.start_time)
+        end = _parse_time(self.end_time)
+
+        # a slot is only offered if it finishes by the end time.
+        while minutes + self.slot_minutes <= end:
+            times.append('{:02d}:{:02d}'.format(minutes // 60, minutes % 60))
+            minutes += self.slot_minutes
+
+        return times
+
+
+    def expand(self, since=None):
+        """ Generates the datetime of every slot described by the template, in order.
+
+        Args:
+            since (string): optional first day to generate slots for, formatted as YYYY-MM-DD. Days
+                of the template before it are skipped.
+
+        Yields:
+            slot (string): the datetime of a slot, formatted as 'YYYY-MM-DD HH:MM' like the
+                datetimes written by the manage availability page.
+        """
+
+        day = datetime.date.fromisoformat(self.start_date)
+        last_day = datetime.date.fromisoformat(self.end_date)
+
+        if since is not None:
+            day = max(day, datetime.date.fromisoformat(since))
+
+        times = self.slot_times()
+
+        while day <= last_day:
+            if day.weekday() in self.weekdays:
+                date = day.isoformat()
+
+                for time in times:
+                    yield date + ' ' + time
+
+            day += datetime.timedelta(days=1)
+
+
+def _parse_time(time):
+    """ Converts a HH:MM time into minutes after midnight. """
+
+    hours, minutes = time[0:5].split(':')
+
+    return int(hours) * 60 + int(minutes)
+
+
+def chunked(rows, size=CHUNK_SIZE):
+    """ Splits an iterable of rows into lists of at most size rows.
+
+    Args:
+        rows (iterable): the rows to split, consumed lazily.
+        size (int): the maximum number of rows per list.
+
+    Yields:
+        chunk (list): the next list of rows.
+    """
+
+    chunk = []
+
+    for row in rows:
+        chunk.append(row)
+
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
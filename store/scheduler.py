@@ -0,0 +1,186 @@
+import datetime
+import heapq
+import logging
+import threading
+
+from store import queries
+from store.maintenance import sweep_appointment_statuses
+from store.pool import get_pool
+
+
+# the number of upcoming due times loaded from the database at once.
+HORIZON = 100
+
+# the longest time in seconds the scheduler sleeps before reloading the due times, so appointments
+# booked by another process are still picked up.
+REFRESH_INTERVAL = 3600
+
+
+class AppointmentScheduler(threading.Thread):
+    """ The AppointmentScheduler class moves appointments on to their follow up status as they pass.
+
+    The scheduler keeps a min-heap of the times at which the next pending or confirmed appointments
+    pass and sleeps until the earliest of them, at which point it runs
+    store.maintenance.sweep_appointment_statuses. The sweep only looks at appointments since the
+    previous one, so the status views of the GP and Patient pages stay correct while the application
+    is running without ever scanning the whole appointment table.
+
+    Attributes:
+        horizon (int): the number of upcoming due times loaded from the database at once.
+        refresh_interval (float): the longest time in seconds to sleep before reloading due times.
+        sweeps (int): the number of sweeps run so far.
+        last_sweep (dict): the statistics returned by the most recent sweep.
+    """
+
+    def __init__(self, horizon=HORIZON, refresh_interval=REFRESH_INTERVAL):
+        """ Instatiates the class and initializes internal variables. """
+
+        # a daemon thread never keeps the application open once the window has been closed.
+        super().__init__(name='appointment-scheduler', daemon=True)
+
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self.sweeps = 0
+        self.last_sweep = None
+
+        # min-heap of datetime.datetime objects at which a sweep is due, guarded by the condition.
+        self._due = []
+        self._condition = threading.Condition()
+        self._stopped = False
+
+
+    def notify_due(self, slot):
+        """ Tells the scheduler about an appointment booked for the given slot.
+
+        Args:
+            slot (string): the datetime of the booked slot, formatted as 'YYYY-MM-DD HH:MM'.
+        """
+
+        with self._condition:
+            heapq.heappush(self._due, _due_time(slot))
+
+            # wake the scheduler in case the new appointment passes before the one it waits for.
+            self._condition.notify()
+
+
+    def stop(self, timeout=None):
+        """ Stops the scheduler and waits for it to finish.
+
+        Args:
+            timeout (float): the longest time in seconds to wait for the thread to finish.
+        """
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+        if self.is_alive():
+            self.join(timeout)
+
+
+    def _load_due_times(self):
+        """ Returns the times at which the next upcoming appointments pass. """
+
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        with get_pool().connection() as conn:
+            rows = conn.execute(queries.SCHEDULER_NEXT_DUE, (now, self.horizon)).fetchall()
+
+        return [_due_time(row[0]) for row in rows]
+
+
+    def _wait_until_due(self):
+        """ Sleeps until a sweep is due or the due times should be reloaded.
+
+        Returns:
+            due (bool): True if a sweep is due, False if the scheduler should only reload.
+        """
+
+        with self._condition:
+            reload_at = datetime.datetime.now() + datetime.timedelta(seconds=self.refresh_interval)
+
+            while not self._stopped:
+                now = datetime.datetime.now()
+
+                if self._due and self._due[0] <= now:
+                    # every time that has passed is covered by the one sweep.
+                    while self._due and self._due[0] <= now:
+                        heapq.heappop(self._due)
+
+                    return True
+
+                if now >= reload_at:
+                    return False
+
+                # sleep until the earliest due time, a reload or a notification, whichever is first.
+                wake_at = min(self._due[0], reload_at) if self._due else reload_at
+                self._condition.wait((wake_at - now).total_seconds())
+
+            return False
+
+
+    def run(self):
+        """ Sweeps appointments as they pass until the scheduler is stopped. """
+
+        while not self._stopped:
+            try:
+                due_times = self._load_due_times()
+
+                # merge with the times notified in the meantime, a sorted list is a valid heap.
+                with self._condition:
+                    self._due = sorted(set(self._due).union(due_times))
+
+                if self._wait_until_due():
+                    self.last_sweep = sweep_appointment_statuses()
+                    self.sweeps += 1
+
+            except Exception:
+                # keep the scheduler alive, e.g. if the database was locked for too long.
+                logging.exception("Appointment scheduler failed, retrying in a minute.")
+
+                with self._condition:
+                    self._condition.wait(60)
+
+
+def _due_time(slot):
+    """ Returns the time at which an appointment in the given slot is swept.
+
+    The sweep compares slots to the current time to the minute, so an appointment passes one minute
+    after its slot starts.
+    """
+
+    return datetime.datetime.fromisoformat(slot) + datetime.timedelta(minutes=1)
+
+
+# the scheduler started by start_scheduler, if any.
+_scheduler = None
+
+
+def start_scheduler(**kwargs):
+    """ Starts the appointment scheduler of this process, if it is not already running.
+
+    Args:
+        **kwargs: keyword arguments passed on to AppointmentScheduler.
+
+    Returns:
+        scheduler (AppointmentScheduler): the running scheduler.
+    """
+
+    global _scheduler
+
+    if _scheduler is None or not _scheduler.is_alive():
+        _scheduler = AppointmentScheduler(**kwargs)
+        _scheduler.start()
+
+    return _scheduler
+
+
+def notify_appointment_booked(slot):
+    """ Tells the running scheduler, if any, about an appointment booked for the given slot.
+
+    Args:
+        slot (string): the datetime of the booked slot, formatted as 'YYYY-MM-DD HH:MM'.
+    """
+
+    if _scheduler is not None:
+        _scheduler.notify_due(slot)
@@ -0,0 +1,29 @@
+import re
+
+
+# the maximum number of patients returned by a search.
+SEARCH_LIMIT = 100
+
+# words of the search text, sqlite's unicode61 tokenizer splits on the same characters.
+_WORD = re.compile(r'[^\W_]+')
+
+
+def match_expression(text):
+    """ Turns search text typed by a user into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so 'ann smi' finds 'Anna Smith', and the characters of
+    the FTS5 query syntax typed by the user are never interpreted.
+
+    Args:
+        text (string): the search text.
+
+    Returns:
+        expression (string): the MATCH expression, or None if the text has no words.
+    """
+
+    words = _WORD.findall(text)
+
+    if not words:
+        return None
+
+    return ' '.join('"{}"*'.format(word) for word in words)
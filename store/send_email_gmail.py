@@ -1,70 +1,68 @@
-import sqlite3
 import datetime
-import smtplib
-from email.mime.text import MIMEText
-import re
-import os
-
-
-def emails(status, conn, cursor):
-    cursor.execute('''
-        SELECT datetime, email, first_name, appointment_id 
-        FROM appointment, availability, user 
-        WHERE appointment.appointment_status_id = ? 
-        AND appointment.availability_id = availability.availability_id 
-        AND appointment.patient_id = user.user_id''',(status,))
-
-    searchresult = cursor.fetchall()
-    print(searchresult)
-    i = 0
-
-    while i < len(searchresult):
-        m = re.search("(\d{4}-\d{1,2}-\d{1,2})", searchresult[i][0])
-        strdate = m.group(1)
-        n = re.search("(\d{2}:\d{1,2})", searchresult[i][0])
-        strtime = n.group(1)
-        now = datetime.datetime.now()
-
-        if (str((now.date() + datetime.timedelta(days = 1))) == str(strdate)):
-            sender = 'uclpatientsystem@gmail.com'
-            psw = 'qwqiufeng1'
-            receiver = searchresult[i][1]
-            subject = 'e-Health patient management system'
-
-            if status == 1:
-                body = 'Hi\n' + searchresult[i][
-                    2] + ':' + '<p>Please don\'t forget you have an appointment tomorrow at ' + strtime + '.</p>' + 'Best,'
-
-            if status == 0:
-                body = 'Hi\n' + searchresult[i][
-                    2] + ':' + '<p>Your appointment request for tomorrow at ' + strtime + ' has been cancelled by the system because it has not been confirmed by the GP.</p>' + 'Best,'
-
-                cursor.execute('''
-                    UPDATE appointment 
-                    SET appointment_status_id = -4 
-                    WHERE appointment_id = ?''', (searchresult[i][3],))
-
-                conn.commit()
-
-            if status == -1:
-                body = 'Hi\n' + searchresult[i][
-                    2] + ':' + '<p>Sorry, your appointment for tomorrow at ' + strtime + ' has been cancelled by the GP.</p>' + 'Best,'
-
-            msg = MIMEText(body, 'html', 'utf-8')
-            msg['from'] = sender
-            msg['to'] = searchresult[i][1]
-            msg['subject'] = subject
-
-            # send email
-            smtp = smtplib.SMTP('smtp.gmail.com:587')
-            smtp.ehlo()
-            smtp.starttls()
-            smtp.login(sender, psw)  # login
-            smtp.sendmail(sender, receiver, msg.as_string())  # send
-            smtp.quit()  # quit
-            print("send email successed")
-
-        else:
-            pass
-
-        i = i + 1
+import logging
+
+from store import queries
+from store.outbox import enqueue, notify_outbox
+from store.storage import Storage
+from store.templates import DEFAULT_LOCALE, render_batch
+
+
+# the notification template (see store/templates.py) sent for each appointment status.
+NOTIFICATIONS = {
+    1: 'appointment_reminder',
+    0: 'request_cancelled_by_system',
+    -1: 'cancelled_by_gp',
+}
+
+
+def emails(status, conn, cursor, locale=DEFAULT_LOCALE):
+    """ Queues the notification emails for next day appointments with the given status.
+
+    Only tomorrow's appointments are selected, using the index on the slot datetime, and the rows
+    are streamed from the cursor, so the work done scales with the number of appointments tomorrow
+    rather than with the appointment history. The emails are written to the outbox in the same
+    transaction as the cancellations made by the system, and delivered in the background by the
+    outbox worker (see store/outbox.py). Queuing the emails for an appointment twice, e.g. by
+    clicking the button again, only sends them once.
+
+    Args:
+        status (int): 1 for reminders of confirmed appointments, 0 to cancel requests the gp has not
+            confirmed and -1 for appointments cancelled by the gp.
+        conn (sqlite3.connection): sqlite3 class object obtained from connecting to the database.
+        cursor (sqlite3.cursor): sqlite3 class object to enable querying the database.
+        locale (string): the locale of the notification templates.
+
+    Returns:
+        queued (int): the number of emails that were queued.
+    """
+
+    tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+    day_start, day_end = Storage.day_range(tomorrow)
+
+    queued = 0
+
+    # writes go through their own cursor so they do not reset the one being streamed.
+    writer = conn.cursor()
+
+    rows = cursor.execute(queries.EMAILS_APPOINTMENTS_BY_STATUS, (status, day_start, day_end))
+    recipients = ({'receiver': receiver, 'first_name': first_name, 'time': slot[11:16],
+                   'appointment_id': appointment_id}
+                  for slot, receiver, first_name, appointment_id in rows)
+
+    # the html and plain text bodies are rendered in a single pass over the streamed rows.
+    for fields, subject, body, text_body in render_batch(NOTIFICATIONS[status], recipients, locale):
+        if status == 0:
+            writer.execute(queries.EMAILS_CANCEL_BY_SYSTEM, (fields['appointment_id'],))
+
+        # one notification per appointment and status.
+        key = 'appointment-{}-status-{}'.format(fields['appointment_id'], status)
+        queued += enqueue(writer, key, fields['receiver'], subject, body, text_body)
+
+    # commit the cancellations made by the system together with their notifications.
+    conn.commit()
+
+    # deliver the queued emails in the background.
+    notify_outbox()
+    logging.info("Queued %d notification emails.", queued)
+
+    return queued
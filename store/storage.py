@@ -1,5 +1,40 @@
-# import database connection and creation methods only.
-from store.conn import connect_to_database
+import datetime
+import random
+import sqlite3
+import time
+
+# import the shared connection pool only.
+from store.pool import get_pool
+
+
+# how often a write transaction is retried when another connection holds the write lock for longer
+# than the busy_timeout pragma, and the delay in seconds before the first retry.
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05
+
+
+class _ThreadConnection:
+    """ Resolves the conn or cursor attribute of the store classes to the calling thread's own.
+
+    The store classes are mostly used through the class itself (see User.create_user), so the
+    connection cannot live on an instance. Looking the attribute up through this descriptor checks a
+    connection out of the shared pool for the calling thread instead, which means no two threads
+    ever share a connection or clobber each others cursor.
+    """
+
+    def __init__(self, name):
+        """ Instatiates the descriptor for either the 'conn' or the 'cursor' attribute. """
+
+        self.name = name
+
+
+    def __get__(self, instance, owner):
+        """ Returns the connection or cursor of the calling thread. """
+
+        if self.name == 'conn':
+            return get_pool().thread_connection()
+
+        return get_pool().thread_cursor()
 
 
 class Storage:
@@ -8,14 +43,20 @@ class Storage:
     Storage defines the top level class that is used within the store package, all other classes
     within store will either directly or by inheritance import the Storage class to get access to
     the internal sqlite3.connection and sqlite3.cursor objects from the sqlite3 package. These
-    objects can then be efficiently re-used across the application create queries to the datastore
-    without having to expensively close and reopen a connection.
+    objects are checked out of a shared connection pool, one per thread, so they can be efficiently
+    re-used across the application to create queries to the datastore without having to
+    expensively close and reopen a connection, and without threads interfering with each other.
 
     Attributes:
         conn (sqlite3.connection): sqlite3 class object obtained from connecting to the database.
         cursor (sqlite3.cursor): sqlite3 class object to enable querying the database.
     """
 
+    # unless an instance has established its own connection, the conn and cursor are those of the
+    # calling thread.
+    conn = _ThreadConnection('conn')
+    cursor = _ThreadConnection('cursor')
+
     def __init__(self):
         """ Instatiates the class and initializes internal variables. """
 
@@ -36,9 +77,73 @@ class Storage:
         'wires-up' the conn and cursor objects enabling them for use in querying the database.
         """
 
-        # get sqlite3 connection and cursor objects from by invoking functions in conn.py
-        conn, cursor = connect_to_database()
+        # get the sqlite3 connection and cursor objects of the calling thread from the pool.
+        pool = get_pool()
 
         # assign conn and cursor to internal object governed by the Storage class.
-        self.conn = conn
-        self.cursor = cursor
+        self.conn = pool.thread_connection()
+        self.cursor = pool.thread_cursor()
+
+
+    def _immediate_transaction(self, work, retries=BUSY_RETRIES, backoff=BUSY_BACKOFF):
+        """ Runs a unit of work in a BEGIN IMMEDIATE transaction, retrying while the database is busy.
+
+        BEGIN IMMEDIATE takes the write lock before anything is read, so no other connection can
+        change the rows the work looks at until it is committed. If the lock cannot be taken within
+        the busy_timeout the transaction is retried after an exponentially growing, jittered delay.
+        The work is committed if it returns normally and rolled back if it raises.
+
+        Args:
+            work (function): called with the cursor to run the statements of the transaction.
+            retries (int): the number of times to retry after the database was busy.
+            backoff (float): the delay in seconds before the first retry, doubled for each retry.
+
+        Returns:
+            result: the value returned by work.
+
+        Raises:
+            sqlite3.OperationalError: if the database was still busy after the last retry.
+        """
+
+        for attempt in range(retries + 1):
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                break
+
+            except sqlite3.OperationalError as error:
+                # anything other than a lock held by another connection is not worth retrying.
+                if ('locked' not in str(error) and 'busy' not in str(error)) or attempt == retries:
+                    raise
+
+                time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+        try:
+            result = work(self.cursor)
+            self.conn.commit()
+
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+        return result
+
+
+    @staticmethod
+    def day_range(day):
+        """ Calculates the half-open datetime range covering a single calendar day.
+
+        Datetimes are stored as 'YYYY-MM-DD HH:MM' text, so comparing against the bounds returned
+        here selects every slot on the given day while still letting sqlite use an index on the
+        datetime column, unlike wrapping the column in date().
+
+        Args:
+            day (string): the day formatted as 'YYYY-MM-DD'.
+
+        Returns:
+            start (string): the inclusive lower bound, the day itself.
+            end (string): the exclusive upper bound, the following day.
+        """
+
+        next_day = datetime.date.fromisoformat(day) + datetime.timedelta(days=1)
+
+        return day, next_day.isoformat()
@@ -0,0 +1,155 @@
+import functools
+import html
+import string
+
+
+# the locale used when a notification has no template in the requested one.
+DEFAULT_LOCALE = 'en'
+
+
+class NotificationTemplate:
+    """ The NotificationTemplate class renders one kind of notification email.
+
+    The subject, html and plain text bodies are compiled into string.Template objects once, when
+    the template is created. Values substituted into the html body are escaped, so a patient's
+    name can never inject markup into the email.
+
+    Attributes:
+        subject (string.Template): the subject line.
+        html (string.Template): the html body.
+        text (string.Template): the plain text body.
+    """
+
+    def __init__(self, subject, html_body, text_body):
+        """ Instatiates the class and compiles the templates. """
+
+        self.subject = string.Template(subject)
+        self.html = string.Template(html_body)
+        self.text = string.Template(text_body)
+
+
+    def render(self, fields):
+        """ Renders the template.
+
+        Args:
+            fields (dict): the values of the $placeholders, e.g. first_name and time.
+
+        Returns:
+            subject (string): the subject line.
+            html_body (string): the html body.
+            text_body (string): the plain text body.
+        """
+
+        escaped = {name: html.escape(str(value)) for name, value in fields.items()}
+
+        return self.subject.substitute(fields), self.html.substitute(escaped), self.text.substitute(fields)
+
+
+# notification templates by locale and name.
+TEMPLATES = {
+    'en': {
+        # reminder of a confirmed appointment.
+        'appointment_reminder': NotificationTemplate(
+            'e-Health patient management system',
+            "Hi\n$first_name:<p>Please don't forget you have an appointment tomorrow at $time.</p>Best,",
+            "Hi $first_name,\n\nPlease don't forget you have an appointment tomorrow at $time.\n\nBest,"),
+
+        # an appointment request the gp did not confirm in time.
+        'request_cancelled_by_system': NotificationTemplate(
+            'e-Health patient management system',
+            "Hi\n$first_name:<p>Your appointment request for tomorrow at $time has been cancelled by the "
+            "system because it has not been confirmed by the GP.</p>Best,",
+            "Hi $first_name,\n\nYour appointment request for tomorrow at $time has been cancelled by the "
+            "system because it has not been confirmed by the GP.\n\nBest,"),
+
+        # an appointment cancelled by the gp.
+        'cancelled_by_gp': NotificationTemplate(
+            'e-Health patient management system',
+            "Hi\n$first_name:<p>Sorry, your appointment for tomorrow at $time has been cancelled by the "
+            "GP.</p>Best,",
+            "Hi $first_name,\n\nSorry, your appointment for tomorrow at $time has been cancelled by the "
+            "GP.\n\nBest,"),
+    },
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(name, locale=DEFAULT_LOCALE):
+    """ Looks up a notification template, falling back to the language and then the default locale.
+
+    For example 'en-GB' falls back to 'en'. Lookups are cached, so the fallback is only worked out
+    once per name and locale.
+
+    Args:
+        name (string): the name of the notification, e.g. 'appointment_reminder'.
+        locale (string): the preferred locale of the recipient.
+
+    Returns:
+        template (NotificationTemplate): the template to render.
+
+    Raises:
+        KeyError: if no locale has a template with the given name.
+    """
+
+    for candidate in (locale, locale.split('-')[0], DEFAULT_LOCALE):
+        if name in TEMPLATES.get(candidate, {}):
+            return TEMPLATES[candidate][name]
+
+    raise KeyError(name)
+
+
+def render_batch(name, recipients, locale=DEFAULT_LOCALE):
+    """ Renders a notification for many recipients in a single pass.
+
+    The template is looked up once for the whole batch and recipients are consumed lazily, so rows
+    can be streamed straight from a database cursor.
+
+    Args:
+        name (string): the name of the notification.
+        recipients (iterable): one dict of template fields per recipient.
+        locale (string): the preferred locale of the recipients.
+
+    Yields:
+        rendered (tuple): the recipient's fields followed by the subject, html and plain text bodies.
+    """
+
+    template = get_template(name, locale)
+
+    for fields in recipients:
+        yield (fields,) + template.render(fields)
+
+
+def build_message(sender, recipient, subject, html_body, text_body=None):
+    """ Creates a notification email.
+
+    Args:
+        sender (string): the address the email is sent from.
+        recipient (string): the address the email is sent to.
+        subject (string): the subject line.
+        html_body (string): the html body.
+        text_body (string): the optional plain text body, offered as an alternative to the html.
+
+    Returns:
+        msg (email.message.Message): a multipart/alternative message, or a plain html message if
+            there is no plain text body.
+    """
+
+    # the email package takes longer to import than the rest of the store, rendering does not need
+    # it so it is only imported once a message is built.
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    if text_body is None:
+        msg = MIMEText(html_body, 'html', 'utf-8')
+
+    else:
+        # mail clients show the last alternative they can display, so the html goes last.
+        msg = MIMEMultipart('alternative')
+        msg.attach(MIMEText(text_body, 'plain', 'utf-8'))
+        msg.attach(MIMEText(html_body, 'html', 'utf-8'))
+
+    msg['from'] = sender
+    msg['to'] = recipient
+    msg['subject'] = subject
+
+    return msg
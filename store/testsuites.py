@@ -56,6 +56,69 @@ class TestStorageFeatures(unittest.TestCase):
         self.assertIsNotNone(s.conn)
         self.assertIsNotNone(s.cursor)
 
+    def test_day_range(self):
+        self.assertEqual(Storage.day_range("2020-01-30"), ("2020-01-30", "2020-01-31"))
+        self.assertEqual(Storage.day_range("2020-12-31"), ("2020-12-31", "2021-01-01"))
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_thread_connections_are_separate(self):
+        import threading
+        from store.pool import ConnectionPool
+        pool = ConnectionPool("./store/UCLH.db", max_connections=2)
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(pool.thread_connection()))
+        thread.start()
+        thread.join()
+        self.assertIs(pool.thread_connection(), pool.thread_connection())
+        self.assertIsNot(pool.thread_connection(), connections[0])
+
+    def test_pool_is_bounded(self):
+        import sqlite3
+        from store.pool import ConnectionPool
+        pool = ConnectionPool("./store/UCLH.db", max_connections=1, timeout=0.01)
+        conn = pool.acquire()
+        self.assertRaises(sqlite3.OperationalError, pool.acquire)
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+
+    def test_release_thread_connection(self):
+        import threading
+        from store.pool import ConnectionPool
+        pool = ConnectionPool("./store/UCLH.db", max_connections=1, timeout=0.01)
+
+        def work():
+            pool.thread_connection()
+            pool.release_thread_connection()
+
+        # threads that release their connection when they are done share the only one.
+        for _ in range(3):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        self.assertEqual(pool._idle.qsize(), 1)
+
+    def test_detach_thread_cursor(self):
+        from store.pool import ConnectionPool
+        pool = ConnectionPool("./store/UCLH.db", max_connections=1)
+        cursor = pool.thread_cursor().execute("SELECT user_id FROM user ORDER BY user_id")
+        pool.detach_thread_cursor(cursor)
+        # the next query of the thread leaves the detached resultset alone.
+        self.assertIsNot(pool.thread_cursor(), cursor)
+        pool.thread_cursor().execute("SELECT 1").fetchall()
+        self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_connection_context_rolls_back(self):
+        from store.pool import ConnectionPool
+        pool = ConnectionPool("./store/UCLH.db", max_connections=1)
+        with self.assertRaises(ValueError):
+            with pool.connection() as conn:
+                conn.execute("UPDATE user SET first_name = 'ROLLBACK' WHERE user_id = 1")
+                raise ValueError
+        with pool.connection() as conn:
+            self.assertNotEqual(conn.execute("SELECT first_name FROM user WHERE user_id = 1").fetchone()[0],
+                                'ROLLBACK')
+
 
 """ Unit tests """
 
@@ -94,6 +157,81 @@ class TestDatabaseCreation(unittest.TestCase):
         ]
         self.assertEqual(fetch_appointment_status_table(self.cursor), required)
 
+    def test_connection_pragmas(self):
+        self.assertEqual(self.cursor.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        self.assertEqual(self.cursor.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+        self.assertEqual(self.cursor.execute("PRAGMA synchronous").fetchone()[0], 1)
+
+    def test_incremental_vacuum(self):
+        from store.maintenance import incremental_vacuum
+        self.assertGreaterEqual(incremental_vacuum(pages=10), 0)
+        # the class connection may have been opened before the database was converted.
+        conn, cursor = connect_to_database()
+        self.assertEqual(cursor.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        conn.close()
+
+    def test_schema_migrations(self):
+        from store.conn import MIGRATIONS, migrate_database
+        latest = MIGRATIONS[-1][0]
+        self.assertEqual(self.cursor.execute("PRAGMA user_version").fetchone()[0], latest)
+        # migrating an up to date database does nothing.
+        self.assertEqual(migrate_database(self.conn, self.cursor), latest)
+        indexes = [row[0] for row in self.cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'appointment'")]
+        self.assertIn('idx_appointment_patient_status', indexes)
+        self.assertIn('idx_appointment_availability', indexes)
+
+    def test_user_search_created_late(self):
+        import tempfile
+        from store.conn import create_database, migrate_database
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "TEST.db")
+            create_database(path)
+            conn, cursor = connect_to_database(path)
+            # as left by migration 7 where sqlite was built without FTS5.
+            for trigger in ("user_search_insert", "user_search_delete", "user_search_update"):
+                cursor.execute("DROP TRIGGER {}".format(trigger))
+            cursor.execute("DROP TABLE user_search")
+            conn.commit()
+            migrate_database(conn, cursor)
+            self.assertEqual(cursor.execute("SELECT rowid FROM user_search WHERE user_search MATCH 'patient*'").fetchall(), [(3,)])
+            conn.close()
+
+    def test_appointment_scheduler(self):
+        import time
+        from store.scheduler import AppointmentScheduler
+        scheduler = AppointmentScheduler(refresh_interval=60)
+        scheduler.start()
+        # an appointment that has already passed is swept straight away.
+        scheduler.notify_due("2000-01-01 09:00")
+        for _ in range(50):
+            if scheduler.sweeps:
+                break
+            time.sleep(0.1)
+        scheduler.stop(timeout=5)
+        self.assertEqual(scheduler.sweeps, 1)
+        self.assertFalse(scheduler.is_alive())
+        self.cursor.execute("DELETE FROM maintenance_state")
+        self.conn.commit()
+
+    def test_sweep_appointment_statuses(self):
+        from store.maintenance import sweep_appointment_statuses
+        self.cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16390,2,'2000-01-01 09:00',1)")
+        self.cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16391,2,'2000-01-01 09:15',1)")
+        self.cursor.execute("INSERT INTO appointment (appointment_id,availability_id,appointment_status_id,patient_id,patient_summary) VALUES (16390,16390,1,3,'TEST')")
+        self.cursor.execute("INSERT INTO appointment (appointment_id,availability_id,appointment_status_id,patient_id,patient_summary) VALUES (16391,16391,0,3,'TEST')")
+        self.conn.commit()
+        stats = sweep_appointment_statuses(now="2000-01-01 09:10", full=True)
+        self.assertEqual(stats['updated'], 1)
+        # the next sweep only looks at appointments after the watermark.
+        stats = sweep_appointment_statuses(now="2000-01-01 10:00")
+        self.assertEqual((stats['since'], stats['updated']), ("2000-01-01 09:10", 1))
+        self.cursor.execute("SELECT appointment_status_id FROM appointment WHERE appointment_id IN (16390,16391) ORDER BY appointment_id")
+        self.assertEqual(self.cursor.fetchall(), [(4,), (-4,)])
+        self.cursor.execute("DELETE FROM availability WHERE availability_id IN (16390,16391)")
+        self.cursor.execute("DELETE FROM maintenance_state")
+        self.conn.commit()
+
 
 """ Unit tests. """
 
@@ -156,6 +294,67 @@ class TestAdminFeatures(unittest.TestCase):
         self.assertEqual(fetch_user_status(admin.cursor, 2), [(1,)])
         self.assertEqual(fetch_user_status(admin.cursor, 3), [(1,)])
 
+    def test_identity_cache_invalidated(self):
+        """ Profiles are served from memory until an Admin changes the user. """
+        from store.identity import identity_cache
+
+        stranger = User.create_user()
+        admin = stranger.login(stranger, "admin@mail.com", "AdminPassword")
+        identity_cache.clear()
+        self.assertEqual(identity_cache.profile(admin.cursor, 1)[8], 1)
+        self.assertEqual(identity_cache.profile(admin.cursor, "1")[8], 1)
+        self.assertEqual((identity_cache.hits, identity_cache.misses), (1, 1))
+        # deactivating the user drops the cached profile.
+        admin.deactivate_user(1)
+        self.assertEqual(identity_cache.profile(admin.cursor, 1)[8], -1)
+        self.assertEqual((identity_cache.hits, identity_cache.misses), (1, 2))
+        admin.activate_user(1)
+        # ids that are not numbers are neither cached nor an error.
+        self.assertIsNone(identity_cache.profile(admin.cursor, ""))
+        admin.activate_user("")
+        admin.deactivate_user("abc")
+        admin.delete_user(None)
+        self.assertEqual(fetch_user_status(admin.cursor, 1), [(1,)])
+
+    def test_identity_cache_invalidated_while_read(self):
+        """ A profile read while its user is invalidated is returned but not cached. """
+        from store.identity import IdentityCache
+
+        stranger = User.create_user()
+        admin = stranger.login(stranger, "admin@mail.com", "AdminPassword")
+        cache = IdentityCache()
+
+        class InvalidatingCursor:
+            """ Invalidates the user between reading its profile and caching it. """
+
+            def execute(self, statement, params):
+                rows = admin.cursor.execute(statement, params)
+                cache.invalidate(params[0])
+                return rows
+
+        self.assertEqual(cache.profile(InvalidatingCursor(), 1)[0], 1)
+        cache.profile(admin.cursor, 1)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_manage_records_pages(self):
+        """ Paging through the accounts returns every account once, in id order. """
+        from store.pagination import decode_page_token
+
+        stranger = User.create_user()
+        admin = stranger.login(stranger, "admin@mail.com", "AdminPassword")
+        expected = [row[0] for row in admin.cursor.execute("SELECT user_id FROM user WHERE user_role_id != 0 ORDER BY user_id")]
+        ids, page_token = [], None
+        while True:
+            page = admin.manage_records("All", page_size=2, page_token=page_token)
+            self.assertLessEqual(len(page), 2)
+            ids.extend(row[0] for row in page)
+            page_token = page.next_page_token
+            if page_token is None:
+                break
+        self.assertEqual(ids, expected)
+        with self.assertRaises(ValueError):
+            decode_page_token("not a token", 1)
+
     def test_delete_user(self):
         """ Test deleting user, function should handle invalid parameters."""
 
@@ -191,6 +390,34 @@ class TestGPFeatures(unittest.TestCase):
         conn.commit()
         conn.close()
 
+    def test_search_patients_via_id(self):
+        from store.pagination import Page
+        stranger = User.create_user()
+        gp = stranger.login(stranger, "gp@mail.com", "GpPassword")
+        # both searches return a page, like search_patients.
+        self.assertIsInstance(gp.search_patients_via_id(""), Page)
+        self.assertEqual([row[0] for row in gp.search_patients_via_id("3")], [3])
+
+    def test_search_patients(self):
+        from store.search import match_expression
+        self.assertIsNone(match_expression(' "*( '))
+        self.assertEqual(match_expression('ann smi'), '"ann"* "smi"*')
+
+        stranger = User.create_user()
+        gp = stranger.login(stranger, "gp@mail.com", "GpPassword")
+        gp.cursor.execute("INSERT INTO user (user_id,email,first_name,last_name,phone_num,user_status_id,user_role_id) VALUES (16384,'zq@mail.com','Zelda','Quixote','07123456789',1,2)")
+        gp.conn.commit()
+        self.assertEqual([row[0] for row in gp.search_patients("zel QUI")], [16384])
+        self.assertEqual([row[0] for row in gp.search_patients("0712345")], [16384])
+        # the index follows changes to the user table.
+        gp.cursor.execute("UPDATE user SET first_name='Wanda' WHERE user_id=16384")
+        gp.conn.commit()
+        self.assertEqual(gp.search_patients("zelda").fetchall(), [])
+        self.assertEqual([row[0] for row in gp.search_patients_via_name("wand")], [16384])
+        gp.cursor.execute("DELETE FROM user WHERE user_id=16384")
+        gp.conn.commit()
+        self.assertEqual(gp.search_patients("wanda").fetchall(), [])
+
     def test_update_appointment(self):
         def helper(cursor, id):
             cursor.execute("SELECT * FROM appointment WHERE appointment_id= '{}'".format(id))
@@ -212,6 +439,52 @@ class TestGPFeatures(unittest.TestCase):
             "DELETE FROM appointment WHERE appointment_id=16384")
         gp.conn.commit()
 
+    def test_set_day_availability(self):
+        def helper(cursor):
+            cursor.execute("SELECT datetime, availability_status_id FROM availability WHERE doctor_id=2 AND datetime LIKE '2020-02-03%' ORDER BY datetime")
+            return cursor.fetchall()
+
+        stranger = User.create_user()
+        gp = stranger.login(stranger, "gp@mail.com", "GpPassword")
+        self.assertEqual(gp.set_day_availability(2, "2020-02-03", ["08:30", "08:45", "09:00"]), (3, 0))
+        # saving the same day again writes nothing.
+        self.assertEqual(gp.set_day_availability(2, "2020-02-03", ["08:30", "08:45", "09:00"]), (0, 0))
+        gp.cursor.execute("UPDATE availability SET availability_status_id=1 WHERE doctor_id=2 AND datetime='2020-02-03 08:45'")
+        gp.conn.commit()
+        # booked slots are kept when the day is cleared.
+        self.assertEqual(gp.set_day_availability(2, "2020-02-03", []), (0, 2))
+        self.assertEqual(helper(gp.cursor), [("2020-02-03 08:45", 1)])
+        gp.cursor.execute("DELETE FROM availability WHERE doctor_id=2 AND datetime LIKE '2020-02-03%'")
+        gp.conn.commit()
+
+    def test_availability_templates(self):
+        from store.schedule import AvailabilityTemplate
+
+        def helper(cursor):
+            cursor.execute("SELECT datetime FROM availability WHERE doctor_id=2 AND datetime LIKE '2020-03-%' ORDER BY datetime")
+            return [row[0] for row in cursor.fetchall()]
+
+        # Mon-Wed 09:00-10:00 in the week of Monday 2020-03-02.
+        template = AvailabilityTemplate([0, 1, 2], "09:00", "10:00", "2020-03-02", "2020-03-08")
+        self.assertEqual(template.slot_times(), ["09:00", "09:15", "09:30", "09:45"])
+        self.assertEqual(len(list(template.expand())), 12)
+
+        stranger = User.create_user()
+        gp = stranger.login(stranger, "gp@mail.com", "GpPassword")
+        template_id, added = gp.add_availability_template(2, template)
+        self.assertEqual(added, 0)  # the template is in the past.
+        self.assertEqual(gp.materialize_template(template_id, since="2020-03-01"), 12)
+        self.assertEqual(gp.materialize_template(template_id, since="2020-03-01"), 0)
+
+        # moving Wednesday to Friday only touches the slots of those two days.
+        friday = AvailabilityTemplate([0, 1, 4], "09:00", "10:00", "2020-03-02", "2020-03-08")
+        self.assertEqual(gp.update_availability_template(template_id, friday, since="2020-03-01"), (4, 4))
+        self.assertEqual(helper(gp.cursor)[-1], "2020-03-06 09:45")
+        self.assertEqual(gp.availability_templates(2)[-1][1].weekdays, (0, 1, 4))
+
+        self.assertEqual(gp.remove_availability_template(template_id, since="2020-03-01"), 12)
+        self.assertEqual(helper(gp.cursor), [])
+
 
 """ Helper method"""
 
@@ -234,7 +507,7 @@ class TestPatientFeatures(unittest.TestCase):
             create_database()
         conn, cursor = connect_to_database()
         cursor.execute(
-            "INSERT OR IGNORE INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16384,2,'2020-01-30',0)")
+            "INSERT OR IGNORE INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16384,2,'2099-01-30',0)")
         conn.commit()
         conn.close()
 
@@ -249,15 +522,71 @@ class TestPatientFeatures(unittest.TestCase):
     def test_submit_appointment(self):
         stranger = User.create_user()
         patient = stranger.login(stranger, "patient@mail.com", "PatientPassword")
-        patient.submit_appointment_booking(16384, patient.user_id, "TEST")
+        self.assertTrue(patient.submit_appointment_booking(16384, patient.user_id, "TEST"))
+        # the slot can only be booked once.
+        self.assertFalse(patient.submit_appointment_booking(16384, patient.user_id, "TEST"))
         conn, cursor = connect_to_database()
         cursor.execute("SELECT appointment_id FROM appointment WHERE availability_id=16384 AND patient_summary='TEST'")
         id = cursor.fetchone()
+        self.assertIsNone(cursor.fetchone())
         self.assertEqual(helper_appointment(patient.cursor, id[0]), [(id[0], 16384, 0, patient.user_id, 'TEST',)])
-        self.assertEqual(helper_avalibility(patient.cursor, 16384), [(16384, 2, '2020-01-30', 1)])
+        self.assertEqual(helper_avalibility(patient.cursor, 16384), [(16384, 2, '2099-01-30', 1)])
         cursor.execute("DELETE FROM appointment WHERE availability_id=16384 AND patient_summary='TEST'")
         conn.commit()
 
+    def test_submit_appointment_past_slot(self):
+        stranger = User.create_user()
+        patient = stranger.login(stranger, "patient@mail.com", "PatientPassword")
+        patient.cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16385,2,'2000-01-01 09:00',0)")
+        patient.conn.commit()
+        try:
+            # a slot that has already passed cannot be booked any more.
+            self.assertFalse(patient.submit_appointment_booking(16385, patient.user_id, "TEST"))
+            self.assertEqual(helper_avalibility(patient.cursor, 16385), [(16385, 2, '2000-01-01 09:00', 0)])
+        finally:
+            patient.cursor.execute("DELETE FROM availability WHERE availability_id=16385")
+            patient.conn.commit()
+
+    def test_check_appointments_doctor_details(self):
+        """ The doctor's details of the appointment list come from the identity cache. """
+        from store.identity import identity_cache
+        stranger = User.create_user()
+        patient = stranger.login(stranger, "patient@mail.com", "PatientPassword")
+        for i, slot in enumerate(['2000-01-01 09:00', '2000-01-01 09:15']):
+            patient.cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (?,2,?,1)", (16500 + i, slot))
+            patient.cursor.execute("INSERT INTO appointment (appointment_id,availability_id,appointment_status_id,patient_id,patient_summary) VALUES (?,?,2,?,'TEST')", (16500 + i, 16500 + i, patient.user_id))
+        patient.conn.commit()
+        try:
+            identity_cache.clear()
+            rows = list(patient.check_appointments(patient.user_id, '2000-01-03', 'past'))
+            self.assertEqual([row[0] for row in rows], [16501, 16500])
+            self.assertEqual(rows[0][3:], ('gp@mail.com', 2, 'London', 'gp grange', 'GpHuman', 'GpSmith'))
+            # the doctor is looked up once for both rows.
+            self.assertEqual((identity_cache.hits, identity_cache.misses), (1, 1))
+        finally:
+            patient.cursor.execute("DELETE FROM appointment WHERE appointment_id BETWEEN 16500 AND 16501")
+            patient.cursor.execute("DELETE FROM availability WHERE availability_id BETWEEN 16500 AND 16501")
+            patient.conn.commit()
+
+    def test_check_appointments_pages(self):
+        stranger = User.create_user()
+        patient = stranger.login(stranger, "patient@mail.com", "PatientPassword")
+        # three past appointments, the most recent one booked last.
+        for i, slot in enumerate(['2000-01-01 09:00', '2000-01-01 09:15', '2000-01-02 09:00']):
+            patient.cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (?,2,?,1)", (16500 + i, slot))
+            patient.cursor.execute("INSERT INTO appointment (appointment_id,availability_id,appointment_status_id,patient_id,patient_summary) VALUES (?,?,2,?,'TEST')", (16500 + i, 16500 + i, patient.user_id))
+        patient.conn.commit()
+        try:
+            first = patient.check_appointments(patient.user_id, '2000-01-03', 'past', page_size=2)
+            second = patient.check_appointments(patient.user_id, '2000-01-03', 'past', page_size=2, page_token=first.next_page_token)
+            # most recent first, each page starting after the last row of the previous one.
+            self.assertEqual([row[0] for row in first] + [row[0] for row in second], [16502, 16501, 16500])
+            self.assertIsNone(second.next_page_token)
+        finally:
+            patient.cursor.execute("DELETE FROM appointment WHERE appointment_id BETWEEN 16500 AND 16502")
+            patient.cursor.execute("DELETE FROM availability WHERE availability_id BETWEEN 16500 AND 16502")
+            patient.conn.commit()
+
     def test_cancel_appointment(self):
         stranger = User.create_user()
         patient = stranger.login(stranger, "patient@mail.com", "PatientPassword")
@@ -265,9 +594,9 @@ class TestPatientFeatures(unittest.TestCase):
         conn, cursor = connect_to_database()
         cursor.execute("SELECT appointment_id FROM appointment WHERE availability_id=16384 AND patient_summary='TEST'")
         id = cursor.fetchone()
-        patient.cancel_appointment(id[0], "2020-01-30", 2)
+        patient.cancel_appointment(id[0], "2099-01-30", 2)
         self.assertEqual(helper_appointment(patient.cursor, id[0]), [(id[0], 16384, -2, patient.user_id, 'TEST',)])
-        self.assertEqual(helper_avalibility(patient.cursor, 16384), [(16384, 2, '2020-01-30', 0)])
+        self.assertEqual(helper_avalibility(patient.cursor, 16384), [(16384, 2, '2099-01-30', 0)])
         cursor.execute("DELETE FROM appointment WHERE availability_id=16384 AND patient_summary='TEST'")
         conn.commit()
 
@@ -313,6 +642,33 @@ class TestUserFeatures(unittest.TestCase):
         self.assertIsInstance(gp, GP)
 
 
+    def test_legacy_password_rehashed_on_login(self):
+        import hashlib
+        from store.passwords import auth_cache, verify_password
+        from store.patient import Patient
+
+        conn, cursor = connect_to_database()
+        cursor.execute("DELETE FROM user WHERE email='legacy@mail.com'")
+        cursor.execute("INSERT INTO user (email,password,first_name,last_name,user_status_id,user_role_id) VALUES ('legacy@mail.com',?,'TEST','TEST',1,2)",
+                       (hashlib.sha1("LegacyPassword".encode('utf-8')).hexdigest(),))
+        conn.commit()
+
+        stranger = User.create_user()
+        self.assertIsInstance(stranger.login(stranger, "legacy@mail.com", "LegacyPassword"), Patient)
+        # the unsalted SHA-1 hash has been replaced by a salted one that still verifies.
+        stored = cursor.execute("SELECT password FROM user WHERE email='legacy@mail.com'").fetchone()[0]
+        self.assertTrue(stored.startswith(("scrypt$", "pbkdf2_sha256$")))
+        self.assertEqual(verify_password("LegacyPassword", stored), (True, False))
+        self.assertEqual(verify_password("WrongPassword", stored), (False, False))
+        # a repeated login is answered from the auth cache.
+        self.assertEqual(auth_cache.verify("LegacyPassword", stored), (True, False))
+        self.assertIsInstance(stranger.login(stranger, "legacy@mail.com", "LegacyPassword"), Patient)
+        self.assertNotIsInstance(stranger.login(stranger, "legacy@mail.com", "WrongPassword"), Patient)
+
+        cursor.execute("DELETE FROM user WHERE email='legacy@mail.com'")
+        conn.commit()
+        conn.close()
+
 class TestRegistration(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -349,3 +705,212 @@ class TestRegistration(unittest.TestCase):
         self.assertFalse(Register.checkPassword("123"))
         self.assertFalse(Register.checkPassword("123...."))
         self.assertFalse(Register.checkPassword(""))
+
+
+""" unit tests for the mailer """
+
+
+class TestMailer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        import threading
+        import warnings
+        # the stand-in mail server uses the stdlib smtpd module, removed in Python 3.12.
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            try:
+                import asyncore
+                import smtpd
+            except ImportError:
+                raise unittest.SkipTest("smtpd is not available")
+
+        class Server(smtpd.SMTPServer):
+            received = []
+            sessions = 0
+
+            def handle_accepted(self, conn, addr):
+                Server.sessions += 1
+                super().handle_accepted(conn, addr)
+
+            def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+                Server.received.append(rcpttos[0])
+
+        cls.server = Server(("127.0.0.1", 0), None)
+        cls.port = cls.server.socket.getsockname()[1]
+        cls.thread = threading.Thread(target=asyncore.loop, kwargs={"timeout": 0.05}, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.server.received.clear()
+        type(self.server).sessions = 0
+
+    def message(self, receiver):
+        from email.mime.text import MIMEText
+        msg = MIMEText("TEST", "html", "utf-8")
+        msg["from"] = "uclpatientsystem@gmail.com"
+        msg["to"] = receiver
+        msg["subject"] = "TEST"
+        return msg
+
+    def test_send_many_reuses_sessions(self):
+        from store.mailer import SMTPPool
+        pool = SMTPPool("127.0.0.1", self.port, username="", starttls=False, max_sessions=2)
+        sent, failed = pool.send_many([self.message("patient{}@mail.com".format(i)) for i in range(20)])
+        pool.close()
+        self.assertEqual((sent, failed), (20, []))
+        self.assertEqual(len(self.server.received), 20)
+        self.assertLessEqual(self.server.sessions, 2)
+
+    def test_reconnects_dropped_session(self):
+        from store.mailer import SMTPPool
+        pool = SMTPPool("127.0.0.1", self.port, username="", starttls=False, max_sessions=1)
+        pool.send(self.message("before@mail.com"))
+        # simulate the server dropping the idle session.
+        pool._idle.queue[0][0].sock.close()
+        pool.send(self.message("after@mail.com"))
+        pool.close()
+        self.assertIn("after@mail.com", self.server.received)
+
+
+class TestOutbox(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if not os.path.exists("./store/UCLH.db"):
+            from store.conn import create_database
+            create_database()
+        cls.conn, cls.cursor = connect_to_database()
+
+    def tearDown(self):
+        self.cursor.execute("DELETE FROM outbox")
+        self.conn.commit()
+
+    def test_enqueue_is_idempotent(self):
+        from store.outbox import enqueue
+        self.assertTrue(enqueue(self.cursor, "TEST-1", "patient@mail.com", "TEST", "TEST"))
+        self.assertFalse(enqueue(self.cursor, "TEST-1", "patient@mail.com", "TEST", "TEST"))
+        self.conn.commit()
+        self.cursor.execute("SELECT COUNT(*) FROM outbox WHERE idempotency_key='TEST-1'")
+        self.assertEqual(self.cursor.fetchone()[0], 1)
+
+    def test_deliver_due_retries_failures(self):
+        from store.outbox import deliver_due, enqueue
+
+        class Mailer:
+            def send_many(self, messages):
+                # deliveries to the unreachable address fail.
+                failed = [(msg, OSError("TEST")) for msg in messages if msg["to"] == "unreachable@mail.com"]
+                return len(messages) - len(failed), failed
+
+        enqueue(self.cursor, "TEST-1", "patient@mail.com", "TEST", "TEST")
+        enqueue(self.cursor, "TEST-2", "unreachable@mail.com", "TEST", "TEST")
+        self.conn.commit()
+        self.assertEqual(deliver_due(mailer=Mailer()), (1, 1, 0))
+        # the failed notification is not due again until its backoff has passed.
+        self.assertEqual(deliver_due(mailer=Mailer()), (0, 0, 0))
+        self.cursor.execute("SELECT idempotency_key, status, attempts FROM outbox ORDER BY idempotency_key")
+        self.assertEqual(self.cursor.fetchall(), [("TEST-1", 1, 1), ("TEST-2", 0, 1)])
+
+    def test_render_batch_multipart(self):
+        from store.outbox import build_message
+        from store.templates import get_template, render_batch
+        # unknown locales fall back to the default one.
+        self.assertIs(get_template("cancelled_by_gp", "en-GB"), get_template("cancelled_by_gp"))
+        recipients = [{"first_name": "<b>Ann</b>", "time": "09:30"}, {"first_name": "Bob", "time": "10:00"}]
+        rendered = list(render_batch("appointment_reminder", recipients))
+        self.assertEqual(len(rendered), 2)
+        fields, subject, body, text_body = rendered[0]
+        # names are escaped in the html body only.
+        self.assertIn("&lt;b&gt;Ann&lt;/b&gt;", body)
+        self.assertIn("Hi <b>Ann</b>,", text_body)
+        msg = build_message("TEST-1", "patient@mail.com", subject, body, text_body, sender="system@mail.com")
+        self.assertEqual(msg.get_content_type(), "multipart/alternative")
+        self.assertEqual([part.get_content_type() for part in msg.get_payload()], ["text/plain", "text/html"])
+
+    def test_emails_only_queue_tomorrow(self):
+        import datetime
+        from store.send_email_gmail import emails
+        tomorrow = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+        self.cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16400,2,?,1)", (tomorrow + " 09:30",))
+        self.cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16401,2,'2000-01-01 09:30',1)")
+        self.cursor.execute("INSERT INTO appointment (appointment_id,availability_id,appointment_status_id,patient_id,patient_summary) VALUES (16400,16400,0,3,'TEST')")
+        self.cursor.execute("INSERT INTO appointment (appointment_id,availability_id,appointment_status_id,patient_id,patient_summary) VALUES (16401,16401,0,3,'TEST')")
+        self.conn.commit()
+        self.assertEqual(emails(0, self.conn, self.cursor), 1)
+        self.cursor.execute("SELECT idempotency_key, body FROM outbox")
+        key, body = self.cursor.fetchone()
+        self.assertEqual(key, "appointment-16400-status-0")
+        self.assertIn("tomorrow at 09:30 has been cancelled by the system", body)
+        # the unconfirmed request is cancelled, the one in the past is left alone.
+        self.cursor.execute("SELECT appointment_status_id FROM appointment WHERE appointment_id IN (16400,16401) ORDER BY appointment_id")
+        self.assertEqual(self.cursor.fetchall(), [(-4,), (0,)])
+        self.cursor.execute("DELETE FROM availability WHERE availability_id IN (16400,16401)")
+        self.conn.commit()
+
+
+"""unit tests for the service """
+
+
+class TestService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from service.api import Service
+        cls.service = Service()
+
+    def call(self, method, path, body=None, token=None):
+        import io
+        import json
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        path, _, query = path.partition("?")
+        environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query,
+                   "CONTENT_LENGTH": str(len(payload)), "wsgi.input": io.BytesIO(payload)}
+        if token:
+            environ["HTTP_AUTHORIZATION"] = "Bearer " + token
+        statuses = []
+        body = b"".join(self.service(environ, lambda status, headers: statuses.append(status)))
+        return int(statuses[0].split()[0]), json.loads(body)
+
+    def test_login_and_search_availability(self):
+        self.assertEqual(self.call("POST", "/login", {"email": "patient@mail.com", "password": "TEST"})[0], 401)
+        status, body = self.call("POST", "/login", {"email": "patient@mail.com", "password": "PatientPassword"})
+        self.assertEqual((status, body["role"]), (200, "patient"))
+        token = body["token"]
+        self.assertEqual(self.call("GET", "/patient/availability?date=2020-01-30&location=London", token=token),
+                         (200, {"rows": []}))
+        # the routes of the other roles and unknown tokens are refused.
+        self.assertEqual(self.call("GET", "/gp/appointments?date=2020-01-30", token=token)[0], 403)
+        self.assertEqual(self.call("POST", "/logout", token=token), (200, {}))
+        self.assertEqual(self.call("GET", "/patient/prescriptions", token=token)[0], 401)
+
+    def test_appointments_of_other_users(self):
+        token = self.call("POST", "/login", {"email": "patient@mail.com", "password": "PatientPassword"})[1]["token"]
+        gp_token = self.call("POST", "/login", {"email": "gp@mail.com", "password": "GpPassword"})[1]["token"]
+        conn, cursor = connect_to_database()
+        # a slot of another gp booked by the patient, and a free slot that has passed.
+        cursor.execute("INSERT INTO user (user_id,email,first_name,last_name,user_status_id,user_role_id) VALUES (16600,'other.gp@mail.com','Other','Gp',1,1)")
+        cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16600,16600,'2099-01-30 09:00',0)")
+        cursor.execute("INSERT INTO availability (availability_id,doctor_id,datetime,availability_status_id) VALUES (16601,16600,'2000-01-30 09:00',0)")
+        conn.commit()
+        try:
+            self.assertEqual(self.call("POST", "/patient/appointments", {"availability_id": 99999, "problem": "TEST"}, token=token)[0], 404)
+            self.assertEqual(self.call("POST", "/patient/appointments", {"availability_id": 16601, "problem": "TEST"}, token=token)[0], 400)
+            self.assertEqual(self.call("POST", "/patient/appointments", {"availability_id": 16600, "problem": "TEST"}, token=token)[0], 200)
+            appointment_id = cursor.execute("SELECT appointment_id FROM appointment WHERE availability_id=16600").fetchone()[0]
+            # the gp of another slot can neither change the appointment nor read its prescription.
+            self.assertEqual(self.call("POST", "/gp/appointments/{}".format(appointment_id), {"action": "remove"}, token=gp_token)[0], 403)
+            self.assertEqual(self.call("GET", "/gp/appointments/{}/prescription".format(appointment_id), token=gp_token)[0], 403)
+            # cancelling an unknown appointment leaves the booked slot alone.
+            self.assertEqual(self.call("POST", "/patient/appointments/99999/cancel", token=token)[0], 404)
+            self.assertEqual(helper_avalibility(cursor, 16600), [(16600, 16600, '2099-01-30 09:00', 1)])
+            self.assertEqual(self.call("POST", "/patient/appointments/{}/cancel".format(appointment_id), token=token), (200, {}))
+            self.assertEqual(helper_avalibility(cursor, 16600), [(16600, 16600, '2099-01-30 09:00', 0)])
+            self.assertEqual(self.call("POST", "/patient/appointments/{}/cancel".format(appointment_id), token=token)[0], 409)
+        finally:
+            cursor.execute("DELETE FROM appointment WHERE availability_id=16600")
+            cursor.execute("DELETE FROM availability WHERE availability_id IN (16600,16601)")
+            cursor.execute("DELETE FROM user WHERE user_id=16600")
+            conn.commit()
+            conn.close()
@@ -1,5 +1,6 @@
-import hashlib
-
+from store import queries
+from store.passwords import auth_cache, hash_password
+from store.pool import get_pool
 from store.storage import Storage
 
 
@@ -73,12 +74,9 @@ class User(Storage):
             cls (User): A new instance of the Register class with query-enabled internal variables.
         """
 
-        # create an instance of the storage class object.
-        store = Storage
-
-        # establish a connection, create the database and embed the connection and cursor object 
-        # within the store class.
-        store._establish_connection(store)
+        # make sure the shared connection pool is available, the conn and cursor used by the class
+        # are checked out of it for each thread the first time they are used.
+        get_pool()
 
         # return an instance of the User class using the store
         return cls
@@ -97,8 +95,8 @@ class User(Storage):
         """
 
         # database query statement
-        statement = "SELECT EXISTS(SELECT 1 FROM user WHERE email = '{}')".format(email)
-        lookup = self.cursor.execute(statement)
+        statement = queries.USER_EMAIL_EXISTS
+        lookup = self.cursor.execute(statement, (email,))
         row = lookup.fetchone()
 
         # if the same email was found in the database return True
@@ -112,38 +110,65 @@ class User(Storage):
     def compare_password(self, email, password):
         """ Compares user supplied password with one stored in the database.
 
-        This method should be called only after verifying that the user exists in the database.
-
         Args:
             email (string): the users email address.
-            password (string): the users email address.
+            password (string): the users password.
 
         Returns:
-            bool: 'True' if the password is correct and 'False' if not.
+            bool: 'True' if the password is correct and 'False' if not or the email does not exist.
         """
 
         # database query
-        statement = "SELECT password FROM user WHERE email = '{}'".format(email)
-        lookup = self.cursor.execute(statement)
+        row = self.cursor.execute(queries.USER_LOGIN, (email,)).fetchone()
 
-        # returns a list, get the first value from the list.
-        stored_hashed_password = lookup.fetchone()
-
-        # if the password does
-        if stored_hashed_password == None:
+        # if the email does not exist there is no password to compare with.
+        if row is None:
             return False
 
-        # hash the user supplied password and compare to the stored hashed password.
-        incoming_hashed_password = hashlib.sha1(password.encode('utf-8')).hexdigest()
+        return self.verify_password(self, row[0], row[1], password)
 
-        # compare the stored hash with the incoming has and return either True or false depending
-        # on whether the passwords are the same.
-        if stored_hashed_password[0] != incoming_hashed_password:
-            return False
 
-        else:
-            return True
-        
+    def verify_password(self, user_id, stored_hashed_password, password):
+        """ Verifies a password against the hash stored for the user.
+
+        The password is checked with the salted key derivation function in store/passwords.py,
+        which is deliberately slow, so this should not be called on the UI thread. Legacy unsalted
+        SHA-1 hashes and hashes with outdated cost settings are replaced once the password has been
+        verified.
+
+        Args:
+            user_id (int): the id of the user.
+            stored_hashed_password (string): the hash stored in the user table.
+            password (string): the user supplied password.
+
+        Returns:
+            bool: 'True' if the password is correct and 'False' if not.
+        """
+
+        valid, needs_rehash = auth_cache.verify(password, stored_hashed_password)
+
+        # upgrade the stored hash now that the plain password is known to be correct.
+        if needs_rehash:
+            self.cursor.execute(queries.USER_REHASH_PASSWORD,
+                                (hash_password(password), user_id, stored_hashed_password))
+            self.conn.commit()
+
+        return valid
+
+
+    def appointment_owner(self, appointment_id):
+        """ Looks up who an appointment belongs to.
+
+        Args:
+            appointment_id (int): the unique id of the appointment.
+
+        Returns:
+            owner (tuple): the patient_id, doctor_id, availability_id, datetime and
+                appointment_status_id of the appointment, None if it does not exist.
+        """
+
+        return self.cursor.execute(queries.USER_APPOINTMENT_OWNER, (appointment_id,)).fetchone()
+
 
     def login(self, user_email, password):
         """ Logs the user into the application.
@@ -163,11 +188,11 @@ class User(Storage):
             self (User): The same instance of the user class with updated internal state.
         """
 
-        # verify that the email exists in the database.
-        email_exists = self.email_already_exists(self, user_email)
+        # look up the user's id, password hash, role, status and name in one query.
+        row = self.cursor.execute(queries.USER_LOGIN, (user_email,)).fetchone()
 
         # if the supplied email does not exist update internal incorrect_email variable and return User.
-        if email_exists == False:
+        if row is None:
             self.incorrect_email = True
             self.email = None
             self.user_id = None
@@ -177,7 +202,7 @@ class User(Storage):
             return self
 
         # check if the user supplied password for the email is correct.
-        password_valid = self.compare_password(self, user_email, password)
+        password_valid = self.verify_password(self, row[0], row[1], password)
 
         # if the supplied password does not exist update internal incorrect_password variable and return User.
         if password_valid == False:
@@ -188,37 +213,26 @@ class User(Storage):
             self.incorrect_email = False
             return self
 
-        # user now verified; grab the user_id and user_role_id from the database and update the
-        # internal state. Return either an Admin, GP or Patient depending on the returned credentials.
-
-        # database query
-        statement = """
-            SELECT user_id, user_role_id, user_status_id, first_name, last_name 
-            FROM user 
-            WHERE email = '{}'""".format(user_email)
-
-        lookup = self.cursor.execute(statement)
-
-        # returns a list, get the first value from the list.
-        result = lookup.fetchall()
+        # user now verified; update the internal state from the row that was looked up. Return
+        # either an Admin, GP or Patient depending on the returned credentials.
 
         # update the internal user_id state using the results of the query.
         self.email = user_email
 
         # update the internal user_id state using the results of the query.
-        self.user_id = result[0][0]
+        self.user_id = row[0]
 
         # update the internal user_role state using the results of the query.
-        self.user_role_id = result[0][1]
+        self.user_role_id = row[2]
 
         # update the internal user_status_id state using the results of the query.
-        self.user_status_id = result[0][2]
+        self.user_status_id = row[3]
 
         # update the internal first_name state using the results of the query.
-        self.first_name = result[0][3]
+        self.first_name = row[4]
 
         # update the internal last_name state using the results of the query.
-        self.last_name = result[0][4]
+        self.last_name = row[5]
 
         # explicitly set incorrect_email state to False.
         self.incorrect_email = False
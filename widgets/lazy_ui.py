@@ -0,0 +1,258 @@
+import hashlib
+import importlib.util
+import io
+import logging
+import os
+import xml.etree.ElementTree as ElementTree
+
+
+# the Qt Designer file the window is built from.
+UI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ehealthApp.ui')
+
+# the pages of page_stackedWidget built with the window, every other page is built on first use.
+EAGER_PAGES = ('page_start', 'page_login')
+
+# the elements of a .ui file that become attributes of the ui.
+NAMED_ELEMENTS = ('widget', 'layout', 'spacer', 'action')
+
+# where the Python modules compiled from the fragments of ehealthApp.ui are kept.
+UI_CACHE_DIR = os.environ.get('UCLH_UI_CACHE', os.path.join(os.path.dirname(UI_PATH), '__pycache__', 'ui'))
+
+# development mode loads the fragments with uic every time instead of compiling them.
+UI_DEVELOPMENT = os.environ.get('UCLH_UI_DEV') == '1'
+
+
+class LazyUi:
+    """ The LazyUi class builds the application window from ehealthApp.ui one page at a time.
+
+    Ui_App_GUI.setupUi (ehealthApp.py) creates the widgets of all pages of page_stackedWidget before
+    the login screen is shown, although a session only ever uses the pages of one role. LazyUi
+    builds the window with the EAGER_PAGES only and leaves the other pages empty. A page is built the
+    first time it is shown or one of its widgets is looked up, so the pages use a LazyUi exactly
+    like a Ui_App_GUI.
+
+    The window and each page are built by a Python module compiled from their fragment of
+    ehealthApp.ui with pyuic, which is cached in UI_CACHE_DIR under the hash of the content of
+    ehealthApp.ui. The fragments are only compiled again once ehealthApp.ui has been edited, so
+    ehealthApp.py never has to be regenerated for the application to pick up a change. In
+    development mode (UCLH_UI_DEV=1), or if the cache cannot be written, the fragments are loaded
+    with uic.loadUi.
+
+    Attributes:
+        build_hooks (list): functions called with the names of the widgets of each page built on
+            first use, e.g. to replace its tables (see widgets.table_widgets.install_table_views).
+    """
+
+    def __init__(self, ui_path=UI_PATH, eager_pages=EAGER_PAGES, cache_dir=UI_CACHE_DIR,
+                 development=UI_DEVELOPMENT):
+        """ Instatiates the class and initializes internal variables.
+
+        Args:
+            ui_path (str): the Qt Designer file to build the window from.
+            eager_pages (tuple): the pages built with the window, None to build every page.
+            cache_dir (str): the directory of the compiled fragments.
+            development (bool): load the fragments with uic.loadUi instead of compiling them.
+        """
+
+        self.build_hooks = []
+
+        # None once the compiled fragments cannot be cached.
+        self._cache_dir = None if development else cache_dir
+
+        with open(ui_path, 'rb') as ui_file:
+            source = ui_file.read()
+
+        self._root = ElementTree.fromstring(source)
+
+        # the window is split into other fragments depending on the eager pages.
+        self._key = hashlib.sha1(source + repr(eager_pages).encode()).hexdigest()
+
+        # page name -> the element of each page that has not been built yet.
+        self._lazy_pages = {}
+
+        # widget name -> the name of the page it is on, for the pages that have not been built yet.
+        self._owners = {}
+
+        stacked_widget = self._root.find(".//widget[@name='page_stackedWidget']")
+
+        for page in stacked_widget.findall('widget'):
+            if eager_pages is None or page.get('name') in eager_pages:
+                continue
+
+            # keep a copy of the page with its widgets and leave only its own properties in the tree
+            # the window is built from.
+            self._lazy_pages[page.get('name')] = lazy_page = ElementTree.Element(page.tag, page.attrib)
+            lazy_page.extend(page)
+
+            for child in list(page):
+                if child.tag in NAMED_ELEMENTS:
+                    page.remove(child)
+
+            for name in _names(lazy_page)[1:] + _button_groups(lazy_page):
+                self._owners[name] = page.get('name')
+
+
+    def __getattr__(self, name):
+        # only called for attributes that do not exist (yet).
+        page_name = self.__dict__.get('_owners', {}).get(name)
+
+        if page_name is None:
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+        self._build(page_name)
+
+        return self.__dict__[name]
+
+
+    def setupUi(self, window):
+        """ Builds the window with the eager pages, like Ui_App_GUI.setupUi.
+
+        Args:
+            window (QMainWindow): the main window of the application.
+        """
+
+        built = self._load(self._root.findtext('class'), self._root, window)
+
+        for name in _names(self._root.find('widget'))[1:] + _button_groups(self._root):
+            setattr(self, name, getattr(built, name))
+
+        # build a page before it is first displayed.
+        self.page_stackedWidget.currentChanged.connect(self._page_shown)
+
+
+    def _page_shown(self, index):
+        name = self.page_stackedWidget.widget(index).objectName()
+
+        if name in self._lazy_pages:
+            self._build(name)
+
+
+    def _build(self, page_name):
+        """ Builds the widgets of a page that has not been built yet. """
+
+        element = self._lazy_pages.pop(page_name)
+        page = getattr(self, page_name)
+
+        fragment = ElementTree.Element('ui', version='4.0')
+        ElementTree.SubElement(fragment, 'class').text = self._root.findtext('class')
+        fragment.append(element)
+
+        # button groups are only created by the fragment whose buttons reference them.
+        if self._root.find('buttongroups') is not None:
+            fragment.append(self._root.find('buttongroups'))
+
+        # widgets created inside a visible page would stay hidden until shown one by one.
+        visible = page.isVisible()
+
+        if visible:
+            page.hide()
+
+        built = self._load(page_name, fragment, page)
+
+        if visible:
+            page.show()
+
+        names = _names(element)[1:]
+
+        for name in names + _button_groups(element):
+            setattr(self, name, getattr(built, name))
+            del self._owners[name]
+
+        for hook in self.build_hooks:
+            hook(names)
+
+
+    def _load(self, name, element, widget):
+        """ Builds the widgets of a fragment of the .ui file into widget.
+
+        Args:
+            name (str): the name of the fragment, unique within the .ui file.
+            element (Element): the fragment.
+            widget (QWidget): the widget the fragment is built into.
+
+        Returns:
+            built (object): the object the widgets are attributes of.
+        """
+
+        if self._cache_dir is not None:
+            path = os.path.join(self._cache_dir, 'ui_{}_{}.py'.format(self._key, name))
+
+            try:
+                ui = _compiled(path, element)()
+
+            except OSError as error:
+                logging.warning("Cannot cache the compiled ui in %s, loading it with uic: %s",
+                                self._cache_dir, error)
+                self._cache_dir = None
+
+            else:
+                ui.setupUi(widget)
+                return ui
+
+        # UI library imports, only needed without the compiled fragments.
+        from PyQt5 import uic
+
+        # a file object rather than a path, so image paths stay relative to the working directory as
+        # in ehealthApp.py.
+        uic.loadUi(io.BytesIO(ElementTree.tostring(element)), widget)
+
+        return widget
+
+
+def _names(element):
+    """ Returns the names of the widgets, layouts, spacers and actions in an element of a .ui file,
+    starting with the element itself. """
+
+    return [child.get('name') for child in element.iter() if child.tag in NAMED_ELEMENTS and child.get('name')]
+
+
+def _button_groups(element):
+    """ Returns the names of the button groups the buttons in an element of a .ui file are in. """
+
+    names = []
+
+    for attribute in element.iter('attribute'):
+        if attribute.get('name') == 'buttonGroup' and attribute.findtext('string') not in names:
+            names.append(attribute.findtext('string'))
+
+    return names
+
+
+def _compiled(path, element):
+    """ Returns the Ui class compiled from a fragment of a .ui file, compiling it if it is not cached.
+
+    Args:
+        path (str): the cached module of the fragment.
+        element (Element): the fragment.
+
+    Returns:
+        ui_class (type): the class whose setupUi builds the widgets, like Ui_App_GUI.
+    """
+
+    if not os.path.exists(path):
+        # only needed to compile a fragment, uic alone takes milliseconds to import.
+        import tempfile
+        from PyQt5 import uic
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # compile into a temporary file first, so another process never imports half a module.
+        descriptor, temporary_path = tempfile.mkstemp(suffix='.py', dir=os.path.dirname(path))
+
+        try:
+            with os.fdopen(descriptor, 'w') as module_file:
+                uic.compileUi(io.BytesIO(ElementTree.tostring(element)), module_file)
+
+            os.replace(temporary_path, path)
+
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    # imported from its source file, so its bytecode is cached by the import system as well.
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return getattr(module, 'Ui_' + element.findtext('class'))
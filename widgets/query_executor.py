@@ -0,0 +1,246 @@
+import logging
+
+# UI library imports
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+
+# the connection pool of the store library.
+from store.pool import get_pool
+
+
+# the number of store calls run at the same time. Each running call holds a connection from the
+# store pool, which the UI thread, the scheduler and the outbox worker also draw from.
+QUERY_THREADS = 2
+
+
+class _QuerySignals(QObject):
+    """ Carries the outcome of a QueryTask back to the UI thread, QRunnable cannot have signals. """
+
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+
+
+class QueryTask(QRunnable):
+    """ A store call submitted to the QueryExecutor.
+
+    Attributes:
+        key: the key the task was submitted under, None if it cannot be superseded.
+        cancelled (bool): True once the task has been cancelled or superseded, its outcome is then
+            never delivered.
+    """
+
+    def __init__(self, key, function, args, kwargs, on_result, on_error):
+        """ Instatiates the class and initializes internal variables. """
+
+        super().__init__()
+
+        # the executor keeps a reference until the task is done, so it can be taken off the queue.
+        self.setAutoDelete(False)
+
+        self.key = key
+        self.cancelled = False
+
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.on_result = on_result
+        self.on_error = on_error
+
+        self.signals = _QuerySignals()
+
+
+    def run(self):
+        try:
+            # a task cancelled after it was taken off the queue but before it started does nothing.
+            if self.cancelled:
+                result = None
+
+            else:
+                result = self.function(*self.args, **self.kwargs)
+
+        except Exception as error:
+            self.signals.failed.emit(self, error)
+
+        else:
+            self.signals.finished.emit(self, result)
+
+        finally:
+            # pool threads are not known to the threading module, so their connection would never
+            # be released otherwise.
+            get_pool().release_thread_connection()
+
+
+class QueryExecutor(QObject):
+    """ The QueryExecutor class runs store calls on a thread pool so the window never freezes.
+
+    A store call is submitted with the callbacks that receive its result or error, which are always
+    called on the UI thread. Each worker thread queries the database through its own connection
+    from the store pool (see store/storage.py), so calls never share a cursor with the UI thread.
+    A call submitted under the same key as an earlier one supersedes it, e.g. when a calendar is
+    clicked quickly only the query of the last date is displayed: a superseded call that has not
+    started yet is dropped, and the outcome of one that is already running is discarded. The busy
+    cursor is shown while any call is pending.
+
+    Attributes:
+        busy_changed (pyqtSignal): emitted with True when the first call is submitted and with
+            False once no call is pending anymore.
+    """
+
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, max_threads=QUERY_THREADS, parent=None):
+        """ Instatiates the class and initializes internal variables. """
+
+        super().__init__(parent)
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+
+        # tasks that have been submitted and are not done yet.
+        self._pending = set()
+
+        # key -> the latest task submitted under it.
+        self._latest = {}
+
+
+    def submit(self, key, function, *args, on_result=None, on_error=None, **kwargs):
+        """ Runs a store call on the thread pool.
+
+        Args:
+            key: superseded calls submitted under the same key are cancelled, e.g. the table the
+                result is displayed in. None if the call cannot be superseded.
+            function (function): the store call, called with args and kwargs. Its result must not be
+                a cursor, which belongs to the connection of the worker thread.
+            on_result (function): called with the result of the call on the UI thread.
+            on_error (function): called with the exception raised by the call on the UI thread, the
+                exception is logged if not given.
+
+        Returns:
+            task (QueryTask): the submitted task, which can be passed to cancel.
+        """
+
+        if key is not None:
+            self.cancel_key(key)
+
+        task = QueryTask(key, function, args, kwargs, on_result, on_error)
+        task.signals.finished.connect(self._finished)
+        task.signals.failed.connect(self._failed)
+
+        if key is not None:
+            self._latest[key] = task
+
+        self._pending.add(task)
+
+        if len(self._pending) == 1:
+            self._set_busy(True)
+
+        self.pool.start(task)
+
+        return task
+
+
+    def cancel(self, task):
+        """ Cancels a task, its outcome is never delivered.
+
+        Args:
+            task (QueryTask): a task returned by submit.
+        """
+
+        task.cancelled = True
+
+        # a task that has not started yet is taken off the queue, a running one is left to finish.
+        if self.pool.tryTake(task):
+            self._done(task)
+
+
+    def cancel_key(self, key):
+        """ Cancels the latest task submitted under a key, if it is not done yet.
+
+        Args:
+            key: the key the task was submitted under.
+        """
+
+        if key in self._latest:
+            self.cancel(self._latest[key])
+
+
+    def wait(self, msecs=-1):
+        """ Waits for every running call to finish, the outcomes are delivered by the event loop.
+
+        Args:
+            msecs (int): the maximum time to wait in milliseconds, -1 to wait indefinitely.
+
+        Returns:
+            done (bool): True if every call has finished.
+        """
+
+        return self.pool.waitForDone(msecs)
+
+
+    def _done(self, task):
+        """ Forgets a task that has finished or was taken off the queue. """
+
+        self._pending.discard(task)
+
+        if self._latest.get(task.key) is task:
+            del self._latest[task.key]
+
+        if not self._pending:
+            self._set_busy(False)
+
+
+    def _set_busy(self, busy):
+        """ Shows or hides the busy cursor. """
+
+        if QApplication.instance() is not None:
+            if busy:
+                QApplication.setOverrideCursor(QCursor(Qt.BusyCursor))
+
+            else:
+                QApplication.restoreOverrideCursor()
+
+        self.busy_changed.emit(busy)
+
+
+    @pyqtSlot(object, object)
+    def _finished(self, task, result):
+        self._done(task)
+
+        if not task.cancelled and task.on_result is not None:
+            task.on_result(result)
+
+
+    @pyqtSlot(object, object)
+    def _failed(self, task, error):
+        self._done(task)
+
+        if task.cancelled:
+            return
+
+        if task.on_error is not None:
+            task.on_error(error)
+
+        else:
+            logging.error("Query failed.", exc_info=error)
+
+
+# the executor shared by the pages, created on first use.
+_executor = None
+
+
+def get_executor():
+    """ Returns the query executor shared by the pages, creating it if necessary.
+
+    Must be called from the UI thread.
+
+    Returns:
+        executor (QueryExecutor): the shared query executor.
+    """
+
+    global _executor
+
+    if _executor is None:
+        _executor = QueryExecutor()
+
+    return _executor
@@ -0,0 +1,34 @@
+# UI library imports
+from PyQt5.QtCore import *
+
+
+class _FirstPaint(QObject):
+    """ Calls a function once the widget it filters the events of has been painted for the first time. """
+
+    def __init__(self, function, parent):
+        """ Instatiates the class and initializes internal variables. """
+
+        super().__init__(parent)
+
+        self.function = function
+
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            watched.removeEventFilter(self)
+
+            # let the paint event be handled first.
+            QTimer.singleShot(0, self.function)
+
+        return False
+
+
+def after_first_paint(widget, function):
+    """ Defers work until a widget has been painted for the first time, e.g. the main window.
+
+    Args:
+        widget (QWidget): the widget to wait for.
+        function (function): called without arguments on the UI thread after the first paint.
+    """
+
+    widget.installEventFilter(_FirstPaint(function, widget))
@@ -0,0 +1,163 @@
+# UI library imports
+from PyQt5.QtCore import *
+
+import functools
+import itertools
+
+# runs the page fetches off the UI thread.
+from widgets.query_executor import get_executor
+
+
+# the number of rows of a resultset added to a table each time it is scrolled to the bottom.
+FETCH_SIZE = 256
+
+
+class QueryTableModel(QAbstractTableModel):
+    """ The QueryTableModel class displays a resultset in a QTableView without copying it into items.
+
+    Rows are fetched in batches through canFetchMore/fetchMore, which the view calls when it is
+    scrolled to the bottom, and a cell is only converted to text when the view paints it. Setting
+    the rows of a table therefore costs the same whether the resultset has ten rows or a hundred
+    thousand.
+
+    Attributes:
+        headers (list): the labels of the columns.
+        rows (list): the rows fetched so far.
+    """
+
+    def __init__(self, headers, parent=None):
+        """ Instatiates the class and initializes internal variables. """
+
+        super().__init__(parent)
+
+        self.headers = list(headers)
+        self.rows = []
+
+        # fetches the next batch of rows and passes it to _append, None once every row has been
+        # fetched or while a batch is being fetched.
+        self._fetch = None
+
+        # the page being fetched on the query executor, see set_pages.
+        self._task = None
+
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+
+        row = self.rows[index.row()]
+
+        if index.column() >= len(row):
+            return None
+
+        return str(row[index.column()])
+
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section] if section < len(self.headers) else None
+
+        return super().headerData(section, orientation, role)
+
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._fetch is not None
+
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+
+        # the view asks again while a page is on its way, which must not fetch the page twice.
+        fetch, self._fetch = self._fetch, None
+        fetch()
+
+
+    def _append(self, rows, fetch):
+        """ Appends a batch of rows, fetch fetches the batch after it and is None after the last one. """
+
+        self._task = None
+        self._fetch = fetch
+
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+
+    def _reset(self, fetch):
+        """ Replaces the rows of the model with the ones fetched by fetch. """
+
+        # a page still being fetched belongs to the rows being replaced.
+        if self._task is not None:
+            get_executor().cancel(self._task)
+            self._task = None
+
+        self.beginResetModel()
+        self.rows = []
+        self._fetch = fetch
+        self.endResetModel()
+
+        # the first batch is fetched straight away so the table is filled before it is next painted.
+        self.fetchMore()
+
+
+    def set_rows(self, rows, fetch_size=FETCH_SIZE):
+        """ Displays a resultset.
+
+        Args:
+            rows (iterable): a list of rows, or a cursor that is not used for anything else while the
+                table is displayed.
+            fetch_size (int): the number of rows fetched at a time.
+        """
+
+        iterator = iter(rows)
+
+        def fetch():
+            batch = list(itertools.islice(iterator, fetch_size))
+            self._append(batch, fetch if len(batch) == fetch_size else None)
+
+        self._reset(fetch)
+
+
+    def set_pages(self, fetch_page, first_page=None):
+        """ Displays a paged view, fetching a page each time the table is scrolled to the bottom.
+
+        Pages are fetched on the query executor, so scrolling never waits for the database. The rows
+        of a page are appended once it is back.
+
+        Args:
+            fetch_page (function): called with the page token of a page (None for the first one) and
+                returning a store.pagination.Page, on a worker thread.
+            first_page (Page): the first page if it has already been fetched.
+        """
+
+        def append(page):
+            if page.next_page_token is None:
+                self._append(page.rows, None)
+
+            else:
+                self._append(page.rows, functools.partial(fetch, page.next_page_token))
+
+        def fetch(page_token=None):
+            if page_token is None and first_page is not None:
+                append(first_page)
+
+            else:
+                self._task = get_executor().submit(self, fetch_page, page_token, on_result=append)
+
+        self._reset(fetch)
+
+
+    def clear(self):
+        """ Removes every row so the table presents no data. """
+
+        self._reset(None)
@@ -2,8 +2,16 @@
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
+from PyQt5 import QtWidgets
 
-from ehealthApp import *
+# model displaying query results in the tables.
+from widgets.table_model import QueryTableModel
+
+# runs store queries off the UI thread.
+from widgets.query_executor import get_executor
+
+# the connection pool of the store library.
+from store.pool import get_pool
 
 
 def table_data_settings(table_widget):
@@ -19,21 +27,137 @@ def table_data_settings(table_widget):
     table_widget.verticalHeader().setVisible(False)
 
 
+# the tables of ehealthApp.py that display query results, see install_table_views.
+QUERY_TABLES = ('admin_tableWidget', 'pending_table', 'scheduled_table', 'medical_history_table', 'result_table',
+                'availabilityTable', 'view_prescription_table', 'check_appointment_widget')
+
+
+def table_view(table_widget):
+    """ Replaces a QTableWidget with a QTableView backed by a QueryTableModel.
+
+    The view takes the place, column headers and settings of the table widget designed in
+    ehealthApp.ui, so the ui file can still be edited with Qt Designer.
+
+    Args:
+        table_widget (class): UI widget component.
+
+    Returns:
+        table_view (class): the QTableView displayed instead of table_widget.
+    """
+
+    headers = []
+
+    for column in range(table_widget.columnCount()):
+        item = table_widget.horizontalHeaderItem(column)
+        headers.append(item.text() if item is not None else str(column + 1))
+
+    view = QtWidgets.QTableView(table_widget.parentWidget())
+    view.setObjectName(table_widget.objectName())
+    view.setGeometry(table_widget.geometry())
+    view.setMaximumSize(table_widget.maximumSize())
+    view.setSizeAdjustPolicy(table_widget.sizeAdjustPolicy())
+    view.setDragEnabled(table_widget.dragEnabled())
+    view.setAlternatingRowColors(table_widget.alternatingRowColors())
+    view.setSelectionBehavior(table_widget.selectionBehavior())
+    view.setModel(QueryTableModel(headers, view))
+
+    for source, target in ((table_widget.horizontalHeader(), view.horizontalHeader()),
+                           (table_widget.verticalHeader(), view.verticalHeader())):
+        target.setCascadingSectionResizes(source.cascadingSectionResizes())
+        target.setDefaultSectionSize(source.defaultSectionSize())
+        target.setHighlightSections(source.highlightSections())
+        target.setStretchLastSection(source.stretchLastSection())
+
+    # keep the stacking order of the page, then remove the table widget.
+    view.stackUnder(table_widget)
+    view.setVisible(not table_widget.isHidden())
+    table_widget.hide()
+    table_widget.deleteLater()
+
+    return view
+
+
+def install_table_views(ui):
+    """ Replaces the query result tables of the application with model backed views.
+
+    Must be called once, straight after ui.setupUi and before any page connects to the tables. The
+    tables of a LazyUi page are replaced when the page is built.
+
+    Args:
+        ui (class): the Ui_App_GUI or LazyUi the application was set up with.
+    """
+
+    def install(names):
+        for name in QUERY_TABLES:
+            if name in names:
+                setattr(ui, name, table_view(getattr(ui, name)))
+
+    if hasattr(ui, 'build_hooks'):
+        ui.build_hooks.append(install)
+
+    install([name for name in QUERY_TABLES if name in vars(ui)])
+
+
 def table_display_data(table_widget, query_result):
     """ Displays a specified resultset into a widget table.
 
+    Rows are added as the table is scrolled, see QueryTableModel.
+
+    Args:
+        table_widget (class): UI widget component.
+        query_result (list): resultset list, or the cursor returned by a store method.
+    """
+
+    # a query still running for the table would overwrite these rows once it is back.
+    get_executor().cancel_key(table_widget)
+
+    # the store classes return the cursor of the thread, which the next query would reuse, so the
+    # table is given the cursor for itself before it reads the resultset.
+    get_pool().detach_thread_cursor(query_result)
+    table_widget.model().set_rows(query_result)
+
+
+def _fetch_all(query, *args):
+    """ Runs a store query and reads its whole resultset, on a worker thread. """
+
+    return list(query(*args))
+
+
+def table_display_query(table_widget, query, *args, on_displayed=None):
+    """ Runs a store query off the UI thread and displays its resultset into a widget table.
+
+    The table keeps its current rows until the resultset is back. A query submitted for the same
+    table before this one is done supersedes it, see QueryExecutor.
+
     Args:
         table_widget (class): UI widget component.
-        query_result (list): resultset list.
+        query (function): the store method returning the resultset, called with args.
+        on_displayed (function): called without arguments once the resultset is displayed.
     """
 
-    table_widget.setRowCount(0)
+    def display(rows):
+        table_widget.model().set_rows(rows)
+
+        if on_displayed is not None:
+            on_displayed()
+
+    get_executor().submit(table_widget, _fetch_all, query, *args, on_result=display)
 
-    for row_number, row_data in enumerate(query_result):
-        table_widget.insertRow(row_number)
 
-        for column_number, data in enumerate(row_data):
-            table_widget.setItem(row_number, column_number, QtWidgets.QTableWidgetItem(str(data)))
+def table_display_query_pages(table_widget, fetch_page):
+    """ Fetches the first page of a paged view off the UI thread and displays it into a widget table.
+
+    Further pages are fetched off the UI thread as well, whenever the table is scrolled to the
+    bottom, so only the rows the user actually looks at are fetched.
+
+    Args:
+        table_widget (class): UI widget component.
+        fetch_page (function): called with the page token of a page (None for the first one) and
+            returning a store.pagination.Page.
+    """
+
+    get_executor().submit(table_widget, fetch_page, None,
+                          on_result=lambda page: table_widget.model().set_pages(fetch_page, page))
 
 
 def table_row_select(table_widget, labels_list, **kwargs):
@@ -48,13 +172,11 @@ def table_row_select(table_widget, labels_list, **kwargs):
     cell = cell_list[0]
     row = cell.row()
     print('ROW:', row + 1)
-    # table_widget.selectRow(row)
-    curr_row = table_widget.currentRow()
     list_index = 0
 
     for column, value in kwargs.items():
-        value_selection = table_widget.item(curr_row, value).text()
-        print(column, table_widget.item(curr_row, value).text())
+        value_selection = cell.sibling(row, value).data()
+        print(column, value_selection)
         labels_list[list_index].setText(str(column) + ': ' + str(value_selection))
         list_index += 1
 
@@ -62,4 +184,4 @@ def table_row_select(table_widget, labels_list, **kwargs):
 def table_goes_blank(table_widget):
     """ Removes rows in a table so it presents no data. """
 
-    table_widget.setRowCount(0)
\ No newline at end of file
+    table_widget.model().clear()
\ No newline at end of file